@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.api.webhook import _RECENT_OUTGOING, dispatcher, get_api_key
+from app.core.metrics import (
+    ADMISSION_INFLIGHT,
+    ADMISSION_WAITING,
+    LLM_CIRCUIT_OPEN,
+    REGISTRY,
+    THREADPOOL_QUEUE,
+    WEBHOOK_QUEUE_DEPTH,
+)
+from app.services.admission import admission
+from app.services.ai_service import ai_service
+from app.services.conversation_service import conversation_memory
+from app.services.dedupe import dedupe_store
+from app.services.traffic_recorder import traffic_recorder
+
+router = APIRouter()
+
+
+@router.get("/stats")
+async def stats(api_key: str = Depends(get_api_key)) -> Dict[str, Any]:
+    """Runtime counters of the webhook pipeline."""
+    return {
+        "dispatcher": dispatcher.stats(),
+        "admission": admission.stats(),
+        "dedupe": await dedupe_store.stats(),
+        "loop_guard": _RECENT_OUTGOING.stats(),
+        "retrieval_cache": ai_service.retrieval_cache.stats() if ai_service.retrieval_cache else None,
+        "llm_breaker": ai_service.breaker.stats(),
+        "answer_cache": ai_service.answer_cache.stats() if ai_service.answer_cache else None,
+        "conversations": conversation_memory.stats(),
+        "embedding_batcher": ai_service.embedding_batcher.stats() if ai_service.embedding_batcher else None,
+        "recorder": traffic_recorder.stats() if traffic_recorder else None,
+        "singleflight": {
+            flight.name: flight.stats() for flight in (ai_service.retrieval_flight, ai_service.llm_flight) if flight
+        },
+    }
+
+
+def _threadpool_queue_depth() -> int:
+    executor = getattr(asyncio.get_running_loop(), "_default_executor", None)
+    work_queue = getattr(executor, "_work_queue", None)
+    return work_queue.qsize() if work_queue is not None else 0
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Prometheus text exposition of the hot-path metrics."""
+    WEBHOOK_QUEUE_DEPTH.set(dispatcher.pending)
+    ADMISSION_INFLIGHT.set(admission.inflight)
+    ADMISSION_WAITING.set(admission.waiting)
+    THREADPOOL_QUEUE.set(_threadpool_queue_depth())
+    LLM_CIRCUIT_OPEN.set(1 if ai_service.breaker.is_open else 0)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
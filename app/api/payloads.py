@@ -0,0 +1,278 @@
+"""
+Decoding of inbound webhook payloads.
+
+Three shapes are accepted: Evolution (`data.key` / `data.message` or
+`data.messages[]`), Meta-style (`messages[]` with `from`) and a plain
+`{"body": ..., "from": ...}`. When `msgspec` is installed the raw bytes are
+decoded straight into small typed structs that only declare the fields we
+read, so media blobs, thumbnails and context info are skipped by the parser
+instead of being materialised as dicts. Payloads that do not fit the schema
+fall back to `json.loads` plus the dict-walking extractors below.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidPayloadError(ValueError):
+    """Raised when the webhook body is not a JSON object."""
+
+
+@dataclass(slots=True)
+class WebhookMessage:
+    remote_jid: Optional[str]
+    from_me: bool
+    message_id: Optional[str]
+    text: str
+
+
+@dataclass(slots=True)
+class WebhookDelivery:
+    event: str
+    messages: List[WebhookMessage]
+
+
+def _message_context(payload: Dict[str, Any], data: Dict[str, Any], entry: Any) -> Dict[str, Any]:
+    key_obj: Dict[str, Any] = {}
+    message_obj: Dict[str, Any] = {}
+
+    if entry is None:
+        if isinstance(data.get("message"), dict):
+            message_obj = data["message"]
+            key_obj = data.get("key", {}) if isinstance(data.get("key"), dict) else {}
+    elif isinstance(entry, dict):
+        if isinstance(entry.get("message"), dict):
+            message_obj = entry["message"]
+        elif isinstance(entry.get("text"), dict):
+            message_obj = {"text": entry["text"]}
+        key_obj = entry.get("key", {}) if isinstance(entry.get("key"), dict) else {}
+
+    remote_jid: Optional[str] = None
+    if isinstance(data.get("key"), dict):
+        remote_jid = data["key"].get("remoteJid")
+    if not remote_jid and isinstance(key_obj, dict):
+        remote_jid = key_obj.get("remoteJid")
+    if not remote_jid:
+        remote_jid = data.get("from") or payload.get("from")
+    if not remote_jid and isinstance(entry, dict):
+        remote_jid = entry.get("from")
+
+    from_me = False
+    if isinstance(data.get("key"), dict):
+        from_me = bool(data["key"].get("fromMe"))
+    if not from_me and isinstance(key_obj, dict):
+        from_me = bool(key_obj.get("fromMe"))
+
+    message_id: Optional[str] = None
+    if isinstance(data.get("key"), dict):
+        message_id = data["key"].get("id")
+    if not message_id and isinstance(key_obj, dict):
+        message_id = key_obj.get("id")
+
+    return {
+        "data": data,
+        "message": message_obj,
+        "key": key_obj,
+        "remote_jid": remote_jid,
+        "from_me": from_me,
+        "message_id": str(message_id) if message_id else None,
+    }
+
+
+def extract_message_contexts(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One context per message in the delivery, in delivery order."""
+    data = payload.get("data") if isinstance(payload.get("data"), dict) else {}
+
+    entries: List[Any] = [None]
+    if not isinstance(data.get("message"), dict):
+        if isinstance(data.get("messages"), list) and data["messages"]:
+            entries = data["messages"]
+        elif isinstance(payload.get("messages"), list) and payload["messages"]:
+            entries = payload["messages"]
+
+    return [_message_context(payload, data, entry) for entry in entries]
+
+
+def extract_message_context(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Robust number extraction logic handling nested dictionaries (first message only)."""
+    return extract_message_contexts(payload)[0]
+
+
+def extract_text(payload: Dict[str, Any], message_obj: Dict[str, Any]) -> str:
+    text = ""
+
+    if "conversation" in message_obj and isinstance(message_obj.get("conversation"), str):
+        text = message_obj["conversation"]
+    elif isinstance(message_obj.get("extendedTextMessage"), dict):
+        text = message_obj["extendedTextMessage"].get("text") or ""
+    elif isinstance(message_obj.get("text"), dict):
+        text = message_obj["text"].get("body") or ""
+    elif isinstance(message_obj.get("text"), str):
+        text = message_obj["text"]
+    elif isinstance(message_obj.get("imageMessage"), dict):
+        text = message_obj["imageMessage"].get("caption") or ""
+    elif isinstance(message_obj.get("videoMessage"), dict):
+        text = message_obj["videoMessage"].get("caption") or ""
+
+    if not text and isinstance(payload.get("body"), str):
+        text = payload["body"]
+
+    return text.strip()
+
+
+def _decode_generic(raw: bytes) -> WebhookDelivery:
+    try:
+        body = json.loads(raw)
+    except ValueError as exc:
+        raise InvalidPayloadError(str(exc)) from exc
+    if not isinstance(body, dict):
+        raise InvalidPayloadError("Webhook payload must be a JSON object")
+
+    messages = []
+    for ctx in extract_message_contexts(body):
+        remote_jid = ctx.get("remote_jid")
+        messages.append(
+            WebhookMessage(
+                remote_jid=str(remote_jid) if remote_jid else None,
+                from_me=ctx.get("from_me") is True,
+                message_id=ctx.get("message_id"),
+                text=extract_text(body, ctx.get("message", {})),
+            )
+        )
+    # A null event reads as missing, as in the typed path.
+    event = body.get("event")
+    return WebhookDelivery(event="" if event is None else str(event).strip(), messages=messages)
+
+
+if msgspec is not None:
+
+    class _TextBody(msgspec.Struct):
+        body: str = ""
+
+    class _ExtendedText(msgspec.Struct):
+        text: str = ""
+
+    class _Media(msgspec.Struct):
+        caption: str = ""
+
+    class _Message(msgspec.Struct):
+        conversation: Optional[str] = None
+        extendedTextMessage: Optional[_ExtendedText] = None
+        text: Union[_TextBody, str, None] = None
+        imageMessage: Optional[_Media] = None
+        videoMessage: Optional[_Media] = None
+
+    class _Key(msgspec.Struct):
+        remoteJid: Optional[str] = None
+        fromMe: Optional[bool] = None
+        id: Optional[str] = None
+
+    class _Entry(msgspec.Struct):
+        key: Optional[_Key] = None
+        message: Optional[_Message] = None
+        text: Union[_TextBody, str, None] = None
+        sender: Optional[str] = msgspec.field(default=None, name="from")
+
+    class _Data(msgspec.Struct):
+        key: Optional[_Key] = None
+        message: Optional[_Message] = None
+        messages: Optional[List[_Entry]] = None
+        sender: Optional[str] = msgspec.field(default=None, name="from")
+
+    class _Payload(msgspec.Struct):
+        event: Optional[str] = None
+        data: Optional[_Data] = None
+        messages: Optional[List[_Entry]] = None
+        sender: Optional[str] = msgspec.field(default=None, name="from")
+        body: Optional[str] = None
+
+    _EMPTY_DATA = _Data()
+    _decoder = msgspec.json.Decoder(_Payload)
+
+    def _entry_message(entry: _Entry) -> Optional[_Message]:
+        if entry.message is not None:
+            return entry.message
+        if isinstance(entry.text, _TextBody):
+            return _Message(text=entry.text)
+        return None
+
+    def _message_text(message: Optional[_Message]) -> str:
+        if message is None:
+            return ""
+        if message.conversation is not None:
+            return message.conversation
+        if message.extendedTextMessage is not None:
+            return message.extendedTextMessage.text
+        if isinstance(message.text, _TextBody):
+            return message.text.body
+        if isinstance(message.text, str):
+            return message.text
+        if message.imageMessage is not None:
+            return message.imageMessage.caption
+        if message.videoMessage is not None:
+            return message.videoMessage.caption
+        return ""
+
+    def _struct_message(payload: _Payload, data: _Data, entry: Optional[_Entry]) -> WebhookMessage:
+        # Mirrors the precedence of _message_context/extract_text.
+        if entry is None:
+            message, key = data.message, (data.key if data.message is not None else None)
+        else:
+            message, key = _entry_message(entry), entry.key
+
+        remote_jid = (data.key.remoteJid if data.key else None) or (key.remoteJid if key else None)
+        if not remote_jid:
+            remote_jid = data.sender or payload.sender
+        if not remote_jid and entry is not None:
+            remote_jid = entry.sender
+
+        from_me = bool(data.key and data.key.fromMe) or bool(key and key.fromMe)
+        message_id = (data.key.id if data.key else None) or (key.id if key else None)
+
+        text = _message_text(message)
+        if not text and payload.body is not None:
+            text = payload.body
+
+        return WebhookMessage(
+            remote_jid=remote_jid or None,
+            from_me=from_me,
+            message_id=message_id or None,
+            text=text.strip(),
+        )
+
+    def _from_struct(payload: _Payload) -> WebhookDelivery:
+        data = payload.data or _EMPTY_DATA
+        entries: List[Optional[_Entry]] = [None]
+        if data.message is None:
+            if data.messages:
+                entries = list(data.messages)
+            elif payload.messages:
+                entries = list(payload.messages)
+
+        return WebhookDelivery(
+            event=(payload.event or "").strip(),
+            messages=[_struct_message(payload, data, entry) for entry in entries],
+        )
+
+    def decode_webhook(raw: bytes) -> WebhookDelivery:
+        try:
+            return _from_struct(_decoder.decode(raw))
+        except msgspec.ValidationError:
+            # Valid JSON in an unexpected shape: let the tolerant path handle it.
+            return _decode_generic(raw)
+        except msgspec.DecodeError as exc:
+            raise InvalidPayloadError(str(exc)) from exc
+
+else:
+
+    def decode_webhook(raw: bytes) -> WebhookDelivery:
+        return _decode_generic(raw)
@@ -1,19 +1,34 @@
+import asyncio
+import hashlib
+import json
 import logging
 import time
-from typing import Any, Dict, Optional
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.security import APIKeyHeader
 from pydantic import BaseModel, Field
 
+from app.core.cache import TTLCache
+from app.api.payloads import InvalidPayloadError, WebhookMessage, decode_webhook
 from app.core.config import settings
+from app.core.deadline import Deadline, deadline_scope
+from app.core.metrics import MESSAGE_OUTCOMES, STAGE_SECONDS, WEBHOOK_REQUESTS
+from app.core.tracing import Trace, activate, current_trace, span, stage
 
 try:
     from app.services.agent import handle_message
 except ImportError:
     handle_message = None
 
+from app.services.admission import DEGRADED_REPLY, AdmissionRejected, admission
 from app.services.ai_service import ai_service
+from app.services.conversation_service import conversation_memory
+from app.services.dedupe import dedupe_store
+from app.services.dispatcher import InboundMessage, MessageDispatcher, QueueFullError
+from app.services.traffic_recorder import traffic_recorder
 from app.services.whatsapp_service import whatsapp_service
 
 API_KEY_NAME = "X-API-Key"
@@ -29,15 +44,15 @@ def get_api_key(api_key_header: str = Depends(api_key_header)) -> str:
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Cache to prevent webhook outgoing loops
-_RECENT_OUTGOING: Dict[tuple[str, str], float] = {}
+# Loop guard: hashes of recent bot replies per contact, so their echoes are ignored.
+_RECENT_OUTGOING: TTLCache[tuple[str, bytes], bool] = TTLCache(
+    ttl=max(1, int(settings.WEBHOOK_LOOP_GUARD_TTL_SEC)),
+    maxsize=settings.WEBHOOK_LOOP_GUARD_MAX_ENTRIES,
+)
 
 
-def _cleanup_recent_outgoing(now_ts: float) -> None:
-    ttl: int = max(1, int(settings.WEBHOOK_LOOP_GUARD_TTL_SEC))
-    expired = [k for k, ts in _RECENT_OUTGOING.items() if (now_ts - ts) > ttl]
-    for k in expired:
-        _RECENT_OUTGOING.pop(k, None)
+def _outgoing_key(remote_jid: str, text: str) -> tuple[str, bytes]:
+    return remote_jid, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
 
 
 def _remember_outgoing(remote_jid: str, text: str) -> None:
@@ -45,9 +60,7 @@ def _remember_outgoing(remote_jid: str, text: str) -> None:
     text = (text or "").strip()
     if not remote_jid or not text:
         return
-    now_ts = time.time()
-    _cleanup_recent_outgoing(now_ts)
-    _RECENT_OUTGOING[(remote_jid, text)] = now_ts
+    _RECENT_OUTGOING.set(_outgoing_key(remote_jid, text), True)
 
 
 def _is_recent_outgoing(remote_jid: str, text: str) -> bool:
@@ -55,91 +68,7 @@ def _is_recent_outgoing(remote_jid: str, text: str) -> bool:
     text = (text or "").strip()
     if not remote_jid or not text:
         return False
-
-    now_ts = time.time()
-    _cleanup_recent_outgoing(now_ts)
-    ts = _RECENT_OUTGOING.get((remote_jid, text))
-    if ts is None:
-        return False
-    return (now_ts - ts) <= max(1, int(settings.WEBHOOK_LOOP_GUARD_TTL_SEC))
-
-
-def _extract_message_context(payload: Dict[str, Any]) -> Dict[str, Any]:
-    """Robust number extraction logic handling nested dictionaries."""
-    data = payload.get("data") if isinstance(payload.get("data"), dict) else {}
-
-    key_obj: Dict[str, Any] = {}
-    message_obj: Dict[str, Any] = {}
-
-    if isinstance(data.get("message"), dict):
-        message_obj = data.get("message", {})
-        key_obj = data.get("key", {}) if isinstance(data.get("key"), dict) else {}
-
-    if (not message_obj) and isinstance(data.get("messages"), list) and data["messages"]:
-        first = data["messages"][0]
-        if isinstance(first, dict):
-            if isinstance(first.get("message"), dict):
-                message_obj = first["message"]
-            elif isinstance(first.get("text"), dict):
-                message_obj = {"text": first["text"]}
-            key_obj = first.get("key", {}) if isinstance(first.get("key"), dict) else {}
-
-    if (not message_obj) and isinstance(payload.get("messages"), list) and payload["messages"]:
-        first = payload["messages"][0]
-        if isinstance(first, dict):
-            if isinstance(first.get("message"), dict):
-                message_obj = first["message"]
-            elif isinstance(first.get("text"), dict):
-                message_obj = {"text": first["text"]}
-            key_obj = first.get("key", {}) if isinstance(first.get("key"), dict) else {}
-
-    remote_jid: Optional[str] = None
-    if isinstance(data.get("key"), dict):
-        remote_jid = data["key"].get("remoteJid")
-    if not remote_jid and isinstance(key_obj, dict):
-        remote_jid = key_obj.get("remoteJid")
-    if not remote_jid:
-        remote_jid = data.get("from") or payload.get("from")
-    if (not remote_jid) and isinstance(payload.get("messages"), list) and payload["messages"]:
-        first = payload["messages"][0]
-        if isinstance(first, dict):
-            remote_jid = first.get("from")
-
-    from_me = False
-    if isinstance(data.get("key"), dict):
-        from_me = bool(data["key"].get("fromMe"))
-    if not from_me and isinstance(key_obj, dict):
-        from_me = bool(key_obj.get("fromMe"))
-
-    return {
-        "data": data,
-        "message": message_obj,
-        "key": key_obj,
-        "remote_jid": remote_jid,
-        "from_me": from_me,
-    }
-
-
-def _extract_text(payload: Dict[str, Any], message_obj: Dict[str, Any]) -> str:
-    text = ""
-
-    if "conversation" in message_obj and isinstance(message_obj.get("conversation"), str):
-        text = message_obj["conversation"]
-    elif isinstance(message_obj.get("extendedTextMessage"), dict):
-        text = message_obj["extendedTextMessage"].get("text", "")
-    elif isinstance(message_obj.get("text"), dict):
-        text = message_obj["text"].get("body", "")
-    elif isinstance(message_obj.get("text"), str):
-        text = message_obj["text"]
-    elif isinstance(message_obj.get("imageMessage"), dict):
-        text = message_obj["imageMessage"].get("caption", "")
-    elif isinstance(message_obj.get("videoMessage"), dict):
-        text = message_obj["videoMessage"].get("caption", "")
-
-    if not text and isinstance(payload.get("body"), str):
-        text = payload["body"]
-
-    return text.strip()
+    return _RECENT_OUTGOING.get(_outgoing_key(remote_jid, text), False) is True
 
 
 class MessageIn(BaseModel):
@@ -148,29 +77,200 @@ class MessageIn(BaseModel):
 
 
 @router.post("/chat")
-async def chat(payload: MessageIn, api_key: str = Depends(get_api_key)) -> Dict[str, Any]:
+async def chat(payload: MessageIn, response: Response, api_key: str = Depends(get_api_key)) -> Dict[str, Any]:
     if handle_message is None:
         raise HTTPException(status_code=503, detail="Lead service unavailable at the moment")
 
-    result = await handle_message(payload.contact_id, payload.text)
+    try:
+        admission.admit(payload.contact_id)
+    except AdmissionRejected as exc:
+        raise _rejected(exc)
+
+    trace = Trace("chat", contact_id=payload.contact_id)
+    response.headers["X-Trace-Id"] = trace.trace_id
+    status = "error"
+    try:
+        with activate(trace):
+            async with admission.slot():
+                result = await handle_message(payload.contact_id, payload.text)
+        status = "ok"
+    finally:
+        admission.release(payload.contact_id)
+        trace.finish(status=status)
     return {"contact_id": payload.contact_id, **result}
 
 
+@router.post("/chat/stream")
+async def chat_stream(
+    payload: MessageIn, request: Request, api_key: str = Depends(get_api_key)
+) -> StreamingResponse:
+    """
+    Server-sent events: one `delta` event per chunk, then `done` with the full
+    reply, or `error` if the upstream stream failed part-way.
+    """
+    try:
+        admission.admit(payload.contact_id)
+    except AdmissionRejected as exc:
+        raise _rejected(exc)
+
+    trace = Trace("chat_stream", contact_id=payload.contact_id)
+    return _AdmittedStream(
+        payload.contact_id,
+        trace,
+        _chat_events(payload, request, trace),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Trace-Id": trace.trace_id},
+    )
+
+
+class _AdmittedStream(StreamingResponse):
+    """
+    Streaming response that gives the contact's admission back however it ends.
+
+    The body generator's own `finally` never runs when the client is gone
+    before the body is iterated, and Starlette skips background tasks on a
+    client disconnect, so the release wraps the whole response instead.
+    """
+
+    def __init__(self, contact_id: str, trace: Trace, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.contact_id = contact_id
+        self.trace = trace
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            admission.release(self.contact_id)
+            # No-op when the body generator already finished the trace.
+            self.trace.finish(status="disconnected")
+
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _chat_events(payload: MessageIn, request: Request, trace: Trace) -> AsyncIterator[str]:
+    # The trace is only activated around awaits, never across a yield: the
+    # generator may be finalised from another context.
+    parts: List[str] = []
+    status = "error"
+    try:
+        if admission.degraded:
+            admission.record_degraded()
+            parts.append(DEGRADED_REPLY)
+            yield _sse({"delta": DEGRADED_REPLY})
+        else:
+            async with admission.slot():
+                with activate(trace), stage("retrieval"):
+                    context = await ai_service.get_context_from_db(payload.text)
+                started = time.perf_counter()
+                try:
+                    async with aclosing(ai_service.stream_response(payload.text, context)) as stream:
+                        async for delta in stream:
+                            if not parts:
+                                trace.add_span("first_token", started, time.perf_counter() - started)
+                            if await request.is_disconnected():
+                                # Leaving the block closes the upstream Gemini stream.
+                                logger.info("Client %s disconnected during stream", payload.contact_id)
+                                status = "disconnected"
+                                return
+                            parts.append(delta)
+                            yield _sse({"delta": delta})
+                except Exception as exc:
+                    # Part of the reply was already sent; it must not be presented as complete.
+                    logger.error("Stream for %s failed part-way: %s", payload.contact_id, exc)
+                    yield _sse({"error": "stream interrupted", "partial": "".join(parts)}, event="error")
+                    return
+                trace.add_span("gemini.stream", started, time.perf_counter() - started)
+        yield _sse({"reply": "".join(parts)}, event="done")
+        status = "ok"
+    finally:
+        # Admission is released by _AdmittedStream.
+        trace.finish(status=status)
+
+
+def _rejected(exc: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=exc.status_code,
+        detail=exc.reason,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 @router.post("/webhook")
 async def webhook_evolution(request: Request) -> Dict[str, Any]:
+    trace = Trace("webhook")
+    received_at = time.time()
+    started = time.perf_counter()
+    with activate(trace), STAGE_SECONDS.time(stage="webhook_request"):
+        try:
+            result = await _handle_delivery(request)
+        except HTTPException as exc:
+            WEBHOOK_REQUESTS.inc(status=str(exc.status_code))
+            trace.finish(status=str(exc.status_code))
+            if traffic_recorder is not None:
+                traffic_recorder.record(
+                    await request.body(), received_at, exc.status_code, str(exc.detail), time.perf_counter() - started
+                )
+            raise
+    if traffic_recorder is not None:
+        traffic_recorder.record(
+            await request.body(), received_at, 200, str(result.get("status")), time.perf_counter() - started
+        )
+    WEBHOOK_REQUESTS.inc(status=str(result.get("status")))
+    if not trace.forks:
+        # Accepted messages report through their own forked traces.
+        trace.finish(status=str(result.get("status")))
+    return result
+
+
+async def _handle_delivery(request: Request) -> Dict[str, Any]:
+    raw = await request.body()
     try:
-        body: Dict[str, Any] = await request.json()
-    except Exception as exc:
+        with stage("parse"):
+            delivery = decode_webhook(raw)
+    except InvalidPayloadError as exc:
         logger.error("Error parsing webhook JSON: %s", exc)
         raise HTTPException(status_code=400, detail="Invalid JSON payload")
 
-    event_raw = str(body.get("event", "")).strip()
+    event_raw = delivery.event
     event_norm = event_raw.lower().replace("_", ".")
     if event_raw and event_norm != "messages.upsert":
         return {"status": "ignored event"}
 
-    ctx = _extract_message_context(body)
-    remote_jid = str(ctx.get("remote_jid") or "").strip()
+    results: List[Optional[Dict[str, Any]]] = []
+    accepted: List[tuple[int, InboundMessage]] = []
+    for index, message in enumerate(delivery.messages):
+        screened = await _screen_message(message)
+        if isinstance(screened, InboundMessage):
+            accepted.append((index, screened))
+            results.append(None)
+        else:
+            results.append(screened)
+            MESSAGE_OUTCOMES.inc(outcome=screened["status"].replace(" ", "_"))
+
+    if accepted:
+        if dispatcher.running:
+            # The bounded queue is the backpressure here; admission happens at pickup.
+            await _enqueue([inbound for _, inbound in accepted])
+            outcomes: List[Dict[str, Any]] = [{"status": "queued"}] * len(accepted)
+        else:
+            await _admit([inbound for _, inbound in accepted])
+            outcomes = await _process_inline([inbound for _, inbound in accepted])
+        for (index, _), outcome in zip(accepted, outcomes):
+            results[index] = outcome
+
+    if len(results) == 1:
+        return results[0] or {"status": "error"}
+    final = [r or {"status": "error"} for r in results]
+    return {"status": _aggregate_status(final), "results": final}
+
+
+async def _screen_message(message: WebhookMessage) -> Union[InboundMessage, Dict[str, Any]]:
+    """Per-message filters. Returns the message to process or the reason it was ignored."""
+    remote_jid = (message.remote_jid or "").strip()
 
     if not remote_jid:
         logger.warning("remoteJid not found in payload")
@@ -185,28 +285,190 @@ async def webhook_evolution(request: Request) -> Dict[str, Any]:
             logger.info("Bypass @lid without test number: %s", remote_jid)
             return {"status": "ignored @lid bypass"}
 
-    text = _extract_text(body, ctx.get("message", {}))
+    text = message.text
     if not text:
         logger.info("No text extracted from message")
         return {"status": "ignored no text"}
 
-    if ctx.get("from_me") is True:
-        if _is_recent_outgoing(remote_jid, text):
+    if message.from_me:
+        with stage("loop_guard"):
+            is_echo = _is_recent_outgoing(remote_jid, text)
+        if is_echo:
             logger.info("Bot echo message ignored for %s", remote_jid)
             return {"status": "ignored bot echo"}
         if not settings.ALLOW_FROM_ME_TEST:
             return {"status": "ignored fromMe"}
 
-    logger.info("Message received from %s: %s", remote_jid, text)
-
+    # Evolution redelivers on timeouts; drop anything already accepted.
+    dedupe_key = f"{message.remote_jid}:{message.message_id}" if message.message_id else None
+    if dedupe_key:
+        with span("dedupe"):
+            duplicate = await dedupe_store.check_and_mark(dedupe_key)
+        if duplicate:
+            logger.info("Duplicate delivery ignored for %s (%s)", remote_jid, message.message_id)
+            return {"status": "ignored duplicate"}
+
+    parent = current_trace()
+    trace = parent.fork("message", remote_jid=remote_jid, message_id=message.message_id) if parent else None
+    logger.info("Message received from %s [%s]: %s", remote_jid, trace.trace_id if trace else "-", text)
+    return InboundMessage(remote_jid=remote_jid, text=text, dedupe_key=dedupe_key, trace=trace)
+
+
+async def _forget(messages: List[InboundMessage]) -> None:
+    """Undo dedupe for messages we are about to reject."""
+    for inbound in messages:
+        if inbound.dedupe_key:
+            # Let the redelivery through once there is room again.
+            await dedupe_store.discard(inbound.dedupe_key)
+
+
+async def _admit(messages: List[InboundMessage]) -> None:
+    """All-or-nothing admission of a delivery; sheds it with 429/503 when saturated."""
+    for position, inbound in enumerate(messages):
+        try:
+            admission.admit(inbound.remote_jid)
+        except AdmissionRejected as exc:
+            logger.warning("Shedding webhook delivery from %s: %s", inbound.remote_jid, exc.reason)
+            for admitted in messages[:position]:
+                admission.release(admitted.remote_jid)
+            # The whole delivery is rejected, so all of it must get through on redelivery.
+            await _forget(messages)
+            raise _rejected(exc)
+
+
+async def _enqueue(messages: List[InboundMessage]) -> None:
+    for position, inbound in enumerate(messages):
+        try:
+            dispatcher.submit(inbound)
+        except QueueFullError as exc:
+            logger.warning("Webhook queue full, rejecting message from %s: %s", inbound.remote_jid, exc)
+            # Messages queued before this one are recognised as duplicates on redelivery.
+            await _forget(messages[position:])
+            raise HTTPException(
+                status_code=503,
+                detail="Webhook queue full",
+                headers={"Retry-After": str(admission.retry_after)},
+            )
+
+
+async def _process_inline(messages: List[InboundMessage]) -> List[Dict[str, Any]]:
+    """Contacts run concurrently; each contact's messages run in delivery order."""
+    by_contact: Dict[str, List[int]] = {}
+    for index, inbound in enumerate(messages):
+        by_contact.setdefault(inbound.remote_jid, []).append(index)
+
+    results: List[Dict[str, Any]] = [{"status": "error"}] * len(messages)
+
+    async def _run_contact(indexes: List[int]) -> None:
+        for index in indexes:
+            inbound = messages[index]
+            try:
+                results[index] = await _process_messages(inbound.remote_jid, [inbound])
+            finally:
+                admission.release(inbound.remote_jid)
+
+    await asyncio.gather(*(_run_contact(indexes) for indexes in by_contact.values()))
+    return results
+
+
+def _aggregate_status(results: List[Dict[str, Any]]) -> str:
+    statuses = {r.get("status") for r in results}
+    if len(statuses) == 1:
+        return str(statuses.pop())
+    if "error" in statuses:
+        return "partial"
+    for status in ("processed", "queued"):
+        if status in statuses:
+            return status
+    return "ignored"
+
+
+def _overloaded() -> bool:
+    """
+    Whether to answer with the canned reply instead of retrieval + Gemini.
+
+    In dispatcher mode admission only sees the batches workers picked up, so
+    the backlog waiting in the dispatcher counts towards
+    ADMISSION_DEGRADE_WAITING as well.
+    """
+    if admission.degraded:
+        return True
+    threshold = admission.degrade_waiting
+    return threshold > 0 and dispatcher.running and dispatcher.pending >= threshold
+
+
+async def _process_batch(remote_jid: str, messages: List[InboundMessage]) -> Dict[str, Any]:
+    """
+    Dispatcher handler: a batch is admitted as one unit when a worker picks it up.
+
+    Messages waiting in a mailbox or coalescing window are bounded by
+    WEBHOOK_QUEUE_MAXSIZE instead, so a burst meant to be merged is neither
+    shed per contact nor counted as waiting work.
+    """
     try:
-        context = await ai_service.get_context_from_db(text)
-        ai_response = await ai_service.generate_response(text, context)
-
-        await whatsapp_service.send_message(remote_jid, ai_response)
-        _remember_outgoing(remote_jid, ai_response)
-
-        return {"status": "processed", "reply": ai_response}
-    except Exception as exc:
-        logger.error("Error processing webhook message: %s", exc)
-        return {"status": "error"}
+        admission.admit(remote_jid)
+    except AdmissionRejected as exc:
+        # Already acknowledged to Evolution, so it can no longer be shed.
+        logger.warning("Admission full at pickup for %s (%s); sending degraded reply", remote_jid, exc.reason)
+        return await _process_messages(remote_jid, messages, degraded=True)
+    try:
+        return await _process_messages(remote_jid, messages)
+    finally:
+        admission.release(remote_jid)
+
+
+async def _process_messages(
+    remote_jid: str, messages: List[InboundMessage], degraded: bool = False
+) -> Dict[str, Any]:
+    """Retrieval, generation and send for a burst of messages from one contact."""
+    text = "\n".join(m.text for m in messages)
+    if len(messages) > 1:
+        logger.info("Coalesced %s messages from %s", len(messages), remote_jid)
+
+    trace = messages[0].trace or Trace("message", remote_jid=remote_jid)
+    if len(messages) > 1:
+        trace.attrs["coalesced"] = [m.trace.trace_id for m in messages[1:] if m.trace]
+    waited = time.monotonic() - messages[0].received_at
+    trace.add_span("queue_wait", time.perf_counter() - waited, waited)
+
+    result: Dict[str, Any] = {"status": "error"}
+    # The budget starts when processing starts, after any coalescing wait.
+    with activate(trace), deadline_scope(Deadline(settings.MESSAGE_DEADLINE_SEC)):
+        try:
+            if degraded or _overloaded():
+                ai_response = DEGRADED_REPLY
+                admission.record_degraded()
+            else:
+                async with admission.slot():
+                    history = ""
+                    if settings.CONVERSATION_MEMORY_ENABLED:
+                        with stage("memory"):
+                            history = (await conversation_memory.history(remote_jid)).render()
+                    with stage("retrieval"):
+                        context = await ai_service.get_context_from_db(text)
+                    with stage("generation"):
+                        ai_response = await ai_service.generate_response(text, context, history=history)
+
+            with stage("send"):
+                await whatsapp_service.send_message(remote_jid, ai_response)
+            _remember_outgoing(remote_jid, ai_response)
+            if settings.CONVERSATION_MEMORY_ENABLED:
+                await conversation_memory.record(remote_jid, text, ai_response)
+
+            result = {"status": "processed", "reply": ai_response}
+        except Exception as exc:
+            logger.error("Error processing webhook message [%s]: %s", trace.trace_id, exc)
+        finally:
+            MESSAGE_OUTCOMES.inc(len(messages), outcome=result["status"])
+            trace.finish(status=result["status"])
+    return result
+
+
+# Started/stopped by the application lifespan; without it messages are processed inline.
+dispatcher = MessageDispatcher(
+    _process_batch,
+    workers=settings.WEBHOOK_WORKERS,
+    max_queue=settings.WEBHOOK_QUEUE_MAXSIZE,
+    coalesce_window=settings.WEBHOOK_COALESCE_WINDOW_MS / 1000,
+    coalesce_max_wait=settings.WEBHOOK_COALESCE_MAX_WAIT_MS / 1000,
+)
@@ -0,0 +1,114 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Bounded mapping whose entries expire `ttl` seconds after being written.
+
+    Entries are kept in write order, so with a fixed TTL the oldest entry is
+    always at the front and expiry pops from the front in amortized O(1).
+    `maxsize` is a hard cap; when it is hit the oldest entry is evicted.
+
+    With `lru=True` reads move entries to the back, turning eviction into
+    least-recently-used. Expired entries are then also dropped lazily on read.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        maxsize: int,
+        lru: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl: float = ttl
+        self.maxsize: int = max(1, maxsize)
+        self.lru: bool = lru
+        self._clock = clock
+        self._data: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+
+    def _expire(self, now: float) -> None:
+        data = self._data
+        while data:
+            key, (expires_at, _) = next(iter(data.items()))
+            if expires_at > now:
+                break
+            del data[key]
+            self.expirations += 1
+
+    def _lookup(self, key: K, now: float) -> Optional[Tuple[float, V]]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[0] <= now:
+            del self._data[key]
+            self.expirations += 1
+            return None
+        return item
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        now = self._clock()
+        self._expire(now)
+        item = self._lookup(key, now)
+        if item is None:
+            self.misses += 1
+            return default
+        if self.lru:
+            self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: K, value: V) -> None:
+        now = self._clock()
+        self._expire(now)
+        # Re-inserting moves the key to the back, keeping write order intact.
+        self._data.pop(key, None)
+        self._data[key] = (now + self.ttl, value)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def add(self, key: K, value: V) -> bool:
+        """Store `value` unless a live entry exists. Returns True if it was stored."""
+        now = self._clock()
+        self._expire(now)
+        if self._lookup(key, now) is not None:
+            self.hits += 1
+            return False
+        self.misses += 1
+        self.set(key, value)
+        return True
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __contains__(self, key: object) -> bool:
+        item = self._data.get(key)  # type: ignore[arg-type]
+        return item is not None and item[0] > self._clock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -19,6 +19,8 @@ class Settings(BaseSettings):
     API_KEY_EVOLUTION: str = ""
     EVOLUTION_INSTANCE: str = ""
     GEMINI_API_KEY: str = ""
+    # Override the Gemini API endpoint, e.g. the local stand-in (python -m app.standins).
+    GEMINI_BASE_URL: str = ""
     WHATSAPP_TEST_NUMBER: str = ""
     WHATSAPP_BOT_NUMBER: str = ""
     CHAT_API_KEY: str = ""
@@ -27,6 +29,98 @@ class Settings(BaseSettings):
     CHROMA_K: int = 4
     ALLOW_FROM_ME_TEST: bool = True
     WEBHOOK_LOOP_GUARD_TTL_SEC: int = 30
+    WEBHOOK_LOOP_GUARD_MAX_ENTRIES: int = 20000
+    WEBHOOK_WORKERS: int = 4
+    WEBHOOK_QUEUE_MAXSIZE: int = 1000
+    WEBHOOK_COALESCE_WINDOW_MS: int = 1500
+    WEBHOOK_COALESCE_MAX_WAIT_MS: int = 5000
+    WEBHOOK_DEDUPE_BACKEND: str = "memory"
+    WEBHOOK_DEDUPE_TTL_SEC: int = 900
+    WEBHOOK_DEDUPE_MAX_ENTRIES: int = 50000
+    WEBHOOK_DEDUPE_DB_PATH: str = "data/webhook_dedupe.sqlite3"
+
+    ADMISSION_MAX_INFLIGHT: int = 8
+    ADMISSION_MAX_WAITING: int = 200
+    ADMISSION_MAX_PER_CONTACT: int = 5
+    ADMISSION_RETRY_AFTER_SEC: int = 5
+    ADMISSION_DEGRADE_WAITING: int = 100
+    ADMISSION_DEGRADED_MODE: bool = False
+
+    # Traces slower than this are appended to TRACE_SLOW_FILE (negative disables).
+    TRACE_SLOW_THRESHOLD_MS: float = 2000
+    TRACE_SLOW_FILE: str = "data/traces/slow_traces.jsonl"
+    TRACE_SLOW_MAX_BYTES: int = 10_000_000
+    TRACE_SLOW_BACKUP_COUNT: int = 5
+
+    # Opt-in recording of raw webhook deliveries for scripts/replay_webhook.py.
+    WEBHOOK_RECORD_ENABLED: bool = False
+    WEBHOOK_RECORD_DIR: str = "data/recordings"
+    WEBHOOK_RECORD_MAX_BYTES: int = 50_000_000
+    WEBHOOK_RECORD_BACKUP_COUNT: int = 20
+    # Comma-separated redaction hooks: "default", "none" or "package.module:function".
+    WEBHOOK_RECORD_REDACT: str = "default"
+    # Key for the "default" hook's pseudonyms; when empty a random per-process key is used.
+    WEBHOOK_RECORD_SALT: str = ""
+
+    # Concurrent Gemini calls and the per-call timeout.
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_TIMEOUT_SEC: float = 30
+
+    # End-to-end budget per webhook message; retrieval, LLM and send get what is left.
+    MESSAGE_DEADLINE_SEC: float = 25
+    RETRIEVAL_TIMEOUT_SEC: float = 3
+    SEND_TIMEOUT_SEC: float = 10
+    SEND_MIN_TIMEOUT_SEC: float = 2
+
+    # The LLM is skipped for LLM_BREAKER_COOLDOWN_SEC after this many failed or slow calls in a row.
+    LLM_BREAKER_FAILURES: int = 5
+    LLM_BREAKER_SLOW_CALL_SEC: float = 15
+    LLM_BREAKER_COOLDOWN_SEC: float = 30
+
+    # Retrieved chunks are deduplicated and trimmed to this many (estimated) tokens; 0 disables the budget.
+    CONTEXT_TOKEN_BUDGET: int = 800
+    CONTEXT_DEDUPE_THRESHOLD: float = 0.85
+
+    # Per-contact conversation memory: last N turns plus a rolling summary of older ones.
+    # Only follow-up questions are sent with it; self-contained ones keep using the answer cache.
+    CONVERSATION_MEMORY_ENABLED: bool = True
+    CONVERSATION_MAX_TURNS: int = 8
+    CONVERSATION_TURN_MAX_CHARS: int = 500
+    CONVERSATION_SUMMARY_MAX_CHARS: int = 1200
+    CONVERSATION_MAX_CONTACTS: int = 5000
+
+    # "chroma" or "numpy" (memory-mapped index built by scripts/build_vector_index.py).
+    RETRIEVAL_BACKEND: str = "chroma"
+    VECTOR_INDEX_DIR: str = "data/vector_index"
+    # "vector", "lexical" (BM25 only, no embedding model) or "hybrid" (reciprocal rank fusion).
+    RETRIEVAL_MODE: str = "vector"
+    LEXICAL_INDEX_PATH: str = "data/lexical_index.json"
+    HYBRID_RRF_K: int = 60
+    HYBRID_LEXICAL_WEIGHT: float = 1.0
+
+    # Unix socket of `python -m app.services.retrieval_sidecar`; empty keeps retrieval in-process.
+    RETRIEVAL_SIDECAR_SOCKET: str = ""
+    RETRIEVAL_SIDECAR_TIMEOUT_SEC: float = 5.0
+
+    # Query embeddings requested within EMBEDDING_BATCH_MAX_WAIT_MS share one encoder call.
+    EMBEDDING_BATCH_ENABLED: bool = True
+    EMBEDDING_BATCH_MAX_SIZE: int = 32
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
+
+    # Concurrent identical retrievals and Gemini prompts share one in-flight call.
+    SINGLEFLIGHT_ENABLED: bool = True
+
+    # Chroma results keyed on the normalized query text and CHROMA_K.
+    RETRIEVAL_CACHE_ENABLED: bool = True
+    RETRIEVAL_CACHE_TTL_SEC: int = 600
+    RETRIEVAL_CACHE_MAX_ENTRIES: int = 2000
+
+    # Answers are reused for questions at least this similar (cosine) with the same retrieved context.
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    SEMANTIC_CACHE_TTL_SEC: int = 3600
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000
+    KNOWLEDGE_VERSION_CHECK_SEC: float = 10
 
     CORS_ORIGINS: List[str] = []
 
@@ -0,0 +1,50 @@
+"""
+End-to-end time budget for one unit of work.
+
+A `Deadline` is bound to the current context with `deadline_scope()`; the
+retrieval, LLM and send steps below it size their own timeouts with
+`time_left()`, so a slow early step leaves less time to the later ones
+instead of every step waiting for its full individual timeout.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+_current: ContextVar[Optional["Deadline"]] = ContextVar("corretor_deadline", default=None)
+
+
+class Deadline:
+    def __init__(self, budget: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self.budget: float = budget
+        self.expires_at: float = clock() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline) -> Iterator[Deadline]:
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def time_left(cap: float, floor: float = 0.0) -> float:
+    """Timeout for the next step: `cap`, shortened to what is left of the current deadline."""
+    deadline = _current.get()
+    if deadline is None:
+        return cap
+    return max(floor, min(cap, deadline.remaining()))
@@ -0,0 +1,271 @@
+"""
+Minimal Prometheus-compatible metrics (text exposition format 0.0.4).
+
+Only what the hot path needs: counters, gauges and histograms with labels,
+rendered by `/metrics`. Kept in-process and dependency free.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._labels(k)} {_format_value(v)}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._labels(k)} {_format_value(v)}" for k, v in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        item = self._values.get(self._key(labels))
+        return item[2] if item else 0
+
+    def _samples(self) -> List[str]:
+        lines: List[str] = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{self._labels(key, le)} {cumulative}")
+            le_inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{self._labels(key, le_inf)} {count}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "corretor_stage_duration_seconds",
+    "Latency of each stage of the message hot path.",
+    ["stage"],
+)
+WEBHOOK_REQUESTS = REGISTRY.counter(
+    "corretor_webhook_requests_total",
+    "Webhook deliveries by aggregated status.",
+    ["status"],
+)
+MESSAGE_OUTCOMES = REGISTRY.counter(
+    "corretor_messages_total",
+    "Inbound messages by outcome.",
+    ["outcome"],
+)
+LLM_INFLIGHT = REGISTRY.gauge(
+    "corretor_llm_inflight",
+    "Gemini calls currently in flight.",
+)
+LLM_WAITING = REGISTRY.gauge(
+    "corretor_llm_waiting",
+    "Gemini calls waiting for an LLM concurrency slot.",
+)
+LLM_CALLS = REGISTRY.counter(
+    "corretor_llm_calls_total",
+    "Gemini calls by result (ok/error/timeout/deadline/shed/short_circuit).",
+    ["result"],
+)
+LLM_CIRCUIT_OPEN = REGISTRY.gauge(
+    "corretor_llm_circuit_open",
+    "1 while the Gemini circuit breaker is open or half-open.",
+)
+THREADPOOL_QUEUE = REGISTRY.gauge(
+    "corretor_threadpool_queue_depth",
+    "Work items waiting in the default asyncio thread pool.",
+)
+WEBHOOK_QUEUE_DEPTH = REGISTRY.gauge(
+    "corretor_webhook_queue_depth",
+    "Messages queued in the webhook dispatcher.",
+)
+ADMISSION_INFLIGHT = REGISTRY.gauge(
+    "corretor_admission_inflight",
+    "Units of work holding an admission slot.",
+)
+ADMISSION_WAITING = REGISTRY.gauge(
+    "corretor_admission_waiting",
+    "Admitted units of work waiting for a slot.",
+)
+SHED_REQUESTS = REGISTRY.counter(
+    "corretor_shed_total",
+    "Work shed by admission control or the LLM slot queue.",
+    ["reason"],
+)
+DEGRADED_REPLIES = REGISTRY.counter(
+    "corretor_degraded_replies_total",
+    "Replies served from the canned template instead of the LLM.",
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "corretor_cache_lookups_total",
+    "Cache lookups by cache and result (hit/miss).",
+    ["cache", "result"],
+)
+STARTUP_SECONDS = REGISTRY.gauge(
+    "corretor_startup_seconds",
+    "Time spent in each startup phase (lifespan, llm_client, retrieval_client, warmup, ready).",
+    ["phase"],
+)
+SINGLEFLIGHT_CALLS = REGISTRY.counter(
+    "corretor_singleflight_calls_total",
+    "Coalesced calls by operation and role (leader ran the call, shared reused one in flight).",
+    ["op", "result"],
+)
+EMBEDDING_BATCH_SIZE = REGISTRY.histogram(
+    "corretor_embedding_batch_size",
+    "Distinct texts per query-embedding batch.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+EMBEDDING_BATCH_SECONDS = REGISTRY.histogram(
+    "corretor_embedding_batch_seconds",
+    "Encoder time per query-embedding batch.",
+)
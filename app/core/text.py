@@ -0,0 +1,13 @@
+import re
+import unicodedata
+
+_PUNCTUATION = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+def normalize_text(text: str, strip_punctuation: bool = False) -> str:
+    """Casefold, strip accents and collapse whitespace ("  Olá,  Preço " -> "ola, preco")."""
+    decomposed = unicodedata.normalize("NFKD", (text or "").casefold())
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    if strip_punctuation:
+        stripped = _PUNCTUATION.sub(" ", stripped)
+    return " ".join(stripped.split())
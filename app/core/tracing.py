@@ -0,0 +1,215 @@
+"""
+Per-request tracing with slow-request sampling.
+
+A `Trace` is bound to the current context with `activate()`; code anywhere
+below it (including `asyncio.to_thread` calls, which copy the context)
+records timed steps with `span()`. Recording a span is a list append, so
+tracing every request is cheap. Only traces slower than
+`TRACE_SLOW_THRESHOLD_MS` are serialised, to a rotating local JSONL file,
+by a background thread.
+"""
+
+import functools
+import inspect
+import json
+import logging
+import queue
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("corretor_trace", default=None)
+
+
+class Trace:
+    def __init__(self, name: str, **attrs: Any) -> None:
+        self.trace_id: str = uuid.uuid4().hex[:16]
+        self.name: str = name
+        self.attrs: Dict[str, Any] = dict(attrs)
+        self.started_at: float = time.time()
+        self._start: float = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.duration: Optional[float] = None
+        self.forks: int = 0
+
+    def add_span(self, name: str, start: float, duration: float, **attrs: Any) -> None:
+        self.spans.append(
+            {
+                "name": name,
+                "offset_ms": round((start - self._start) * 1000, 3),
+                "duration_ms": round(duration * 1000, 3),
+                **attrs,
+            }
+        )
+
+    def fork(self, name: str, **attrs: Any) -> "Trace":
+        """New trace id that inherits the start time and spans recorded so far."""
+        child = Trace(name, **{**self.attrs, **attrs, "parent_id": self.trace_id})
+        child.started_at = self.started_at
+        child._start = self._start
+        child.spans = list(self.spans)
+        self.forks += 1
+        return child
+
+    def finish(self, **attrs: Any) -> None:
+        if self.duration is not None:
+            return
+        self.attrs.update(attrs)
+        self.duration = time.perf_counter() - self._start
+        slow_traces.offer(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "attrs": dict(self.attrs),
+            "spans": list(self.spans),
+        }
+
+
+class _Deferred(QueueHandler):
+    """Queue the record untouched; the formatter runs on the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _TraceFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, ensure_ascii=False, default=str)
+
+
+class SlowTraceSink:
+    """
+    Writes traces slower than `threshold_ms` to a size-rotated JSONL file.
+
+    Serialisation and file writes (rotation included) run on a listener
+    thread, so a slow request only pays for a queue put.
+    """
+
+    def __init__(self, path: str, threshold_ms: float, max_bytes: int, backup_count: int) -> None:
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.written: int = 0
+        self._handler: Optional[QueueHandler] = None
+        self._listener: Optional[QueueListener] = None
+
+    def _queue(self) -> QueueHandler:
+        if self._handler is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                self.path, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding="utf-8"
+            )
+            handler.setFormatter(_TraceFormatter())
+            records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+            self._listener = QueueListener(records, handler)
+            self._listener.start()
+            self._handler = _Deferred(records)
+        return self._handler
+
+    def offer(self, trace: Trace) -> None:
+        if self.threshold_ms < 0 or trace.duration is None:
+            return
+        if trace.duration * 1000 < self.threshold_ms:
+            return
+        try:
+            self._queue().emit(logging.makeLogRecord({"msg": trace.to_dict()}))
+            self.written += 1
+        except Exception as exc:
+            logger.error("Error writing slow trace %s: %s", trace.trace_id, exc)
+
+    def close(self) -> None:
+        """Write out queued traces and close the file (shutdown and tests)."""
+        listener, self._listener, self._handler = self._listener, None, None
+        if listener is not None:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+
+
+slow_traces = SlowTraceSink(
+    settings.TRACE_SLOW_FILE,
+    threshold_ms=settings.TRACE_SLOW_THRESHOLD_MS,
+    max_bytes=settings.TRACE_SLOW_MAX_BYTES,
+    backup_count=settings.TRACE_SLOW_BACKUP_COUNT,
+)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current.get()
+    return trace.trace_id if trace is not None else None
+
+
+@contextmanager
+def activate(trace: Trace) -> Iterator[Trace]:
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[None]:
+    """Record a timed step on the current trace, if any."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as exc:
+        attrs["error"] = type(exc).__name__
+        raise
+    finally:
+        trace.add_span(name, start, time.perf_counter() - start, **attrs)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator recording every call of a sync or async function as a span."""
+
+    def decorator(func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """A hot-path stage: feeds the stage latency histogram and the current trace."""
+    with STAGE_SECONDS.time(stage=name), span(name):
+        yield
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import String, Text, DateTime, func
+from sqlalchemy import Integer, String, Text, DateTime, func
 from datetime import datetime
 
 class Base(DeclarativeBase):
@@ -13,3 +13,16 @@ class Lead(Base):
     stage: Mapped[str] = mapped_column(String(40), default="novo")
     profile_json: Mapped[str] = mapped_column(Text, default="{}")
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+class Conversation(Base):
+    __tablename__ = "conversations"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    contact_id: Mapped[str] = mapped_column(String(80), unique=True, index=True)
+    # Most recent turns only (bounded ring buffer) as JSON [[role, text], ...].
+    turns_json: Mapped[str] = mapped_column(Text, default="[]")
+    summary: Mapped[str] = mapped_column(Text, default="")
+    turn_count: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
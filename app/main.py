@@ -1,12 +1,21 @@
 import logging
+import time
 from contextlib import asynccontextmanager
 from typing import Any, Dict
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from app.api.ops import router as ops_router
+from app.api.webhook import dispatcher
 from app.api.webhook import router as webhook_router
 from app.core.config import settings
+from app.core.metrics import STARTUP_SECONDS
+from app.core.tracing import slow_traces
+from app.services.ai_service import ai_service
+from app.services.conversation_service import conversation_memory
+from app.services.traffic_recorder import traffic_recorder
 
 try:
     from app.db.init_db import init_db
@@ -17,9 +26,23 @@ except Exception as exc:
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
+    started = time.perf_counter()
     if init_db is not None:
         await init_db()
+    await dispatcher.start()
+    # Gemini and Chroma warm up in the background; /ready reports when they are done.
+    warmup = ai_service.start_warmup()
+    warmup.add_done_callback(
+        lambda _: STARTUP_SECONDS.set(time.perf_counter() - started, phase="ready")
+    )
+    STARTUP_SECONDS.set(time.perf_counter() - started, phase="lifespan")
     yield
+    await dispatcher.stop()
+    await conversation_memory.wait_idle()
+    ai_service.shutdown()
+    if traffic_recorder is not None:
+        traffic_recorder.close()
+    slow_traces.close()
 
 
 app = FastAPI(title="CorretorIA - MVP", lifespan=lifespan)
@@ -38,12 +61,40 @@ async def health() -> Dict[str, Any]:
     return {"ok": True}
 
 
+def _component_ready(name: str, state: str) -> bool:
+    if state == "warm":
+        return True
+    # Without a Gemini key the LLM is off by configuration and replies come from retrieval.
+    return name == "llm" and state == "unavailable" and not settings.GEMINI_API_KEY
+
+
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    """
+    Readiness probe: 200 once warm-up has finished with every component warm
+    (a Gemini client left unconfigured on purpose is fine) and, when
+    WEBHOOK_WORKERS is set, the dispatcher is running; 503 otherwise.
+    """
+    components = ai_service.readiness()
+    dispatcher_ok = dispatcher.running or dispatcher.workers <= 0
+    is_ready = (
+        ai_service.warm
+        and dispatcher_ok
+        and all(_component_ready(name, state) for name, state in components.items())
+    )
+    return JSONResponse(
+        {"ready": is_ready, "dispatcher": dispatcher.running, **components},
+        status_code=200 if is_ready else 503,
+    )
+
+
 @app.get("/")
 async def root() -> Dict[str, Any]:
     return {"name": "CorretorIA", "status": "running", "docs": "/docs"}
 
 
 app.include_router(webhook_router)
+app.include_router(ops_router)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict
+
+from app.core.config import settings
+from app.core.metrics import DEGRADED_REPLIES, SHED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+DEGRADED_REPLY = (
+    "Recebi a tua mensagem! Estou com muitos atendimentos neste momento, "
+    "mas já te respondo com todos os detalhes. 😊"
+)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Admission control and load shedding for the retrieval + LLM section.
+
+    Requests are admitted up front with `admit()`: at most
+    `max_inflight + max_waiting` units of work may be admitted and unfinished
+    at once (503 beyond that) and at most `max_per_contact` per contact (429).
+    Admitted work then runs inside `slot()`, which lets `max_inflight` run
+    concurrently and queues the rest in FIFO order. When the wait queue
+    reaches `degrade_waiting` the pipeline switches to a canned reply.
+    """
+
+    def __init__(
+        self,
+        max_inflight: int,
+        max_waiting: int,
+        max_per_contact: int,
+        retry_after: int,
+        degrade_waiting: int = 0,
+    ) -> None:
+        self.max_inflight: int = max(1, max_inflight)
+        self.max_waiting: int = max(0, max_waiting)
+        self.max_per_contact: int = max(1, max_per_contact)
+        self.retry_after: int = max(1, retry_after)
+        self.degrade_waiting: int = max(0, degrade_waiting)
+        self.force_degraded: bool = False
+
+        self.admitted: int = 0
+        self.inflight: int = 0
+        self._per_contact: Dict[str, int] = {}
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        self.shed_global: int = 0
+        self.shed_contact: int = 0
+        self.degraded_replies: int = 0
+
+    @property
+    def waiting(self) -> int:
+        return max(0, self.admitted - self.inflight)
+
+    @property
+    def degraded(self) -> bool:
+        if self.force_degraded:
+            return True
+        return self.degrade_waiting > 0 and self.waiting >= self.degrade_waiting
+
+    def record_degraded(self) -> None:
+        self.degraded_replies += 1
+        DEGRADED_REPLIES.inc()
+
+    def admit(self, contact_id: str) -> None:
+        if self.admitted >= self.max_inflight + self.max_waiting:
+            self.shed_global += 1
+            SHED_REQUESTS.inc(reason="global")
+            raise AdmissionRejected(503, "Server busy", self.retry_after)
+        if self._per_contact.get(contact_id, 0) >= self.max_per_contact:
+            self.shed_contact += 1
+            SHED_REQUESTS.inc(reason="contact")
+            raise AdmissionRejected(429, "Too many pending messages for this contact", self.retry_after)
+        self.admitted += 1
+        self._per_contact[contact_id] = self._per_contact.get(contact_id, 0) + 1
+
+    def release(self, contact_id: str) -> None:
+        count = self._per_contact.get(contact_id, 0)
+        if count <= 0:
+            return
+        self.admitted -= 1
+        if count == 1:
+            del self._per_contact[contact_id]
+        else:
+            self._per_contact[contact_id] = count - 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._release_slot()
+
+    async def _acquire(self) -> None:
+        if self.inflight < self.max_inflight and not self._waiters:
+            self.inflight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation.
+                self._release_slot()
+            else:
+                self._waiters.remove(future)
+            raise
+
+    def _release_slot(self) -> None:
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                # Hand the slot straight to the next waiter; inflight is unchanged.
+                future.set_result(None)
+                return
+        self.inflight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_inflight": self.max_inflight,
+            "max_waiting": self.max_waiting,
+            "max_per_contact": self.max_per_contact,
+            "admitted": self.admitted,
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "contacts": len(self._per_contact),
+            "degraded": self.degraded,
+            "degraded_replies": self.degraded_replies,
+            "shed": {"global": self.shed_global, "contact": self.shed_contact},
+        }
+
+
+admission = AdmissionController(
+    max_inflight=settings.ADMISSION_MAX_INFLIGHT,
+    max_waiting=settings.ADMISSION_MAX_WAITING,
+    max_per_contact=settings.ADMISSION_MAX_PER_CONTACT,
+    retry_after=settings.ADMISSION_RETRY_AFTER_SEC,
+    degrade_waiting=settings.ADMISSION_DEGRADE_WAITING,
+)
+admission.force_degraded = settings.ADMISSION_DEGRADED_MODE
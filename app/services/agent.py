@@ -1,5 +1,6 @@
 import json
 
+from app.core.tracing import traced
 from app.services.catalog import match_properties
 from app.services.lead_service import get_or_create_lead, set_stage, update_profile
 
@@ -27,6 +28,7 @@ def _contains_yes(text: str) -> bool | None:
     return None
 
 
+@traced("agent.handle_message")
 async def handle_message(contact_id: str, text: str) -> dict:
     lead = await get_or_create_lead(contact_id)
     profile = json.loads(lead.profile_json or "{}")
@@ -1,17 +1,35 @@
 import asyncio
+import contextvars
 import logging
-import sys
-from typing import Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
 
+from app.core.cache import TTLCache
 from app.core.config import settings
-
-try:
-    import google.genai as google_genai
-except ImportError:
-    google_genai = None  # type: ignore
+from app.core.deadline import time_left
+from app.core.metrics import (
+    CACHE_LOOKUPS,
+    LLM_CALLS,
+    LLM_INFLIGHT,
+    LLM_WAITING,
+    SHED_REQUESTS,
+    STARTUP_SECONDS,
+)
+from app.core.text import normalize_text
+from app.core.tracing import span, traced
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.context_builder import STOPWORDS, build_context
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.retrieval import CHROMA_COLLECTION, CHROMA_PATH, RetrievalBackend, Version, build_retrieval_backend
+from app.services.semantic_cache import SemanticCache, context_fingerprint
+from app.services.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 MASTER_PROMPT = """És um corretor de imóveis de luxo da Riva Incorporadora, a conversar com um cliente pelo WhatsApp.
 O teu tom de voz é 100% natural, empático, persuasivo e leve.
 REGRAS:
@@ -20,82 +38,632 @@ REGRAS:
 - FLUIDEZ DE WHATSAPP: Escreve mensagens curtas. Não faças listas longas. Usa no máximo 1 a 2 emojis.
 - FALTA DE INFORMAÇÃO: Se a informação não estiver na memória, não digas friamente 'Não sei'. Diz algo como: 'De cabeça agora não me recordo desse detalhe da planta, mas vou confirmar com a engenharia. Entretanto, diz-me...'"""
 
+SUMMARY_PROMPT = """Resumes conversas de WhatsApp entre um corretor de imóveis e um cliente.
+Escreve um resumo factual e curto (no máximo {max_chars} caracteres) que junte o resumo anterior com as novas mensagens.
+Mantém o que importa para o atendimento: nome, orçamento, entrada, bairro, tipo de imóvel, empreendimentos de interesse, dúvidas já respondidas e próximos passos.
+Responde só com o resumo."""
+
+FALLBACK_MSG = "De cabeça agora não me recordo desse detalhe da planta, mas vou confirmar com a engenharia. Entretanto, diz-me..."
+
+FALLBACK_TEMPLATE = "Pelo que tenho aqui: {excerpt} Queres que te confirme mais algum detalhe?"
+FALLBACK_EXCERPT_CHARS = 280
+
+# Words that point back at earlier messages ("e ele?", "quanto custa esse?").
+FOLLOW_UP_WORDS = {
+    "ele", "ela", "eles", "elas", "dele", "dela", "deles", "delas", "nele", "nela",
+    "esse", "essa", "isso", "desse", "dessa", "disso", "nesse", "nessa", "nisso",
+    "deste", "desta", "disto", "aquele", "aquela", "aquilo", "la", "ali", "mesmo", "mesma",
+    "tambem", "entao", "outro", "outra",
+}
+FOLLOW_UP_OPENERS = {"e", "mas"}
+MIN_SELF_CONTAINED_TERMS = 2
+
+# Marks a client that has not been initialised yet (None means unavailable).
+_COLD: Any = object()
+
+
+def retrieval_fallback(context: str) -> str:
+    """
+    Reply built from the top retrieved chunk, used when the LLM is unavailable.
+
+    The chunk is cut at the last sentence end within FALLBACK_EXCERPT_CHARS.
+    Without context the generic FALLBACK_MSG is returned.
+    """
+    top = next((line.strip() for line in (context or "").splitlines() if line.strip()), "")
+    if not top:
+        return FALLBACK_MSG
+    excerpt = top[:FALLBACK_EXCERPT_CHARS]
+    if len(top) > FALLBACK_EXCERPT_CHARS:
+        cut = max(excerpt.rfind(". "), excerpt.rfind("! "), excerpt.rfind("? "))
+        excerpt = excerpt[: cut + 1] if cut > 0 else excerpt.rstrip() + "..."
+    if excerpt[-1] not in ".!?":
+        excerpt += "."
+    return FALLBACK_TEMPLATE.format(excerpt=excerpt)
+
+
+def is_self_contained(question: str) -> bool:
+    """
+    Whether `question` can be answered without the conversation history.
+
+    It must name at least MIN_SELF_CONTAINED_TERMS content words ("preço do
+    Duet", not "e o preço?") and must not refer back to earlier messages.
+    """
+    words = normalize_text(question, strip_punctuation=True).split()
+    if not words or words[0] in FOLLOW_UP_OPENERS or any(w in FOLLOW_UP_WORDS for w in words):
+        return False
+    return sum(1 for w in words if w not in STOPWORDS and len(w) > 1) >= MIN_SELF_CONTAINED_TERMS
+
+
 class AIService:
+    """
+    Retrieval + Gemini facade.
+
+    The Gemini client and the retrieval backend (RETRIEVAL_BACKEND) are
+    imported and opened lazily: on first use, or ahead of time by
+    `start_warmup()` from the application lifespan, which does the blocking
+    work in a thread so startup is not delayed.
+    """
+
     def __init__(self) -> None:
-        self.model: Any = None
-        self.chroma_client: Any = None
-        self.collection: Any = None
+        self._model: Any = _COLD
+        self._backend: Any = _COLD
+        self.answer_cache: Optional[SemanticCache] = None
+        self.retrieval_cache: Optional[TTLCache[Tuple[str, int], str]] = None
+        self.query_vectors: Optional[TTLCache[str, List[float]]] = None
+        self._embeddings_available: bool = True
+        self._knowledge_version: Version = None
+        self._knowledge_checked_at: float = 0.0
+        self._knowledge_lock = asyncio.Lock()
+        self._llm_semaphore: Optional[asyncio.Semaphore] = None
+        self._llm_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._llm_executor: Optional[ThreadPoolExecutor] = None
+        self._init_lock = threading.Lock()
+        self._warmup_task: Optional[asyncio.Future] = None
+        self.retrieval_warm: bool = False
+        self.embedding_batcher: Optional[EmbeddingBatcher] = None
+        self.retrieval_flight: Optional[SingleFlight] = None
+        self.llm_flight: Optional[SingleFlight] = None
+        self.breaker = CircuitBreaker(
+            "gemini",
+            failure_threshold=settings.LLM_BREAKER_FAILURES,
+            slow_call_sec=settings.LLM_BREAKER_SLOW_CALL_SEC,
+            cooldown=settings.LLM_BREAKER_COOLDOWN_SEC,
+        )
+
+        if settings.RETRIEVAL_CACHE_ENABLED:
+            self.retrieval_cache = TTLCache(
+                ttl=settings.RETRIEVAL_CACHE_TTL_SEC,
+                maxsize=settings.RETRIEVAL_CACHE_MAX_ENTRIES,
+                lru=True,
+            )
+            # Retrieval and the answer-cache lookup embed the same message once.
+            self.query_vectors = TTLCache(
+                ttl=settings.RETRIEVAL_CACHE_TTL_SEC,
+                maxsize=settings.RETRIEVAL_CACHE_MAX_ENTRIES,
+                lru=True,
+            )
+        if settings.SINGLEFLIGHT_ENABLED:
+            self.retrieval_flight = SingleFlight("retrieval")
+            self.llm_flight = SingleFlight("llm")
+        if settings.SEMANTIC_CACHE_ENABLED:
+            self.answer_cache = SemanticCache(
+                threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                ttl=settings.SEMANTIC_CACHE_TTL_SEC,
+                maxsize=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+            )
+
+    @property
+    def model(self) -> Any:
+        if self._model is _COLD:
+            self._init_llm()
+        return self._model
+
+    @model.setter
+    def model(self, value: Any) -> None:
+        self._model = value
 
-        if settings.GEMINI_API_KEY and google_genai is not None:
+    @property
+    def backend(self) -> Optional[RetrievalBackend]:
+        if self._backend is _COLD:
+            self._init_retrieval()
+        return self._backend
+
+    @backend.setter
+    def backend(self, value: Optional[RetrievalBackend]) -> None:
+        self._backend = value
+
+    def _init_llm(self) -> None:
+        with self._init_lock:
+            if self._model is not _COLD:
+                return
+            started = time.perf_counter()
+            model = None
+            if settings.GEMINI_API_KEY:
+                try:
+                    import google.genai as google_genai
+
+                    http_options = {"base_url": settings.GEMINI_BASE_URL} if settings.GEMINI_BASE_URL else None
+                    model = google_genai.Client(api_key=settings.GEMINI_API_KEY, http_options=http_options)
+                except ImportError:
+                    logger.warning("google-genai is not installed; LLM disabled.")
+                except Exception as exc:
+                    logger.error("Error initializing Gemini client: %s", exc)
+            self._model = model
+            STARTUP_SECONDS.set(time.perf_counter() - started, phase="llm_client")
+
+    def _init_retrieval(self) -> None:
+        with self._init_lock:
+            if self._backend is not _COLD:
+                return
+            started = time.perf_counter()
+            self._backend = build_retrieval_backend(chroma_path=CHROMA_PATH, collection_name=CHROMA_COLLECTION)
+            STARTUP_SECONDS.set(time.perf_counter() - started, phase="retrieval_client")
+
+    def warm_up(self) -> None:
+        """Blocking: open the clients and run one query so the embedding model is loaded."""
+        started = time.perf_counter()
+        self._init_llm()
+        backend = self.backend
+        if backend is not None:
             try:
-                self.model = google_genai.Client(api_key=settings.GEMINI_API_KEY)
+                backend.warm_up()
+                self.retrieval_warm = True
             except Exception as exc:
-                logger.error("Error initializing Gemini client: %s", exc)
-                self.model = None
+                logger.error("Error warming up %s retrieval: %s", backend.name, exc)
+        STARTUP_SECONDS.set(time.perf_counter() - started, phase="warmup")
 
-        chromadb = None
-        if sys.version_info < (3, 14):
-            try:
-                import chromadb as chromadb_module
-                chromadb = chromadb_module
-            except ImportError:
-                chromadb = None
-        else:
-            logger.info("ChromaDB disabled: Python 3.14+ is not yet supported by the package.")
+    def start_warmup(self) -> asyncio.Future:
+        """Run `warm_up` in a thread; requests arriving meanwhile wait for it instead of blocking the loop."""
+        if self._warmup_task is None:
+            self._warmup_task = asyncio.ensure_future(asyncio.to_thread(self.warm_up))
+        return self._warmup_task
+
+    async def _wait_warm(self) -> None:
+        task = self._warmup_task
+        if task is not None and not task.done():
+            await asyncio.shield(task)
+
+    @property
+    def warm(self) -> bool:
+        task = self._warmup_task
+        return task is not None and task.done()
+
+    def readiness(self) -> Dict[str, str]:
+        """State of each dependency: cold, warming, warm or unavailable."""
+        warming = self._warmup_task is not None and not self._warmup_task.done()
+
+        def _state(value: Any, warm: bool) -> str:
+            if value is _COLD:
+                return "warming" if warming else "cold"
+            if value is None:
+                return "unavailable"
+            return "warm" if warm else "warming" if warming else "cold"
 
-        if chromadb is not None:
+        return {
+            "llm": _state(self._model, True),
+            "retrieval": _state(self._backend, self.retrieval_warm),
+        }
+
+    def knowledge_version(self) -> Version:
+        """Changes whenever the retrieval backend's files are rewritten."""
+        backend = self.backend
+        return backend.version() if backend is not None else None
+
+    def invalidate_caches(self) -> None:
+        if self.retrieval_cache is not None:
+            self.retrieval_cache.clear()
+        if self.query_vectors is not None:
+            # A reloaded backend may come with a different embedding model.
+            self.query_vectors.clear()
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
+
+    async def _check_knowledge_version(self) -> None:
+        """
+        Drop cached retrievals and answers when the knowledge base changed on disk.
+
+        Checked at most every KNOWLEDGE_VERSION_CHECK_SEC, by one request at a
+        time; the others keep serving the current backend meanwhile. The
+        version read and backend reload (ingestion may have recreated the
+        collection or index) run in a thread. If the reload fails the change
+        is retried on the next check.
+        """
+        now = time.monotonic()
+        if self._knowledge_checked_at and now - self._knowledge_checked_at < settings.KNOWLEDGE_VERSION_CHECK_SEC:
+            return
+        if self._knowledge_lock.locked():
+            return
+        async with self._knowledge_lock:
+            self._knowledge_checked_at = now
+            changed = await asyncio.to_thread(self._refresh_knowledge)
+        if changed:
+            logger.info("Knowledge base changed on disk; invalidating caches.")
+            self.invalidate_caches()
+
+    def _refresh_knowledge(self) -> bool:
+        """Blocking half of the version check. True when the caches must be dropped."""
+        version = self.knowledge_version()
+        if version == self._knowledge_version:
+            return False
+        previous, backend = self._knowledge_version, self.backend
+        if previous is not None and backend is not None:
             try:
-                self.chroma_client = chromadb.PersistentClient(path="data/chroma_db")
-                self.collection = self.chroma_client.get_or_create_collection("riva_imoveis")
+                backend.reload()
             except Exception as exc:
-                logger.error("Error initializing ChromaDB: %s", exc)
-                self.collection = None
+                logger.error("Error reloading %s retrieval: %s", backend.name, exc)
+                return False
+        self._knowledge_version = version
+        return previous is not None
 
-    def _query_chroma(self, query: str) -> str:
-        if not self.collection:
-            return ""
+    @traced("embedding.batch")
+    def _embed_texts(self, texts: List[str]) -> Optional[List[List[float]]]:
+        backend = self.backend
+        return backend.embed(texts) if backend is not None else None
+
+    def _batcher(self) -> Optional[EmbeddingBatcher]:
+        if not settings.EMBEDDING_BATCH_ENABLED:
+            return None
+        if self.embedding_batcher is None:
+            self.embedding_batcher = EmbeddingBatcher(
+                self._embed_texts,
+                max_batch=settings.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait=settings.EMBEDDING_BATCH_MAX_WAIT_MS / 1000,
+            )
+        return self.embedding_batcher
+
+    async def embed_query(self, text: str) -> Optional[List[float]]:
+        """
+        Embedding of `text`, or None when no embedding model is available.
+
+        Concurrent calls are micro-batched into one encoder call; texts that
+        normalize to the same form share one embedding, which is kept for
+        RETRIEVAL_CACHE_TTL_SEC so later lookups of the message reuse it.
+        """
+        if not self._embeddings_available or self.backend is None:
+            return None
+        key = normalize_text(text)
+        memo = self.query_vectors
+        if memo is not None:
+            cached = memo.get(key)
+            if cached is not None:
+                CACHE_LOOKUPS.inc(cache="query_vector", result="hit")
+                return cached
+            CACHE_LOOKUPS.inc(cache="query_vector", result="miss")
+        try:
+            batcher = self._batcher()
+            if batcher is not None:
+                vector = await batcher.embed(text, key=key)
+            else:
+                vectors = await asyncio.to_thread(self._embed_texts, [text])
+                vector = vectors[0] if vectors else None
+        except Exception as exc:
+            # Transient (e.g. the retrieval sidecar restarting): retry on the next query.
+            logger.error("Error embedding query: %s", exc)
+            return None
+        if vector is None:
+            # The backend has no embedding model at all.
+            self._embeddings_available = False
+        elif memo is not None:
+            memo.set(key, vector)
+        return vector
+
+    @traced("retrieval.query")
+    def _query_index(self, query: str, vector: Optional[List[float]] = None) -> List[str]:
+        backend = self.backend
+        if backend is None:
+            return []
         try:
             # Enforce k=4 results retrieval using CHROMA_K correctly
-            results = self.collection.query(query_texts=[query], n_results=settings.CHROMA_K)
-            docs = results.get("documents", []) if isinstance(results, dict) else []
-            if docs and docs[0]:
-                return "\n".join(docs[0])
-            return ""
+            if vector is not None:
+                return backend.query_embedding(query, vector, settings.CHROMA_K)
+            return backend.query(query, settings.CHROMA_K)
         except Exception as exc:
-            logger.error("Error fetching context from ChromaDB: %s", exc)
+            logger.error("Error fetching context from %s retrieval: %s", backend.name, exc)
+            return []
+
+    async def _search(self, query: str) -> List[str]:
+        vector = await self.embed_query(query)
+        return await asyncio.to_thread(self._query_index, query, vector)
+
+    async def _retrieve(self, query: str) -> str:
+        """
+        Index query bounded by RETRIEVAL_TIMEOUT_SEC and the current deadline,
+        assembled into a prompt context within CONTEXT_TOKEN_BUDGET.
+        """
+        timeout = time_left(settings.RETRIEVAL_TIMEOUT_SEC)
+        try:
+            chunks = await asyncio.wait_for(self._search(query), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error("Retrieval timed out after %.2fs", timeout)
             return ""
+        with span("context.build", chunks=len(chunks)):
+            return await asyncio.to_thread(
+                build_context,
+                query,
+                chunks,
+                token_budget=settings.CONTEXT_TOKEN_BUDGET,
+                dedupe_threshold=settings.CONTEXT_DEDUPE_THRESHOLD,
+            )
+
+    @staticmethod
+    async def _coalesce(flight: Optional[SingleFlight], key: Any, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `fn` through `flight`, sharing it with concurrent callers of the same key.
+
+        Followers reuse the leader's call, which runs under the leader's
+        deadline; the leader arrived first, so it never outlives theirs.
+        """
+        if flight is None:
+            return await fn()
+        return await flight.do(key, fn)
+
+    async def _retrieve_and_cache(self, query: str, key: Tuple[str, int]) -> str:
+        context = await self._retrieve(query)
+        # Empty results are usually errors; let the next message retry.
+        if context and self.retrieval_cache is not None:
+            self.retrieval_cache.set(key, context)
+        return context
 
     async def get_context_from_db(self, query: str) -> str:
         """Fetch matching knowledge base chunks concurrently without blocking event loop."""
-        return await asyncio.to_thread(self._query_chroma, query)
+        await self._wait_warm()
+        key = (normalize_text(query), settings.CHROMA_K)
+        cache = self.retrieval_cache
+        if cache is not None and self.backend is not None:
+            await self._check_knowledge_version()
+            context = cache.get(key)
+            if context is not None:
+                CACHE_LOOKUPS.inc(cache="retrieval", result="hit")
+                return context
+            CACHE_LOOKUPS.inc(cache="retrieval", result="miss")
+        return await self._coalesce(self.retrieval_flight, key, lambda: self._retrieve_and_cache(query, key))
 
-    def _generate_content_sync(self, prompt: str) -> str:
-        fallback_msg = "De cabeça agora não me recordo desse detalhe da planta, mas vou confirmar com a engenharia. Entretanto, diz-me..."
-        try:
-            response = self.model.models.generate_content(
-                model=settings.MODEL_NAME,
-                contents=prompt,
-                config={
-                    "temperature": settings.AI_TEMPERATURE, # Expects 0.6
-                    "system_instruction": MASTER_PROMPT
-                }
+    @staticmethod
+    def _build_prompt(user_message: str, context: str = "", history: str = "") -> str:
+        if not context and not history:
+            return user_message
+        parts = []
+        if context:
+            parts.append(f"Relevant info in memory (DO NOT EXACTLY COPY-PASTE):\n{context}")
+        if history:
+            parts.append(history)
+        parts.append(f"Client: {user_message}")
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def _generation_config(system_instruction: str = MASTER_PROMPT) -> dict:
+        return {
+            "temperature": settings.AI_TEMPERATURE, # Expects 0.6
+            "system_instruction": system_instruction
+        }
+
+    def _llm_slots(self) -> asyncio.Semaphore:
+        """Semaphore bounding concurrent Gemini calls (one per event loop)."""
+        loop = asyncio.get_running_loop()
+        if self._llm_semaphore is None or self._llm_loop is not loop:
+            self._llm_semaphore = asyncio.Semaphore(max(1, settings.LLM_MAX_CONCURRENCY))
+            self._llm_loop = loop
+        return self._llm_semaphore
+
+    def _executor(self) -> ThreadPoolExecutor:
+        """Dedicated pool for the blocking SDK path, so it never starves retrieval threads."""
+        if self._llm_executor is None:
+            self._llm_executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.LLM_MAX_CONCURRENCY), thread_name_prefix="gemini"
             )
-            text = getattr(response, "text", "") or ""
-            return text.strip() or fallback_msg
-        except Exception as exc:
-            logger.error("Error generating response in Gemini: %s", exc)
-            return fallback_msg
+        return self._llm_executor
+
+    def shutdown(self) -> None:
+        if self._llm_executor is not None:
+            self._llm_executor.shutdown(wait=False, cancel_futures=True)
+            self._llm_executor = None
+
+    @traced("gemini.generate_content")
+    def _generate_content_sync(self, prompt: str, config: dict) -> str:
+        response = self.model.models.generate_content(
+            model=settings.MODEL_NAME,
+            contents=prompt,
+            config=config,
+        )
+        return getattr(response, "text", "") or ""
+
+    @traced("gemini.generate_content")
+    async def _generate_content_async(self, prompt: str, config: dict) -> str:
+        response = await self.model.aio.models.generate_content(
+            model=settings.MODEL_NAME,
+            contents=prompt,
+            config=config,
+        )
+        return getattr(response, "text", "") or ""
+
+    async def _provider_call(self, prompt: str, config: dict) -> str:
+        """One Gemini call; the caller holds an LLM concurrency slot."""
+        if getattr(self.model, "aio", None) is not None:
+            return await self._generate_content_async(prompt, config)
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor(), context.run, self._generate_content_sync, prompt, config
+        )
+
+    async def _call_llm(self, prompt: str, config: Optional[dict] = None) -> Optional[str]:
+        """
+        Gemini call bounded by LLM_TIMEOUT_SEC, the current deadline and the breaker.
+
+        The LLM concurrency slot is acquired first; running out of time while
+        queued for it is local load shedding and does not touch the breaker.
+        The provider timeout and breaker accounting cover the Gemini call
+        only. Uses the SDK's async client when available and falls back to
+        the blocking client on a dedicated executor. Cancelling the caller
+        cancels the call. Returns None when the call was skipped, shed,
+        failed or timed out.
+        """
+        breaker = self.breaker
+        if not breaker.allow():
+            LLM_CALLS.inc(result="short_circuit")
+            return None
+        wait_budget = time_left(settings.LLM_TIMEOUT_SEC)
+        if wait_budget <= 0:
+            LLM_CALLS.inc(result="deadline")
+            return None
 
-    async def generate_response(self, user_message: str, context: str = "") -> str:
-        """Call LLM synchronously wrapped in an asyncio thread to prevent loop blocking."""
+        slots = self._llm_slots()
+        LLM_WAITING.inc()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=wait_budget)
+        except asyncio.TimeoutError:
+            LLM_CALLS.inc(result="shed")
+            SHED_REQUESTS.inc(reason="llm_queue")
+            logger.warning("No LLM slot within %.2fs; answering without Gemini", wait_budget)
+            return None
+        finally:
+            LLM_WAITING.dec()
+
+        LLM_INFLIGHT.inc()
+        try:
+            timeout = time_left(settings.LLM_TIMEOUT_SEC)
+            if timeout <= 0:
+                LLM_CALLS.inc(result="deadline")
+                return None
+            started = time.perf_counter()
+            try:
+                text = await asyncio.wait_for(
+                    self._provider_call(prompt, config or self._generation_config()), timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                breaker.record_failure()
+                LLM_CALLS.inc(result="timeout")
+                logger.error("Gemini call timed out after %.2fs", timeout)
+                return None
+            except Exception as exc:
+                breaker.record_failure()
+                LLM_CALLS.inc(result="error")
+                logger.error("Error generating response in Gemini: %s", exc)
+                return None
+            breaker.record_success(time.perf_counter() - started)
+        finally:
+            LLM_INFLIGHT.dec()
+            slots.release()
+
+        LLM_CALLS.inc(result="ok")
+        return text.strip() or None
+
+    async def generate_response(self, user_message: str, context: str = "", history: str = "") -> str:
+        """
+        Answer `user_message` from the answer cache or a bounded Gemini call.
+
+        `history` is the rendered conversation memory. It is only used for
+        follow-ups, questions that are not self-contained; those bypass the
+        answer cache and coalesce only with identical prompts. Self-contained
+        questions are answered from the question and context alone, so
+        returning contacts share cached answers and in-flight Gemini calls
+        with everyone else, at the cost of the history's tone and continuity.
+        When Gemini is unavailable (breaker open, timeout, error) the reply
+        is built from the top retrieved chunk instead.
+        """
+        await self._wait_warm()
         if not self.model:
-            return "De cabeça agora não me recordo desse detalhe da planta, mas vou confirmar com a engenharia. Entretanto, diz-me..."
+            return retrieval_fallback(context)
 
-        prompt = user_message
-        if context:
-            prompt = f"Relevant info in memory (DO NOT EXACTLY COPY-PASTE):\n{context}\n\nClient: {user_message}"
+        if history and is_self_contained(user_message):
+            history = ""
+        cache = self.answer_cache if not history else None
+        question = vector = context_hash = None
+        if cache is not None:
+            await self._check_knowledge_version()
+            question = normalize_text(user_message)
+            vector = await self.embed_query(user_message)
+            context_hash = context_fingerprint(context)
+            with span("answer_cache.lookup"):
+                cached = cache.lookup(question, vector, context_hash)
+            if cached is not None:
+                return cached
+
+        prompt = self._build_prompt(user_message, context, history)
+        answer = await self._coalesce(self.llm_flight, normalize_text(prompt), lambda: self._call_llm(prompt))
+        if answer is None:
+            return retrieval_fallback(context)
+
+        if cache is not None:
+            cache.store(question, vector, context_hash, answer)
+        return answer
+
+    async def summarize_conversation(
+        self, summary: str, turns: Sequence[Tuple[str, str]], max_chars: int
+    ) -> Optional[str]:
+        """Fold `turns` into the rolling conversation summary; None when Gemini is unavailable."""
+        if not self.model:
+            return None
+        lines = "\n".join(f"{role}: {text}" for role, text in turns)
+        prompt = f"Previous summary:\n{summary or '-'}\n\nNew messages:\n{lines}"
+        config = self._generation_config(SUMMARY_PROMPT.format(max_chars=max_chars))
+        return await self._call_llm(prompt, config)
+
+    async def stream_response(self, user_message: str, context: str = "") -> AsyncIterator[str]:
+        """
+        Yield the reply as Gemini streams it.
+
+        Closing the generator (e.g. on client disconnect) closes the upstream
+        stream, which cancels the generation. Streams count against the LLM
+        concurrency limit; as in `_call_llm`, waiting for a slot and opening
+        the stream are each bounded by LLM_TIMEOUT_SEC and the deadline, and
+        a slot wait that runs out is shed. A failure before any text yields
+        the retrieval fallback; a failure after part of the reply was yielded
+        is re-raised to the caller.
+        """
+        await self._wait_warm()
+        if not self.model or not self.breaker.allow():
+            yield retrieval_fallback(context)
+            return
+
+        prompt = self._build_prompt(user_message, context)
+        stream: Any = None
+        produced = False
+        wait_budget = time_left(settings.LLM_TIMEOUT_SEC)
+        slots = self._llm_slots()
+        LLM_WAITING.inc()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=wait_budget)
+        except asyncio.TimeoutError:
+            LLM_CALLS.inc(result="shed")
+            SHED_REQUESTS.inc(reason="llm_queue")
+            logger.warning("No LLM slot within %.2fs; streaming the retrieval fallback", wait_budget)
+            yield retrieval_fallback(context)
+            return
+        finally:
+            LLM_WAITING.dec()
+        LLM_INFLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            stream = await asyncio.wait_for(
+                self.model.aio.models.generate_content_stream(
+                    model=settings.MODEL_NAME,
+                    contents=prompt,
+                    config=self._generation_config(),
+                ),
+                timeout=time_left(settings.LLM_TIMEOUT_SEC),
+            )
+            async for chunk in stream:
+                text = getattr(chunk, "text", "") or ""
+                if text:
+                    produced = True
+                    yield text
+        except Exception as exc:
+            self.breaker.record_failure()
+            logger.error("Error streaming response from Gemini: %s", exc)
+            if produced:
+                raise
+        else:
+            if produced:
+                self.breaker.record_success(time.perf_counter() - started)
+        finally:
+            LLM_INFLIGHT.dec()
+            slots.release()
+            close = getattr(stream, "aclose", None)
+            if close is not None:
+                await close()
 
-        return await asyncio.to_thread(self._generate_content_sync, prompt)
+        if not produced:
+            yield retrieval_fallback(context)
 
 
 ai_service = AIService()
@@ -0,0 +1,95 @@
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row (calls slower than
+    `slow_call_sec` count as failures) the breaker opens and `allow()` refuses
+    calls for `cooldown` seconds. It then lets a single probe through
+    (half-open): a success closes it again, a failure re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        slow_call_sec: float,
+        cooldown: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold: int = max(1, failure_threshold)
+        self.slow_call_sec: float = slow_call_sec
+        self.cooldown: float = cooldown
+        self._clock = clock
+
+        self.state: str = CLOSED
+        self.consecutive_failures: int = 0
+        self._opened_at: float = 0.0
+        self._probe_started: Optional[float] = None
+
+        self.opened: int = 0
+        self.rejected: int = 0
+
+    def allow(self) -> bool:
+        now = self._clock()
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self._opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self._probe_started = None
+        if self.state == HALF_OPEN:
+            # One probe at a time; a probe that never reported (e.g. cancelled)
+            # is given up on after another cool-down.
+            if self._probe_started is None or now - self._probe_started >= self.cooldown:
+                self._probe_started = now
+                return True
+        self.rejected += 1
+        return False
+
+    def record_success(self, duration: float = 0.0) -> None:
+        if self.slow_call_sec > 0 and duration >= self.slow_call_sec:
+            self.record_failure()
+            return
+        if self.state != CLOSED:
+            logger.info("Circuit %s closed", self.name)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._probe_started = None
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opened += 1
+                logger.warning(
+                    "Circuit %s opened after %s failures; cooling down for %ss",
+                    self.name,
+                    self.consecutive_failures,
+                    self.cooldown,
+                )
+            self.state = OPEN
+            self._opened_at = self._clock()
+            self._probe_started = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.state != CLOSED
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,195 @@
+"""
+Context assembly for the LLM prompt.
+
+Retrieved chunks overlap (ingestion uses a 200-character overlap) and
+scraped pages can be very long. `build_context` turns the raw chunks into a
+compact context: overlapping text and near-duplicate sentences are dropped,
+the rest is split into passages, and the passages most relevant to the
+query are kept until the token budget is spent. Kept passages are emitted
+in retrieval order so the context still reads naturally.
+"""
+
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set
+
+from app.core.text import normalize_text
+
+CHARS_PER_TOKEN = 4
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 600
+PASSAGE_CHARS = 400
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Short Portuguese function words that say nothing about relevance.
+STOPWORDS: Set[str] = {
+    "a", "o", "as", "os", "um", "uma", "de", "da", "do", "das", "dos", "e", "em", "no", "na",
+    "nos", "nas", "para", "pra", "por", "com", "que", "qual", "quais", "se", "me", "te", "eu",
+    "voce", "tu", "ele", "ela", "isso", "esse", "essa", "tem", "ha", "ao", "aos", "ou", "mais",
+    "muito", "como", "quanto", "onde", "quando", "sim", "nao", "oi", "ola", "bom", "dia",
+}
+
+
+@dataclass
+class _Passage:
+    chunk: int
+    position: int
+    text: str
+    tokens: int
+    score: float = 0.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for Portuguese with Gemini)."""
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN)) if text else 0
+
+
+def _terms(text: str) -> List[str]:
+    return [t for t in normalize_text(text, strip_punctuation=True).split() if t not in STOPWORDS and len(t) > 1]
+
+
+def _overlap(previous: str, current: str) -> int:
+    """Length of the longest suffix of `previous` that is a prefix of `current`."""
+    limit = min(len(previous), len(current), MAX_OVERLAP_CHARS)
+    if limit < MIN_OVERLAP_CHARS:
+        return 0
+    probe = current[:MIN_OVERLAP_CHARS]
+    start = previous.find(probe, len(previous) - limit)
+    while start != -1:
+        size = len(previous) - start
+        if current.startswith(previous[start:]):
+            return size
+        start = previous.find(probe, start + 1)
+    return 0
+
+
+def remove_overlaps(chunks: Sequence[str]) -> List[str]:
+    """Strip from each chunk the text it shares with the end or start of an earlier chunk."""
+    kept: List[str] = []
+    for index, chunk in enumerate(chunks):
+        text = chunk
+        # Compare against the original chunks: overlaps are exact character runs.
+        for previous in chunks[:index]:
+            cut = _overlap(previous, text)
+            if cut:
+                text = text[cut:]
+            cut = _overlap(text, previous)
+            if cut:
+                text = text[: len(text) - cut]
+        kept.append(text.strip())
+    return kept
+
+
+def _sentences(chunk: str) -> List[str]:
+    """Sentences of `chunk`; unpunctuated runs longer than a passage are cut at word boundaries."""
+    pieces: List[str] = []
+    for sentence in _SENTENCE_END.split(chunk):
+        sentence = sentence.strip()
+        while len(sentence) > PASSAGE_CHARS:
+            cut = sentence.rfind(" ", 0, PASSAGE_CHARS)
+            cut = cut if cut > 0 else PASSAGE_CHARS
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        if sentence:
+            pieces.append(sentence)
+    return pieces
+
+
+def _is_duplicate(terms: Set[str], seen: List[Set[str]], index: Dict[str, List[int]], threshold: float) -> bool:
+    """
+    Whether an earlier sentence contains every word of `terms` or is a
+    near-duplicate of it. Only sentences sharing a word are compared.
+    """
+    shared: Dict[int, int] = {}
+    for term in terms:
+        for other in index.get(term, ()):
+            shared[other] = shared.get(other, 0) + 1
+    for other, count in shared.items():
+        if count == len(terms) or count / (len(terms) + len(seen[other]) - count) >= threshold:
+            return True
+    return False
+
+
+def _passages(chunks: Sequence[str], dedupe_threshold: float) -> List[_Passage]:
+    """Sentence-level dedupe across chunks, then sentences grouped into passages."""
+    seen_text: Set[str] = set()
+    seen_terms: List[Set[str]] = []
+    term_index: Dict[str, List[int]] = {}
+    passages: List[_Passage] = []
+    for chunk_index, chunk in enumerate(chunks):
+        current: List[str] = []
+        size = 0
+        for sentence in _sentences(chunk):
+            norm = normalize_text(sentence, strip_punctuation=True)
+            if not norm or norm in seen_text:
+                continue
+            terms = set(norm.split())
+            if _is_duplicate(terms, seen_terms, term_index, dedupe_threshold):
+                continue
+            seen_text.add(norm)
+            for term in terms:
+                term_index.setdefault(term, []).append(len(seen_terms))
+            seen_terms.append(terms)
+            if current and size + len(sentence) > PASSAGE_CHARS:
+                text = " ".join(current)
+                passages.append(_Passage(chunk_index, len(passages), text, estimate_tokens(text)))
+                current, size = [], 0
+            current.append(sentence)
+            size += len(sentence) + 1
+        if current:
+            text = " ".join(current)
+            passages.append(_Passage(chunk_index, len(passages), text, estimate_tokens(text)))
+    return passages
+
+
+def _score(passages: List[_Passage], query: str) -> None:
+    """Query-term overlap weighted by IDF across passages, plus a small retrieval-rank prior."""
+    query_terms = set(_terms(query))
+    document_terms = [set(_terms(p.text)) for p in passages]
+    frequency: Dict[str, int] = {}
+    for terms in document_terms:
+        for term in terms & query_terms:
+            frequency[term] = frequency.get(term, 0) + 1
+    total = len(passages)
+    for passage, terms in zip(passages, document_terms):
+        relevance = sum(math.log(1 + total / frequency[t]) for t in terms & query_terms)
+        passage.score = relevance + 1.0 / (2 + passage.chunk)
+
+
+def build_context(
+    query: str,
+    chunks: Sequence[str],
+    token_budget: int,
+    dedupe_threshold: float = 0.85,
+) -> str:
+    """
+    Compact, query-focused context from retrieved chunks (best first).
+
+    A `token_budget` <= 0 disables the budget but still removes duplicates.
+    """
+    chunks = [c for c in chunks if c and c.strip()]
+    if not chunks:
+        return ""
+    passages = _passages(remove_overlaps(chunks), dedupe_threshold)
+    if token_budget > 0:
+        _score(passages, query)
+        selected: List[_Passage] = []
+        spent = 0
+        for passage in sorted(passages, key=lambda p: (-p.score, p.position)):
+            if spent + passage.tokens > token_budget:
+                continue
+            selected.append(passage)
+            spent += passage.tokens
+        passages = sorted(selected, key=lambda p: p.position)
+
+    lines: List[str] = []
+    last_chunk: Optional[int] = None
+    for passage in passages:
+        if passage.chunk == last_chunk:
+            lines[-1] += " " + passage.text
+        else:
+            lines.append(passage.text)
+        last_chunk = passage.chunk
+    return "\n".join(lines)
@@ -0,0 +1,251 @@
+import asyncio
+import contextvars
+import json
+import logging
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.tracing import traced
+from app.services.ai_service import ai_service
+
+logger = logging.getLogger(__name__)
+
+Turn = Tuple[str, str]  # (role, text); role is "cliente" or "corretor"
+Summarizer = Callable[[str, Sequence[Turn], int], Awaitable[Optional[str]]]
+
+ROLE_LABELS = {"cliente": "Cliente", "corretor": "Corretor"}
+
+
+@dataclass
+class ConversationHistory:
+    summary: str = ""
+    turns: List[Turn] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.summary or self.turns)
+
+    def render(self) -> str:
+        """Prompt section for the history; empty when there is none."""
+        parts: List[str] = []
+        if self.summary:
+            parts.append(f"Conversation summary:\n{self.summary}")
+        if self.turns:
+            lines = "\n".join(f"{ROLE_LABELS.get(role, role)}: {text}" for role, text in self.turns)
+            parts.append(f"Recent messages:\n{lines}")
+        return "\n\n".join(parts)
+
+
+def extractive_summary(summary: str, turns: Sequence[Turn], max_chars: int) -> str:
+    """Summary without the LLM: the previous summary plus the client's lines, newest kept."""
+    lines = [summary] if summary else []
+    lines.extend(f"{ROLE_LABELS['cliente']}: {text}" for role, text in turns if role == "cliente")
+    merged = "\n".join(lines)
+    if len(merged) <= max_chars:
+        return merged
+    tail = merged[-max_chars:]
+    newline = tail.find("\n")
+    return tail[newline + 1 :] if 0 <= newline < len(tail) - 1 else tail
+
+
+class SqlConversationStore:
+    """Persists one row per contact in the `conversations` table, next to `leads`."""
+
+    def __init__(self, session_factory: Any = None) -> None:
+        self._session_factory = session_factory
+
+    def _sessions(self) -> Any:
+        if self._session_factory is None:
+            from app.db.session import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    @traced("conversation.load")
+    async def load(self, contact_id: str) -> Optional[Tuple[List[Turn], str, int]]:
+        from app.db.models import Conversation
+
+        async with self._sessions()() as session:
+            res = await session.execute(select(Conversation).where(Conversation.contact_id == contact_id).limit(1))
+            row = res.scalar_one_or_none()
+        if row is None:
+            return None
+        turns = [(str(role), str(text)) for role, text in json.loads(row.turns_json or "[]")]
+        return turns, row.summary or "", row.turn_count or 0
+
+    @traced("conversation.save")
+    async def save(self, contact_id: str, turns: Sequence[Turn], summary: str, turn_count: int) -> None:
+        from app.db.models import Conversation
+
+        values = {
+            "turns_json": json.dumps([list(turn) for turn in turns], ensure_ascii=False),
+            "summary": summary,
+            "turn_count": turn_count,
+        }
+        async with self._sessions()() as session:
+            result = await session.execute(
+                update(Conversation).where(Conversation.contact_id == contact_id).values(**values)
+            )
+            if result.rowcount == 0:
+                session.add(Conversation(contact_id=contact_id, **values))
+            try:
+                await session.commit()
+            except IntegrityError:
+                # Another writer created the row first; update it instead.
+                await session.rollback()
+                await session.execute(
+                    update(Conversation).where(Conversation.contact_id == contact_id).values(**values)
+                )
+                await session.commit()
+
+
+class _State:
+    __slots__ = ("turns", "summary", "turn_count", "pending", "summarizing")
+
+    def __init__(self, max_turns: int) -> None:
+        self.turns: Deque[Turn] = deque(maxlen=max_turns)
+        self.summary: str = ""
+        self.turn_count: int = 0
+        # Turns pushed out of the ring buffer that the summary does not cover yet.
+        self.pending: List[Turn] = []
+        self.summarizing: bool = False
+
+
+class ConversationMemory:
+    """
+    Bounded per-contact conversation memory.
+
+    Each contact keeps its last `max_turns` turns (each cut to
+    `max_turn_chars`) in a ring buffer plus a rolling summary of at most
+    `summary_max_chars`. Turns pushed out of the buffer are folded into the
+    summary by a background task, so the history added to a prompt stays
+    bounded however long the conversation runs. States are cached for the
+    `max_contacts` most recent contacts and persisted through `store`.
+    """
+
+    def __init__(
+        self,
+        store: Any,
+        max_turns: int,
+        max_turn_chars: int,
+        summary_max_chars: int,
+        max_contacts: int,
+        summarizer: Optional[Summarizer] = None,
+    ) -> None:
+        self.store = store
+        self.max_turns: int = max(2, max_turns)
+        self.max_turn_chars: int = max(1, max_turn_chars)
+        self.summary_max_chars: int = max(1, summary_max_chars)
+        self.max_contacts: int = max(1, max_contacts)
+        self.summarizer = summarizer
+        self._states: "OrderedDict[str, _State]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        self.summaries: int = 0
+        self.store_errors: int = 0
+
+    async def _state(self, contact_id: str) -> _State:
+        state = self._states.get(contact_id)
+        if state is not None:
+            self._states.move_to_end(contact_id)
+            return state
+
+        state = _State(self.max_turns)
+        try:
+            loaded = await self.store.load(contact_id)
+        except Exception as exc:
+            self.store_errors += 1
+            logger.error("Error loading conversation for %s: %s", contact_id, exc)
+            loaded = None
+        if loaded is not None:
+            turns, state.summary, state.turn_count = loaded
+            state.turns.extend(turns[-self.max_turns :])
+
+        # Another coroutine may have loaded the same contact meanwhile.
+        existing = self._states.get(contact_id)
+        if existing is not None:
+            return existing
+        self._states[contact_id] = state
+        while len(self._states) > self.max_contacts:
+            self._states.popitem(last=False)
+        return state
+
+    async def history(self, contact_id: str) -> ConversationHistory:
+        state = await self._state(contact_id)
+        return ConversationHistory(summary=state.summary, turns=list(state.turns))
+
+    async def record(self, contact_id: str, user_text: str, reply: str) -> None:
+        """Append one exchange and persist it; overflow is summarised in the background."""
+        state = await self._state(contact_id)
+        for role, text in (("cliente", user_text), ("corretor", reply)):
+            text = " ".join((text or "").split())[: self.max_turn_chars]
+            if not text:
+                continue
+            if len(state.turns) == state.turns.maxlen:
+                state.pending.append(state.turns[0])
+            state.turns.append((role, text))
+            state.turn_count += 1
+        await self._save(contact_id, state)
+        if state.pending and not state.summarizing:
+            state.summarizing = True
+            # Run outside the caller's context so the message's trace and
+            # deadline do not apply to the background summary.
+            task = contextvars.Context().run(asyncio.ensure_future, self._summarize(contact_id, state))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _save(self, contact_id: str, state: _State) -> None:
+        try:
+            await self.store.save(contact_id, list(state.turns), state.summary, state.turn_count)
+        except Exception as exc:
+            self.store_errors += 1
+            logger.error("Error saving conversation for %s: %s", contact_id, exc)
+
+    async def _summarize(self, contact_id: str, state: _State) -> None:
+        try:
+            while state.pending:
+                batch, state.pending = state.pending, []
+                summary: Optional[str] = None
+                if self.summarizer is not None:
+                    try:
+                        summary = await self.summarizer(state.summary, batch, self.summary_max_chars)
+                    except Exception as exc:
+                        logger.error("Error summarising conversation for %s: %s", contact_id, exc)
+                if not summary:
+                    summary = extractive_summary(state.summary, batch, self.summary_max_chars)
+                state.summary = summary.strip()[: self.summary_max_chars]
+                self.summaries += 1
+                await self._save(contact_id, state)
+        finally:
+            state.summarizing = False
+
+    async def wait_idle(self) -> None:
+        """Wait for background summaries (tests and shutdown)."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def clear(self) -> None:
+        self._states.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "contacts": len(self._states),
+            "max_contacts": self.max_contacts,
+            "max_turns": self.max_turns,
+            "summaries": self.summaries,
+            "summarizing": len(self._tasks),
+            "store_errors": self.store_errors,
+        }
+
+
+conversation_memory = ConversationMemory(
+    SqlConversationStore(),
+    max_turns=settings.CONVERSATION_MAX_TURNS,
+    max_turn_chars=settings.CONVERSATION_TURN_MAX_CHARS,
+    summary_max_chars=settings.CONVERSATION_SUMMARY_MAX_CHARS,
+    max_contacts=settings.CONVERSATION_MAX_CONTACTS,
+    summarizer=ai_service.summarize_conversation,
+)
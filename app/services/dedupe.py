@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Union
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryDedupeStore:
+    """In-process store of recently seen message ids (single worker deployments)."""
+
+    backend = "memory"
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        self._seen: TTLCache[str, bool] = TTLCache(ttl=ttl, maxsize=max_entries)
+
+    async def check_and_mark(self, message_id: str) -> bool:
+        """Record `message_id` and return True if it had already been seen."""
+        return not self._seen.add(message_id, True)
+
+    async def discard(self, message_id: str) -> None:
+        self._seen.pop(message_id)
+
+    async def stats(self) -> Dict[str, Any]:
+        stats = self._seen.stats()
+        return {
+            "backend": self.backend,
+            "size": stats["size"],
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+        }
+
+
+class SqliteDedupeStore:
+    """
+    Message id store shared by several uvicorn workers through a SQLite file.
+
+    The check is a single upsert, so two workers receiving the same delivery
+    cannot both see it as new. Queries run in a worker thread so a locked
+    database never stalls the event loop.
+    """
+
+    backend = "sqlite"
+    _PURGE_EVERY = 256
+
+    def __init__(self, path: str, ttl: float, max_entries: int) -> None:
+        self.ttl: float = ttl
+        self.max_entries: int = max(1, max_entries)
+        self.hits: int = 0
+        self.misses: int = 0
+        self._writes: int = 0
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_messages (message_id TEXT PRIMARY KEY, seen_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_seen_messages_seen_at ON seen_messages(seen_at)")
+
+    async def check_and_mark(self, message_id: str) -> bool:
+        """Record `message_id` and return True if it had already been seen."""
+        return await asyncio.to_thread(self._check_and_mark, message_id)
+
+    def _check_and_mark(self, message_id: str) -> bool:
+        now = time.time()
+        with self._lock:
+            # Inserts new ids and revives expired ones; live duplicates change nothing.
+            cur = self._conn.execute(
+                """
+                INSERT INTO seen_messages (message_id, seen_at) VALUES (?, ?)
+                ON CONFLICT(message_id) DO UPDATE SET seen_at = excluded.seen_at
+                WHERE seen_messages.seen_at < ?
+                """,
+                (message_id, now, now - self.ttl),
+            )
+            duplicate = cur.rowcount == 0
+            if duplicate:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._writes += 1
+                if self._writes % self._PURGE_EVERY == 0:
+                    self._purge(now)
+        return duplicate
+
+    def _purge(self, now: float) -> None:
+        self._conn.execute("DELETE FROM seen_messages WHERE seen_at < ?", (now - self.ttl,))
+        self._conn.execute(
+            """
+            DELETE FROM seen_messages WHERE message_id IN (
+                SELECT message_id FROM seen_messages ORDER BY seen_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    async def discard(self, message_id: str) -> None:
+        await asyncio.to_thread(self._discard, message_id)
+
+    def _discard(self, message_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM seen_messages WHERE message_id = ?", (message_id,))
+
+    async def stats(self) -> Dict[str, Any]:
+        size = await asyncio.to_thread(self._size)
+        return {"backend": self.backend, "size": size, "hits": self.hits, "misses": self.misses}
+
+    def _size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM seen_messages").fetchone()[0]
+
+
+DedupeStore = Union[MemoryDedupeStore, SqliteDedupeStore]
+
+
+def build_dedupe_store() -> DedupeStore:
+    backend = settings.WEBHOOK_DEDUPE_BACKEND.strip().lower()
+    if backend == "sqlite":
+        try:
+            return SqliteDedupeStore(
+                settings.WEBHOOK_DEDUPE_DB_PATH,
+                ttl=settings.WEBHOOK_DEDUPE_TTL_SEC,
+                max_entries=settings.WEBHOOK_DEDUPE_MAX_ENTRIES,
+            )
+        except sqlite3.Error as exc:
+            logger.error("Error opening SQLite dedupe store, falling back to memory: %s", exc)
+    elif backend != "memory":
+        logger.warning("Unknown WEBHOOK_DEDUPE_BACKEND %r, using memory", backend)
+    return MemoryDedupeStore(ttl=settings.WEBHOOK_DEDUPE_TTL_SEC, max_entries=settings.WEBHOOK_DEDUPE_MAX_ENTRIES)
+
+
+dedupe_store = build_dedupe_store()
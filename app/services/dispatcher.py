@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from app.core.tracing import Trace
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class InboundMessage:
+    remote_jid: str
+    text: str
+    dedupe_key: Optional[str] = None
+    trace: Optional[Trace] = None
+    received_at: float = field(default_factory=time.monotonic)
+
+
+class QueueFullError(Exception):
+    """Raised when the dispatcher cannot accept more messages."""
+
+
+MessageHandler = Callable[[str, List[InboundMessage]], Awaitable[Any]]
+
+
+class MessageDispatcher:
+    """
+    Bounded pool of asyncio workers with strict ordering per contact.
+
+    Every contact gets its own mailbox and is scheduled on at most one worker
+    at a time, so its messages are handled in arrival order while different
+    contacts are processed in parallel.
+
+    Bursts are coalesced: a contact is only made ready once it has been quiet
+    for `coalesce_window` seconds (at most `coalesce_max_wait` after the
+    oldest pending message), and its worker hands every pending message to
+    the handler at once. The quiet window is a loop timer, so workers only
+    ever pick up batches that are ready to process.
+    """
+
+    def __init__(
+        self,
+        handler: MessageHandler,
+        workers: int,
+        max_queue: int,
+        coalesce_window: float = 0.0,
+        coalesce_max_wait: float = 0.0,
+    ) -> None:
+        self._handler = handler
+        self.workers: int = workers
+        self.max_queue: int = max_queue
+        self.coalesce_window: float = max(0.0, coalesce_window)
+        self.coalesce_max_wait: float = max(self.coalesce_window, coalesce_max_wait)
+        self._mailboxes: Dict[str, Deque[InboundMessage]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._ready: Optional["asyncio.Queue[str]"] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending: int = 0
+        self.processed: int = 0
+        self.failed: int = 0
+        self.coalesced: int = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def start(self) -> None:
+        if self._tasks or self.workers <= 0:
+            return
+        self._ready = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"webhook-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info("Webhook dispatcher started with %s workers", self.workers)
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Give queued messages a grace period to finish, then cancel the workers."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Webhook dispatcher stopped with %s pending messages", self._pending)
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        self._mailboxes.clear()
+        self._pending = 0
+        self._ready = None
+        self._idle = None
+
+    async def join(self) -> None:
+        """Wait until every submitted message has been handled."""
+        if self._idle is not None:
+            await self._idle.wait()
+
+    def submit(self, message: InboundMessage) -> None:
+        if self._ready is None or self._idle is None:
+            raise RuntimeError("Dispatcher is not running")
+        if self._pending >= self.max_queue:
+            raise QueueFullError(f"{self._pending} messages pending")
+
+        mailbox = self._mailboxes.get(message.remote_jid)
+        mailbox_is_new = mailbox is None
+        if mailbox is None:
+            mailbox = deque()
+            self._mailboxes[message.remote_jid] = mailbox
+        mailbox.append(message)
+        self._pending += 1
+        self._idle.clear()
+        if mailbox_is_new:
+            # No worker or timer owns this contact yet: schedule it.
+            self._schedule(message.remote_jid)
+
+    def _schedule(self, remote_jid: str) -> None:
+        """Make the contact ready now, or once its quiet window has passed."""
+        assert self._ready is not None
+        self._timers.pop(remote_jid, None)
+        mailbox = self._mailboxes[remote_jid]
+        delay = 0.0
+        if self.coalesce_window > 0:
+            quiet_at = mailbox[-1].received_at + self.coalesce_window
+            deadline = mailbox[0].received_at + self.coalesce_max_wait
+            delay = min(quiet_at, deadline) - time.monotonic()
+        if delay <= 0:
+            self._ready.put_nowait(remote_jid)
+        else:
+            # Re-checked when it fires: later messages push the quiet point out.
+            self._timers[remote_jid] = asyncio.get_running_loop().call_later(delay, self._schedule, remote_jid)
+
+    async def _worker(self) -> None:
+        assert self._ready is not None and self._idle is not None
+        ready, idle = self._ready, self._idle
+        while True:
+            remote_jid = await ready.get()
+            mailbox = self._mailboxes[remote_jid]
+            batch = list(mailbox)
+            mailbox.clear()
+            try:
+                await self._handler(remote_jid, batch)
+                self.processed += 1
+                self.coalesced += len(batch) - 1
+            except Exception as exc:
+                self.failed += 1
+                logger.error("Error handling queued message for %s: %s", remote_jid, exc)
+            finally:
+                self._pending -= len(batch)
+                if mailbox:
+                    # Back of the line, so a chatty contact cannot starve the others.
+                    self._schedule(remote_jid)
+                else:
+                    del self._mailboxes[remote_jid]
+                if self._pending == 0:
+                    idle.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "pending": self._pending,
+            "contacts": len(self._mailboxes),
+            "coalescing": len(self._timers),
+            "max_queue": self.max_queue,
+            "processed": self.processed,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,99 @@
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.core.metrics import EMBEDDING_BATCH_SECONDS, EMBEDDING_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+Vector = List[float]
+EmbedFn = Callable[[List[str]], Optional[Sequence[Sequence[float]]]]
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batches concurrent query embeddings into one encoder call.
+
+    The first request opens a batch; requests arriving within `max_wait`
+    seconds join it, and it is flushed early once `max_batch` texts are
+    waiting. Requests with the same key (the text itself unless given) are
+    encoded once, from the first text seen for it. `embed_fn` is blocking (a
+    transformer `encode`) and runs in a worker thread.
+    """
+
+    def __init__(self, embed_fn: EmbedFn, max_batch: int, max_wait: float) -> None:
+        self._embed_fn = embed_fn
+        self.max_batch: int = max(1, max_batch)
+        self.max_wait: float = max(0.0, max_wait)
+        self._pending: List[Tuple[str, str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches: int = 0
+        self.items: int = 0
+        self.largest: int = 0
+
+    async def embed(self, text: str, key: Optional[str] = None) -> Optional[Vector]:
+        """Embedding of `text`, or None when the encoder has no model."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A previous event loop (tests, restarts) left nothing usable behind.
+            self._loop, self._pending, self._timer = loop, [], None
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((text if key is None else key, text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = [(key, text, future) for key, text, future in self._pending if not future.done()]
+        self._pending = []
+        if not batch:
+            return
+        # Run outside the requester's context so its trace does not own the whole batch.
+        task = contextvars.Context().run(asyncio.ensure_future, self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, str, asyncio.Future]]) -> None:
+        by_key: Dict[str, str] = {}
+        for key, text, _ in batch:
+            by_key.setdefault(key, text)
+        keys, texts = list(by_key), list(by_key.values())
+        started = time.perf_counter()
+        try:
+            vectors = await asyncio.to_thread(self._embed_fn, texts)
+        except Exception as exc:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        EMBEDDING_BATCH_SECONDS.observe(time.perf_counter() - started)
+        EMBEDDING_BATCH_SIZE.observe(len(texts))
+        self.batches += 1
+        self.items += len(batch)
+        self.largest = max(self.largest, len(texts))
+
+        results: Dict[str, Optional[Vector]] = {}
+        for i, key in enumerate(keys):
+            results[key] = [float(x) for x in vectors[i]] if vectors is not None else None
+        for key, _, future in batch:
+            if not future.done():
+                future.set_result(results[key])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
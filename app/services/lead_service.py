@@ -1,6 +1,7 @@
 import json
 from sqlalchemy import select, update
 from sqlalchemy.exc import IntegrityError
+from app.core.tracing import traced
 from app.db.session import SessionLocal
 from app.db.models import Lead
 
@@ -17,6 +18,7 @@ DEFAULT_PROFILE = {
     "imoveis_sugeridos": [],
 }
 
+@traced("lead.get_or_create")
 async def get_or_create_lead(contact_id: str) -> Lead:
     async with SessionLocal() as session:
         res = await session.execute(
@@ -51,6 +53,7 @@ def _merge_profile(old: dict, new: dict) -> dict:
             merged[k] = v
     return merged
 
+@traced("lead.update_profile")
 async def update_profile(lead: Lead, patch: dict) -> Lead:
     old = json.loads(lead.profile_json or "{}")
     merged = _merge_profile(old, patch)
@@ -66,6 +69,7 @@ async def update_profile(lead: Lead, patch: dict) -> Lead:
     lead.profile_json = json.dumps(merged)
     return lead
 
+@traced("lead.set_stage")
 async def set_stage(lead: Lead, stage: str) -> Lead:
     async with SessionLocal() as session:
         await session.execute(
@@ -0,0 +1,135 @@
+"""
+BM25 inverted index over the knowledge base chunks.
+
+Names of developments ("Apogeu Barra", "Duet") and unit codes ("A-1204") are
+matched poorly by MiniLM embeddings but exactly by terms. The index maps
+each term to the chunks containing it, so a lookup only touches the posting
+lists of the query terms and never needs the embedding model. It is built
+incrementally by `scripts/ingest.py` (re-adding an id replaces the chunk)
+and persisted as one JSON file.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.text import normalize_text
+from app.services.context_builder import STOPWORDS
+
+FORMAT_VERSION = 1
+
+_WORD = re.compile(r"\w+(?:[-/.]\w+)*")
+_SEPARATORS = re.compile(r"[-/.]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Index terms of `text`: accent-free, lower-case words without stopwords.
+
+    Compound codes also index their joined form, so "A-1204", "a 1204" and
+    "A1204" all reach the same unit.
+    """
+    terms: List[str] = []
+    for word in _WORD.findall(normalize_text(text)):
+        parts = _SEPARATORS.split(word)
+        if len(parts) > 1:
+            terms.append("".join(parts))
+        terms.extend(p for p in parts if p not in STOPWORDS and (len(p) > 1 or p.isdigit()))
+    return terms
+
+
+class BM25Index:
+    """Okapi BM25 over chunks keyed by id; `add` and `remove` keep the postings current."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.total_length: int = 0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, doc_id: str, text: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        if doc_id in self.docs:
+            self.remove(doc_id)
+        frequencies: Dict[str, int] = {}
+        for term in tokenize(text):
+            frequencies[term] = frequencies.get(term, 0) + 1
+        length = sum(frequencies.values())
+        self.docs[doc_id] = {"text": text, "metadata": metadata or {}, "tf": frequencies, "length": length}
+        for term, count in frequencies.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+        self.total_length += length
+
+    def remove(self, doc_id: str) -> None:
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for term in doc["tf"]:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_length -= doc["length"]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Ids and BM25 scores of the `k` best chunks, best first; empty when no term matches."""
+        count = len(self.docs)
+        if not count or k <= 0:
+            return []
+        average = self.total_length / count or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.docs[doc_id]["length"] / average)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def text(self, doc_id: str) -> str:
+        return self.docs[doc_id]["text"]
+
+    def save(self, path: str) -> None:
+        """Write the index to `path` atomically."""
+        payload = {
+            "format": FORMAT_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "docs": {doc_id: {"text": d["text"], "metadata": d["metadata"]} for doc_id, d in self.docs.items()},
+        }
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".lexical-", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(payload, fh, ensure_ascii=False)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as fh:
+            payload = json.load(fh)
+        if payload.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported lexical index format in {path}")
+        index = cls(k1=payload.get("k1", 1.5), b=payload.get("b", 0.75))
+        for doc_id, doc in payload["docs"].items():
+            index.add(doc_id, doc["text"], doc.get("metadata"))
+        return index
+
+    @classmethod
+    def open(cls, path: str) -> "BM25Index":
+        """The index at `path`, or an empty one when the file does not exist yet."""
+        return cls.load(path) if os.path.exists(path) else cls()
@@ -0,0 +1,400 @@
+"""
+Pluggable retrieval backends for AIService.
+
+`ChromaBackend` queries the `riva_imoveis` collection. `NumpyBackend` serves
+an index built by `scripts/build_vector_index.py`: a float32 matrix of
+L2-normalised embeddings that is memory-mapped (`embeddings.npy`), the
+chunk texts (`documents.jsonl`) and `meta.json`. A query is one matrix-vector
+product plus `argpartition` for the top k, all in-process.
+
+RETRIEVAL_MODE can put a BM25 index (`app/services/lexical_index.py`) next
+to or instead of the vector backend: `LexicalBackend` answers from the
+inverted index alone and `HybridBackend` fuses both rankings.
+"""
+
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.text import normalize_text
+from app.services.lexical_index import BM25Index
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+CHROMA_PATH = "data/chroma_db"
+CHROMA_COLLECTION = "riva_imoveis"
+
+Version = Optional[Tuple[Tuple[int, int], ...]]
+
+
+def file_version(paths: Sequence[str]) -> Version:
+    """(mtime, size) of the files that exist; changes whenever they are rewritten."""
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version) or None
+
+
+def load_embedder(model_name: str = EMBEDDING_MODEL_NAME) -> Any:
+    """
+    Callable mapping a list of texts to embeddings, or None.
+
+    Prefers Chroma's bundled ONNX MiniLM (no torch) and falls back to
+    sentence-transformers; both produce all-MiniLM-L6-v2 vectors.
+    """
+    if model_name == EMBEDDING_MODEL_NAME and sys.version_info < (3, 14):
+        try:
+            from chromadb.utils import embedding_functions
+
+            return embedding_functions.DefaultEmbeddingFunction()
+        except Exception:
+            pass
+    try:
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(model_name)
+        return lambda texts: model.encode(list(texts), convert_to_numpy=True)
+    except Exception as exc:
+        logger.error("No embedding model available for %s: %s", model_name, exc)
+        return None
+
+
+class RetrievalBackend:
+    name = "base"
+
+    def query(self, text: str, k: int) -> List[str]:
+        raise NotImplementedError
+
+    def query_embedding(self, text: str, vector: Sequence[float], k: int) -> List[str]:
+        """Like `query` with the embedding of `text` already computed (see `embed`)."""
+        return self.query(text, k)
+
+    def embed(self, texts: Sequence[str]) -> Optional[List[List[float]]]:
+        """Embeddings in the backend's vector space, or None when it has no embedder."""
+        return None
+
+    def version(self) -> Version:
+        return None
+
+    def reload(self) -> None:
+        pass
+
+    def warm_up(self) -> None:
+        self.query("warm up", 1)
+
+
+class ChromaBackend(RetrievalBackend):
+    name = "chroma"
+
+    def __init__(self, collection: Any, client: Any = None, path: str = "", collection_name: str = "") -> None:
+        self.collection = collection
+        self.client = client
+        self.path = path
+        self.collection_name = collection_name
+        self._embedding_functions: Any = None
+        self._embedder: Any = None
+
+    @classmethod
+    def open(cls, path: str, collection_name: str) -> Optional["ChromaBackend"]:
+        if sys.version_info >= (3, 14):
+            logger.info("ChromaDB disabled: Python 3.14+ is not yet supported by the package.")
+            return None
+        try:
+            import chromadb
+        except ImportError:
+            return None
+        try:
+            client = chromadb.PersistentClient(path=path)
+            backend = cls(client.get_or_create_collection(collection_name), client, path, collection_name)
+        except Exception as exc:
+            logger.error("Error initializing ChromaDB: %s", exc)
+            return None
+        try:
+            from chromadb.utils import embedding_functions
+
+            backend._embedding_functions = embedding_functions
+        except ImportError:
+            pass
+        return backend
+
+    def query(self, text: str, k: int) -> List[str]:
+        results = self.collection.query(query_texts=[text], n_results=k)
+        docs = results.get("documents", []) if isinstance(results, dict) else []
+        return [doc for doc in docs[0] if doc] if docs and docs[0] else []
+
+    def query_embedding(self, text: str, vector: Sequence[float], k: int) -> List[str]:
+        results = self.collection.query(query_embeddings=[list(vector)], n_results=k)
+        docs = results.get("documents", []) if isinstance(results, dict) else []
+        return [doc for doc in docs[0] if doc] if docs and docs[0] else []
+
+    def embed(self, texts: Sequence[str]) -> Optional[List[List[float]]]:
+        if self._embedding_functions is None:
+            return None
+        if self._embedder is None:
+            self._embedder = self._embedding_functions.DefaultEmbeddingFunction()
+        return [[float(x) for x in vector] for vector in self._embedder(list(texts))]
+
+    def version(self) -> Version:
+        if not self.path:
+            return None
+        return file_version([os.path.join(self.path, "chroma.sqlite3"), os.path.join(self.path, "chroma.sqlite3-wal")])
+
+    def reload(self) -> None:
+        # Ingestion may have dropped and recreated the collection.
+        if self.client is None:
+            return
+        try:
+            self.collection = self.client.get_or_create_collection(self.collection_name)
+        except Exception as exc:
+            logger.error("Error reloading ChromaDB collection: %s", exc)
+
+
+class NumpyBackend(RetrievalBackend):
+    name = "numpy"
+
+    def __init__(self, index_dir: str, embedder: Any = None) -> None:
+        if np is None:
+            raise RuntimeError("numpy is required for the numpy retrieval backend")
+        self.index_dir = index_dir
+        self._embedder = embedder
+        self.matrix: Any = None
+        self.documents: List[str] = []
+        self.meta: Dict[str, Any] = {}
+        self.reload()
+
+    @property
+    def _paths(self) -> List[str]:
+        return [os.path.join(self.index_dir, name) for name in ("meta.json", "embeddings.npy", "documents.jsonl")]
+
+    def reload(self) -> None:
+        meta_path, matrix_path, documents_path = self._paths
+        with open(meta_path, "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        matrix = np.load(matrix_path, mmap_mode="r")
+        with open(documents_path, "r", encoding="utf-8") as fh:
+            documents = [json.loads(line)["text"] for line in fh if line.strip()]
+        if matrix.dtype != np.float32 or matrix.ndim != 2 or matrix.shape[0] != len(documents):
+            raise ValueError(f"Inconsistent vector index in {self.index_dir}")
+        self.meta, self.matrix, self.documents = meta, matrix, documents
+
+    def _embedding_fn(self) -> Any:
+        if self._embedder is None:
+            self._embedder = load_embedder(self.meta.get("model", EMBEDDING_MODEL_NAME))
+            if self._embedder is None:
+                raise RuntimeError("No embedding model available for the numpy backend")
+        return self._embedder
+
+    def embed(self, texts: Sequence[str]) -> Optional[List[List[float]]]:
+        return [[float(x) for x in vector] for vector in self._embedding_fn()(list(texts))]
+
+    def search(self, vector: Any, k: int) -> Tuple[Any, Any]:
+        """Indexes and cosine scores of the `k` rows closest to `vector`, best first."""
+        query = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm:
+            query = query / norm
+        scores = self.matrix @ query
+        k = min(k, scores.shape[0])
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def query(self, text: str, k: int) -> List[str]:
+        return self.query_embedding(text, self._embedding_fn()([text])[0], k)
+
+    def query_embedding(self, text: str, vector: Sequence[float], k: int) -> List[str]:
+        top, _ = self.search(vector, k)
+        return [self.documents[i] for i in top]
+
+    def version(self) -> Version:
+        return file_version(self._paths)
+
+
+def write_index(
+    index_dir: str,
+    embeddings: Any,
+    documents: Sequence[str],
+    metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+    model: str = EMBEDDING_MODEL_NAME,
+    source: str = "",
+) -> Dict[str, Any]:
+    """
+    Write a NumpyBackend index, replacing the previous one atomically.
+
+    Rows are L2-normalised and stored as float32. Each file is written to a
+    temporary name and renamed, so running servers keep their memory map of
+    the old index until they reload.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[0] != len(documents):
+        raise ValueError("embeddings must be a (len(documents), dim) matrix")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+    os.makedirs(index_dir, exist_ok=True)
+    meta = {
+        "model": model,
+        "dim": int(matrix.shape[1]) if matrix.size else 0,
+        "count": int(matrix.shape[0]),
+        "source": source,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=index_dir)
+    try:
+        np.save(os.path.join(staging, "embeddings.npy"), matrix)
+        with open(os.path.join(staging, "documents.jsonl"), "w", encoding="utf-8") as fh:
+            for i, text in enumerate(documents):
+                metadata = metadatas[i] if metadatas else {}
+                fh.write(json.dumps({"text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+        with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh, ensure_ascii=False, indent=2)
+        # meta.json last: its mtime marks a complete index for version checks.
+        for name in ("embeddings.npy", "documents.jsonl", "meta.json"):
+            os.replace(os.path.join(staging, name), os.path.join(index_dir, name))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return meta
+
+
+class LexicalBackend(RetrievalBackend):
+    name = "lexical"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.index = BM25Index.open(path)
+
+    def query(self, text: str, k: int) -> List[str]:
+        return [self.index.text(doc_id) for doc_id, _ in self.index.search(text, k)]
+
+    def version(self) -> Version:
+        return file_version([self.path])
+
+    def reload(self) -> None:
+        self.index = BM25Index.open(self.path)
+
+
+class HybridBackend(RetrievalBackend):
+    """
+    Vector and BM25 results fused by weighted reciprocal rank.
+
+    Each chunk scores sum(weight / (rrf_k + rank)) over the rankings it
+    appears in, so the two incomparable score scales never need to be
+    calibrated against each other. If the vector side fails the lexical
+    ranking is still returned.
+    """
+
+    name = "hybrid"
+
+    def __init__(self, vector: RetrievalBackend, lexical: LexicalBackend, rrf_k: int = 60, lexical_weight: float = 1.0) -> None:
+        self.vector = vector
+        self.lexical = lexical
+        self.rrf_k = max(1, rrf_k)
+        self.lexical_weight = lexical_weight
+
+    def query(self, text: str, k: int) -> List[str]:
+        return self._fuse(text, k, lambda candidates: self.vector.query(text, candidates))
+
+    def query_embedding(self, text: str, vector: Sequence[float], k: int) -> List[str]:
+        return self._fuse(text, k, lambda candidates: self.vector.query_embedding(text, vector, candidates))
+
+    def _fuse(self, text: str, k: int, vector_query: Callable[[int], List[str]]) -> List[str]:
+        candidates = 2 * k
+        try:
+            vector_docs = vector_query(candidates)
+        except Exception as exc:
+            logger.error("Error querying %s retrieval in hybrid mode: %s", self.vector.name, exc)
+            vector_docs = []
+        lexical_docs = self.lexical.query(text, candidates)
+
+        scores: Dict[str, float] = {}
+        documents: Dict[str, str] = {}
+        for docs, weight in ((vector_docs, 1.0), (lexical_docs, self.lexical_weight)):
+            for rank, doc in enumerate(docs):
+                key = normalize_text(doc)
+                documents.setdefault(key, doc)
+                scores[key] = scores.get(key, 0.0) + weight / (self.rrf_k + rank + 1)
+        best = sorted(scores, key=scores.__getitem__, reverse=True)[:k]
+        return [documents[key] for key in best]
+
+    def embed(self, texts: Sequence[str]) -> Optional[List[List[float]]]:
+        return self.vector.embed(texts)
+
+    def version(self) -> Version:
+        return ((self.vector.version() or ()) + (self.lexical.version() or ())) or None
+
+    def reload(self) -> None:
+        self.vector.reload()
+        self.lexical.reload()
+
+    def warm_up(self) -> None:
+        self.vector.warm_up()
+
+
+def _vector_backend(backend: str, chroma_path: str, collection_name: str) -> Optional[RetrievalBackend]:
+    backend = (backend or settings.RETRIEVAL_BACKEND).lower()
+    if backend == "numpy":
+        try:
+            return NumpyBackend(settings.VECTOR_INDEX_DIR)
+        except Exception as exc:
+            logger.error("Error opening numpy vector index at %s: %s", settings.VECTOR_INDEX_DIR, exc)
+            return None
+    if backend != "chroma":
+        logger.error("Unknown RETRIEVAL_BACKEND %r; falling back to chroma", backend)
+    return ChromaBackend.open(chroma_path or CHROMA_PATH, collection_name or CHROMA_COLLECTION)
+
+
+def _lexical_backend() -> Optional[LexicalBackend]:
+    try:
+        return LexicalBackend(settings.LEXICAL_INDEX_PATH)
+    except Exception as exc:
+        logger.error("Error opening lexical index at %s: %s", settings.LEXICAL_INDEX_PATH, exc)
+        return None
+
+
+def build_retrieval_backend(
+    backend: str = "", chroma_path: str = "", collection_name: str = "", mode: str = "", sidecar: bool = True
+) -> Optional[RetrievalBackend]:
+    """
+    Backend selected by RETRIEVAL_MODE and RETRIEVAL_BACKEND; None when it cannot be opened.
+
+    With RETRIEVAL_SIDECAR_SOCKET set (and `sidecar` true) queries go to the
+    shared sidecar process instead, which builds its backend with `sidecar=False`.
+    """
+    if sidecar and settings.RETRIEVAL_SIDECAR_SOCKET:
+        from app.services.retrieval_sidecar import SidecarBackend
+
+        return SidecarBackend(settings.RETRIEVAL_SIDECAR_SOCKET, settings.RETRIEVAL_SIDECAR_TIMEOUT_SEC)
+    mode = (mode or settings.RETRIEVAL_MODE).lower()
+    if mode == "lexical":
+        return _lexical_backend()
+    vector = _vector_backend(backend, chroma_path, collection_name)
+    if mode == "hybrid":
+        lexical = _lexical_backend()
+        if vector is None or lexical is None:
+            return vector or lexical
+        return HybridBackend(vector, lexical, settings.HYBRID_RRF_K, settings.HYBRID_LEXICAL_WEIGHT)
+    if mode != "vector":
+        logger.error("Unknown RETRIEVAL_MODE %r; using vector retrieval", mode)
+    return vector
@@ -0,0 +1,244 @@
+"""
+Embedding and retrieval sidecar served over a Unix domain socket.
+
+With several uvicorn workers every process would otherwise load its own
+Chroma client, embedding model and vector index. The sidecar owns one copy
+of each; workers use `SidecarBackend` (selected by RETRIEVAL_SIDECAR_SOCKET)
+and scripts use `SidecarClient.embed`. Embedding requests from all clients
+are micro-batched by one `EmbeddingBatcher`.
+
+Run it next to the workers:
+
+    python -m app.services.retrieval_sidecar --socket /run/corretor/retrieval.sock
+
+Protocol: each message is a 4-byte big-endian length followed by a JSON
+object. Requests carry an "op" (ping, embed, query, version, reload);
+responses are {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.config import settings
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.retrieval import RetrievalBackend, Version, build_retrieval_backend
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+
+class SidecarError(RuntimeError):
+    """The sidecar answered with an error."""
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    body = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    return _HEADER.pack(len(body)) + body
+
+
+def _as_version(value: Any) -> Version:
+    return tuple(tuple(item) for item in value) if value else None
+
+
+class SidecarServer:
+    def __init__(self, backend: RetrievalBackend, max_batch: int, max_wait: float) -> None:
+        self.backend = backend
+        self.batcher = EmbeddingBatcher(backend.embed, max_batch=max_batch, max_wait=max_wait)
+        self._version: Version = backend.version()
+        self._reload_lock = asyncio.Lock()
+
+    async def _embed(self, texts: Sequence[str]) -> Optional[List[List[float]]]:
+        vectors = await asyncio.gather(*(self.batcher.embed(text) for text in texts))
+        return None if any(v is None for v in vectors) else list(vectors)  # type: ignore[arg-type]
+
+    async def _query(self, text: str, k: int, vector: Optional[List[float]] = None) -> List[str]:
+        if vector is None:
+            embedded = await self._embed([text])
+            vector = embedded[0] if embedded else None
+        if vector is None:
+            return await asyncio.to_thread(self.backend.query, text, k)
+        return await asyncio.to_thread(self.backend.query_embedding, text, vector, k)
+
+    async def _reload(self) -> Version:
+        # Every worker asks after noticing the same change; reload once.
+        async with self._reload_lock:
+            version = self.backend.version()
+            if version != self._version:
+                await asyncio.to_thread(self.backend.reload)
+                self._version = version
+                logger.info("Retrieval sidecar reloaded %s index", self.backend.name)
+            return self._version
+
+    async def dispatch(self, request: Dict[str, Any]) -> Any:
+        op = request.get("op")
+        if op == "ping":
+            return {"backend": self.backend.name, "batcher": self.batcher.stats()}
+        if op == "embed":
+            return await self._embed(request["texts"])
+        if op == "query":
+            return await self._query(request["text"], int(request["k"]), request.get("vector"))
+        if op == "version":
+            return self.backend.version()
+        if op == "reload":
+            return await self._reload()
+        raise ValueError(f"unknown op {op!r}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                except asyncio.IncompleteReadError:
+                    return
+                if size > MAX_MESSAGE_BYTES:
+                    logger.error("Retrieval sidecar request too large (%s bytes); closing connection", size)
+                    return
+                request = json.loads(await reader.readexactly(size))
+                try:
+                    response = {"ok": True, "result": await self.dispatch(request)}
+                except Exception as exc:
+                    logger.error("Retrieval sidecar %s failed: %s", request.get("op"), exc)
+                    response = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+                writer.write(_encode(response))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, path: str) -> None:
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self.handle, path=path)
+        os.chmod(path, 0o660)
+        logger.info("Retrieval sidecar (%s) listening on %s", self.backend.name, path)
+        async with server:
+            await server.serve_forever()
+
+
+class SidecarClient:
+    """
+    Blocking client; one connection per thread, reconnected on failure.
+
+    The retrieval calls it serves already run in worker threads, so a
+    blocking socket keeps it as simple as the in-process backends.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _recv(self, sock: socket.socket, size: int) -> bytes:
+        chunks = []
+        while size:
+            chunk = sock.recv(min(size, 1 << 20))
+            if not chunk:
+                raise ConnectionError("retrieval sidecar closed the connection")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def call(self, op: str, **params: Any) -> Any:
+        payload = _encode({"op": op, **params})
+        for attempt in (1, 2):
+            sock = getattr(self._local, "sock", None)
+            try:
+                if sock is None:
+                    sock = self._local.sock = self._connect()
+                sock.sendall(payload)
+                (size,) = _HEADER.unpack(self._recv(sock, _HEADER.size))
+                response = json.loads(self._recv(sock, size))
+                break
+            except OSError as exc:
+                self.close()
+                # A stale connection (sidecar restarted) is retried once; a slow sidecar is not.
+                if attempt == 2 or isinstance(exc, socket.timeout):
+                    raise
+        if not response.get("ok"):
+            raise SidecarError(response.get("error", "unknown error"))
+        return response.get("result")
+
+    def close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def embed(self, texts: Sequence[str]) -> Optional[List[List[float]]]:
+        return self.call("embed", texts=list(texts))
+
+
+class SidecarBackend(RetrievalBackend):
+    """Retrieval backend served by the sidecar at RETRIEVAL_SIDECAR_SOCKET."""
+
+    name = "sidecar"
+
+    def __init__(self, path: str, timeout: float = 5.0) -> None:
+        self.client = SidecarClient(path, timeout)
+
+    def query(self, text: str, k: int) -> List[str]:
+        return self.client.call("query", text=text, k=k)
+
+    def query_embedding(self, text: str, vector: Sequence[float], k: int) -> List[str]:
+        return self.client.call("query", text=text, k=k, vector=list(vector))
+
+    def embed(self, texts: Sequence[str]) -> Optional[List[List[float]]]:
+        return self.client.embed(texts)
+
+    def version(self) -> Version:
+        try:
+            return _as_version(self.client.call("version"))
+        except (OSError, SidecarError) as exc:
+            logger.error("Error reading retrieval sidecar version: %s", exc)
+            return None
+
+    def reload(self) -> None:
+        self.client.call("reload")
+
+    def warm_up(self) -> None:
+        self.client.call("ping")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Embedding/retrieval sidecar for multi-worker deployments")
+    parser.add_argument("--socket", default=settings.RETRIEVAL_SIDECAR_SOCKET or "/tmp/corretor-retrieval.sock")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    backend = build_retrieval_backend(sidecar=False)
+    if backend is None:
+        raise SystemExit("No retrieval backend available; check RETRIEVAL_BACKEND and RETRIEVAL_MODE")
+    backend.warm_up()
+    server = SidecarServer(
+        backend,
+        max_batch=settings.EMBEDDING_BATCH_MAX_SIZE,
+        max_wait=settings.EMBEDDING_BATCH_MAX_WAIT_MS / 1000,
+    )
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.metrics import CACHE_LOOKUPS
+
+
+@dataclass
+class _Entry:
+    question: str
+    vector: Optional[List[float]]
+    context_hash: str
+    answer: str
+    expires_at: float
+
+
+def context_fingerprint(context: str) -> str:
+    return hashlib.blake2b((context or "").encode("utf-8"), digest_size=12).hexdigest()
+
+
+def _unit(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    if norm == 0:
+        return [0.0 for _ in vector]
+    return [x / norm for x in vector]
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by the normalized question and the retrieved context.
+
+    A lookup first tries the exact normalized question, then the most similar
+    cached question (cosine similarity >= `threshold`) answered with the same
+    context. Entries expire after `ttl` seconds and are evicted LRU beyond
+    `maxsize`. Without an embedding only exact matches are served.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        ttl: float,
+        maxsize: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.threshold: float = threshold
+        self.ttl: float = ttl
+        self.maxsize: int = max(1, maxsize)
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        # context hash -> keys of the entries answered with that context
+        self._by_context: Dict[str, Dict[Tuple[str, str], None]] = {}
+        self.exact_hits: int = 0
+        self.semantic_hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.invalidations: int = 0
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        bucket = self._by_context.get(entry.context_hash)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._by_context[entry.context_hash]
+
+    def lookup(self, question: str, vector: Optional[Sequence[float]], context_hash: str) -> Optional[str]:
+        now = self._clock()
+        key = (context_hash, question)
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > now:
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            CACHE_LOOKUPS.inc(cache="answer", result="hit")
+            return entry.answer
+
+        best_key: Optional[Tuple[str, str]] = None
+        if vector is not None:
+            query = _unit(vector)
+            best_score = self.threshold
+            for candidate_key in list(self._by_context.get(context_hash, ())):
+                candidate = self._entries[candidate_key]
+                if candidate.expires_at <= now:
+                    self._remove(candidate_key)
+                    continue
+                if candidate.vector is None:
+                    continue
+                score = sum(a * b for a, b in zip(query, candidate.vector))
+                if score >= best_score:
+                    best_key, best_score = candidate_key, score
+
+        if best_key is None:
+            self.misses += 1
+            CACHE_LOOKUPS.inc(cache="answer", result="miss")
+            return None
+        self._entries.move_to_end(best_key)
+        self.semantic_hits += 1
+        CACHE_LOOKUPS.inc(cache="answer", result="hit")
+        return self._entries[best_key].answer
+
+    def store(self, question: str, vector: Optional[Sequence[float]], context_hash: str, answer: str) -> None:
+        key = (context_hash, question)
+        self._remove(key)
+        self._entries[key] = _Entry(
+            question=question,
+            vector=_unit(vector) if vector is not None else None,
+            context_hash=context_hash,
+            answer=answer,
+            expires_at=self._clock() + self.ttl,
+        )
+        self._by_context.setdefault(context_hash, {})[key] = None
+        while len(self._entries) > self.maxsize:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_context.clear()
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
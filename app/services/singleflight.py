@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from app.core.metrics import SINGLEFLIGHT_CALLS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one in-flight call.
+
+    The first caller for a key (the leader) starts `fn()` as a task; callers
+    arriving while it runs await the same task instead of starting their
+    own. The task is shielded, so a cancelled caller (e.g. its message
+    deadline expired) does not cancel the work the others are waiting for.
+    Nothing is kept once the call finishes: this de-duplicates concurrent
+    work, caching is left to the caller.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.leaders: int = 0
+        self.shared: int = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        future = self._calls.get(key)
+        if future is not None and not future.done() and future.get_loop() is loop:
+            self.shared += 1
+            SINGLEFLIGHT_CALLS.inc(op=self.name, result="shared")
+            return await asyncio.shield(future)
+
+        task = asyncio.ensure_future(fn())
+        self._calls[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        self.leaders += 1
+        SINGLEFLIGHT_CALLS.inc(op=self.name, result="leader")
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved: every waiter may have been cancelled.
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("Single-flight %s call failed: %s", self.name, task.exception())
+
+    def stats(self) -> Dict[str, Any]:
+        return {"inflight": len(self._calls), "leaders": self.leaders, "saved": self.shared}
@@ -0,0 +1,245 @@
+"""
+Opt-in recorder of inbound webhook traffic for replay (WEBHOOK_RECORD_ENABLED).
+
+Each delivery is written as one JSON line with its arrival time, the HTTP
+status and outcome it got, the handling time, and the payload after the
+redaction hooks ran. The active file is `webhook.jsonl` in
+WEBHOOK_RECORD_DIR; once it reaches WEBHOOK_RECORD_MAX_BYTES it is rotated
+to `webhook.jsonl.1.gz`, `.2.gz`, ... (gzip, WEBHOOK_RECORD_BACKUP_COUNT
+kept). Parsing, redaction and file writes run on a background thread, so
+the webhook only pays for a queue put. Replay with
+`scripts/replay_webhook.py`.
+"""
+
+import gzip
+import hashlib
+import hmac
+import importlib
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import shutil
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Redactor = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+# Evolution sends the instance API key in every delivery; it is never recorded.
+SECRET_FIELDS = {"apikey"}
+NUMBER_FIELDS = {"remoteJid", "participant", "sender", "from", "number", "owner", "wa_id"}
+NAME_FIELDS = {"pushName", "name", "notifyName"}
+TEXT_FIELDS = {"conversation", "text", "caption", "body"}
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+_CPF = re.compile(r"\b\d{3}\.?\d{3}\.?\d{3}-?\d{2}\b")
+_DIGITS = re.compile(r"\d{8,}")
+
+
+def pii_redactor(salt: str = "") -> Redactor:
+    """
+    Default redaction hook.
+
+    Phone numbers in contact fields and long digit runs in message text are
+    replaced by keyed pseudonyms of the same length (the same number always
+    maps to the same pseudonym, so per-contact ordering survives replay).
+    Contact names become "Contato <hash>"; e-mails and CPFs in text are
+    masked.
+
+    Phone numbers are a small space, so an unkeyed pseudonym could be
+    reversed by brute force. Without `salt` a random per-process key is
+    used: pseudonyms then only match within one process's recordings.
+    """
+    if salt:
+        key = salt.encode("utf-8")
+    else:
+        key = secrets.token_bytes(32)
+        logger.warning(
+            "WEBHOOK_RECORD_SALT is empty; pseudonymising with a random per-process key. "
+            "Set it to keep pseudonyms stable across restarts."
+        )
+
+    def pseudonym(digits: str) -> str:
+        digest = hmac.new(key, digits.encode("utf-8"), hashlib.sha256).hexdigest()
+        tail = "".join(str(int(c, 16) % 10) for c in digest)[: max(0, len(digits) - 2)]
+        return digits[:2] + tail
+
+    def number(value: str) -> str:
+        return _DIGITS.sub(lambda m: pseudonym(m.group()), value)
+
+    def text(value: str) -> str:
+        value = _EMAIL.sub("<email>", value)
+        value = _CPF.sub("<cpf>", value)
+        return _DIGITS.sub(lambda m: pseudonym(m.group()), value)
+
+    def walk(node: Any) -> Any:
+        if isinstance(node, dict):
+            result = {}
+            for name, value in node.items():
+                if isinstance(value, str):
+                    if name in NUMBER_FIELDS:
+                        value = number(value)
+                    elif name in NAME_FIELDS and value:
+                        value = "Contato " + hashlib.sha256(key + value.encode("utf-8")).hexdigest()[:6]
+                    elif name in TEXT_FIELDS:
+                        value = text(value)
+                else:
+                    value = walk(value)
+                result[name] = value
+            return result
+        if isinstance(node, list):
+            return [walk(item) for item in node]
+        return node
+
+    return walk
+
+
+def _strip_secrets(node: Any) -> Any:
+    if isinstance(node, dict):
+        return {k: _strip_secrets(v) for k, v in node.items() if k not in SECRET_FIELDS}
+    if isinstance(node, list):
+        return [_strip_secrets(item) for item in node]
+    return node
+
+
+def _redact(body: Any, redactors: Sequence[Redactor]) -> Any:
+    """Run the hooks on a dict body, or on every dict of a (nested) list body."""
+    if isinstance(body, dict):
+        for redactor in redactors:
+            body = redactor(body)
+        return body
+    if isinstance(body, list):
+        return [_redact(item, redactors) for item in body]
+    return body
+
+
+def load_redactors(spec: str, salt: str = "") -> List[Redactor]:
+    """
+    Redaction hooks from a comma-separated spec.
+
+    "default" is `pii_redactor`, "none" disables redaction, and
+    "package.module:function" names a custom hook taking and returning the
+    payload dict.
+    """
+    redactors: List[Redactor] = []
+    for item in (part.strip() for part in spec.split(",")):
+        if not item or item == "none":
+            continue
+        if item == "default":
+            redactors.append(pii_redactor(salt))
+            continue
+        module_name, _, attr = item.partition(":")
+        redactors.append(getattr(importlib.import_module(module_name), attr))
+    return redactors
+
+
+def _gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class _Deferred(QueueHandler):
+    """Queue the record untouched; the formatter runs on the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _DeliveryFormatter(logging.Formatter):
+    def __init__(self, redactors: Sequence[Redactor]) -> None:
+        super().__init__()
+        self.redactors = list(redactors)
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = dict(record.msg)  # type: ignore[arg-type]
+        raw: bytes = entry.pop("raw")
+        try:
+            body: Any = _strip_secrets(json.loads(raw))
+        except ValueError:
+            # Unparseable bodies cannot be redacted; keep them only when redaction is off.
+            if self.redactors:
+                entry["raw_bytes"] = len(raw)
+            else:
+                entry["raw"] = raw.decode("utf-8", errors="replace")
+        else:
+            entry["body"] = _redact(body, self.redactors) if self.redactors else body
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TrafficRecorder:
+    def __init__(self, directory: str, max_bytes: int, backup_count: int, redactors: Sequence[Redactor]) -> None:
+        self.path = os.path.join(directory, "webhook.jsonl")
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.redactors = list(redactors)
+        self.recorded: int = 0
+        self.errors: int = 0
+        self._handler: Optional[QueueHandler] = None
+        self._listener: Optional[QueueListener] = None
+
+    def _queue(self) -> QueueHandler:
+        if self._handler is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                self.path, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding="utf-8"
+            )
+            handler.namer = _gzip_namer
+            handler.rotator = _gzip_rotator
+            handler.setFormatter(_DeliveryFormatter(self.redactors))
+            records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+            self._listener = QueueListener(records, handler)
+            self._listener.start()
+            self._handler = _Deferred(records)
+        return self._handler
+
+    def record(self, raw: bytes, received_at: float, http_status: int, status: str, duration: float) -> None:
+        entry = {
+            "ts": received_at,
+            "http_status": http_status,
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "raw": raw,
+        }
+        try:
+            self._queue().emit(logging.makeLogRecord({"msg": entry}))
+            self.recorded += 1
+        except Exception as exc:
+            self.errors += 1
+            logger.error("Error recording webhook delivery: %s", exc)
+
+    def close(self) -> None:
+        """Write out queued deliveries and close the file (shutdown and tests)."""
+        listener, self._listener, self._handler = self._listener, None, None
+        if listener is not None:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "recorded": self.recorded, "errors": self.errors}
+
+
+def build_recorder() -> Optional[TrafficRecorder]:
+    if not settings.WEBHOOK_RECORD_ENABLED:
+        return None
+    return TrafficRecorder(
+        settings.WEBHOOK_RECORD_DIR,
+        max_bytes=settings.WEBHOOK_RECORD_MAX_BYTES,
+        backup_count=settings.WEBHOOK_RECORD_BACKUP_COUNT,
+        redactors=load_redactors(settings.WEBHOOK_RECORD_REDACT, settings.WEBHOOK_RECORD_SALT),
+    )
+
+
+traffic_recorder = build_recorder()
@@ -4,6 +4,8 @@ from typing import Any, Dict, Optional
 import httpx
 
 from app.core.config import settings
+from app.core.deadline import time_left
+from app.core.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +26,7 @@ class WhatsAppService:
             return remote_jid.split("@", 1)[0]
         return remote_jid
 
+    @traced("evolution.send_text")
     async def send_message(self, remote_jid: str, text: str) -> Optional[Dict[str, Any]]:
         """
         Sends a WhatsApp message via the Evolution API using v1.8 schema.
@@ -59,7 +62,9 @@ class WhatsAppService:
 
         try:
             async with httpx.AsyncClient() as client:
-                response = await client.post(endpoint, json=payload, headers=headers, timeout=10.0)
+                # Replies are still sent after the deadline, with a short minimum timeout.
+                timeout = time_left(settings.SEND_TIMEOUT_SEC, floor=settings.SEND_MIN_TIMEOUT_SEC)
+                response = await client.post(endpoint, json=payload, headers=headers, timeout=timeout)
 
                 if response.status_code in [400, 404]:
                     print(f"❌ Evolution API Error [{response.status_code}]: {response.text}")
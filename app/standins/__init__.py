@@ -0,0 +1,4 @@
+"""
+Local stand-ins for the upstream APIs (Gemini and Evolution) for offline
+benchmarks and soak tests. Run both with `python -m app.standins`.
+"""
@@ -0,0 +1,83 @@
+"""
+Run the Gemini and Evolution stand-ins side by side.
+
+    python -m app.standins --gemini-latency-ms 1200 --gemini-error-rate 0.02 \
+        --evolution-latency-ms 80 --echo-webhook http://127.0.0.1:8000/webhook
+
+Then start the app with GEMINI_BASE_URL=http://127.0.0.1:8101,
+GEMINI_API_KEY=standin, URL_EVOLUTION=http://127.0.0.1:8102,
+API_KEY_EVOLUTION=standin and EVOLUTION_INSTANCE=standin.
+Profiles can be changed while running with POST /_standin/profile.
+"""
+
+import argparse
+import asyncio
+from typing import Dict
+
+from app.standins import evolution, gemini
+from app.standins.profile import Profile
+
+DEFAULTS: Dict[str, Dict[str, float]] = {
+    "gemini": {"latency_ms": 1200.0, "port": 8101},
+    "evolution": {"latency_ms": 80.0, "port": 8102},
+}
+
+
+def _add_profile_args(parser: argparse.ArgumentParser, name: str) -> None:
+    group = parser.add_argument_group(name)
+    group.add_argument(f"--{name}-port", type=int, default=int(DEFAULTS[name]["port"]))
+    group.add_argument(f"--{name}-latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    group.add_argument(f"--{name}-latency-ms", type=float, default=DEFAULTS[name]["latency_ms"], help="median (max for uniform)")
+    group.add_argument(f"--{name}-latency-min-ms", type=float, default=0.0, help="minimum for uniform")
+    group.add_argument(f"--{name}-latency-sigma", type=float, default=0.5, help="lognormal shape")
+    group.add_argument(f"--{name}-error-rate", type=float, default=0.0)
+    group.add_argument(f"--{name}-throttle-rate", type=float, default=0.0, help="fraction answered with 429")
+    group.add_argument(f"--{name}-max-rps", type=float, default=0.0, help="429 above this rate (0 = unlimited)")
+
+
+def _profile(args: argparse.Namespace, name: str) -> Profile:
+    prefix = name + "_"
+    return Profile(
+        latency=getattr(args, prefix + "latency"),
+        latency_ms=getattr(args, prefix + "latency_ms"),
+        latency_min_ms=getattr(args, prefix + "latency_min_ms"),
+        latency_sigma=getattr(args, prefix + "latency_sigma"),
+        error_rate=getattr(args, prefix + "error_rate"),
+        throttle_rate=getattr(args, prefix + "throttle_rate"),
+        max_rps=getattr(args, prefix + "max_rps"),
+        seed=args.seed,
+    )
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    import uvicorn
+
+    apps = [
+        (gemini.create_app(_profile(args, "gemini"), reply_chars=args.reply_chars), args.gemini_port),
+        (
+            evolution.create_app(_profile(args, "evolution"), api_key=args.evolution_api_key, echo_webhook=args.echo_webhook),
+            args.evolution_port,
+        ),
+    ]
+    servers = [
+        uvicorn.Server(uvicorn.Config(app, host=args.host, port=port, log_level="warning", access_log=False))
+        for app, port in apps
+    ]
+    print(f"Gemini stand-in on http://{args.host}:{args.gemini_port}, Evolution on http://{args.host}:{args.evolution_port}")
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Gemini and Evolution API stand-ins")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible latency and failures")
+    parser.add_argument("--reply-chars", type=int, default=240, help="length of the Gemini replies")
+    parser.add_argument("--evolution-api-key", default="", help="require this apikey header (empty = any)")
+    parser.add_argument("--echo-webhook", default="", help="post the fromMe echo of each sent message here")
+    _add_profile_args(parser, "gemini")
+    _add_profile_args(parser, "evolution")
+    asyncio.run(_serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
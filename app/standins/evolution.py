@@ -0,0 +1,106 @@
+"""
+Stand-in for the Evolution API v1.8 `sendText` endpoint.
+
+Serves `POST /message/sendText/{instance}` with the real response shape.
+With `echo_webhook` set it also posts the `fromMe` echo that Evolution
+sends back for every outgoing message to the app's webhook, so the loop
+guard and dedupe paths run as in production. Point the app at it with
+URL_EVOLUTION=http://127.0.0.1:8102.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Dict, Optional, Set
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.standins.profile import Profile, Upstream, add_control_routes
+
+logger = logging.getLogger(__name__)
+
+ERRORS = {
+    "throttled": (429, "Too Many Requests"),
+    "error": (500, "Internal Server Error"),
+}
+
+
+def _remote_jid(number: str) -> str:
+    return number if "@" in number else f"{number}@s.whatsapp.net"
+
+
+def echo_payload(instance: str, key: Dict[str, Any], text: str, timestamp: int) -> Dict[str, Any]:
+    """`messages.upsert` webhook Evolution emits for a message the bot sent."""
+    return {
+        "event": "messages.upsert",
+        "instance": instance,
+        "data": {
+            "key": key,
+            "pushName": "",
+            "message": {"extendedTextMessage": {"text": text}},
+            "messageType": "extendedTextMessage",
+            "messageTimestamp": timestamp,
+            "source": "standin",
+        },
+    }
+
+
+def create_app(profile: Profile, api_key: str = "", echo_webhook: str = "") -> FastAPI:
+    app = FastAPI(title="Evolution API stand-in")
+    upstream = Upstream(profile)
+    app.state.upstream = upstream
+    add_control_routes(app, upstream)
+    echo_tasks: Set[asyncio.Task] = set()
+    client: Optional[httpx.AsyncClient] = None
+
+    async def _echo(payload: Dict[str, Any]) -> None:
+        nonlocal client
+        if client is None:
+            client = httpx.AsyncClient(timeout=10)
+        try:
+            await client.post(echo_webhook, json=payload)
+        except httpx.HTTPError as exc:
+            logger.warning("Echo webhook to %s failed: %s", echo_webhook, exc)
+
+    @app.post("/message/sendText/{instance}")
+    async def send_text(instance: str, request: Request) -> Any:
+        if api_key and request.headers.get("apikey") != api_key:
+            upstream.record("unauthorized")
+            return JSONResponse({"status": 401, "error": "Unauthorized", "response": {"message": "Unauthorized"}}, status_code=401)
+        body = await request.json()
+        number = str(body.get("number") or "")
+        text = ((body.get("textMessage") or {}).get("text")) or body.get("text") or ""
+        if not number or not text:
+            upstream.record("bad_request")
+            return JSONResponse(
+                {"status": 400, "error": "Bad Request", "response": {"message": ["number and text are required"]}},
+                status_code=400,
+            )
+
+        outcome = upstream.decide()
+        await upstream.wait()
+        upstream.record(outcome)
+        if outcome != "ok":
+            status, error = ERRORS[outcome]
+            return JSONResponse({"status": status, "error": error, "response": {"message": error}}, status_code=status)
+
+        timestamp = int(time.time())
+        key = {"remoteJid": _remote_jid(number), "fromMe": True, "id": "BAE5" + uuid.uuid4().hex[:12].upper()}
+        if echo_webhook:
+            task = asyncio.ensure_future(_echo(echo_payload(instance, key, text, timestamp)))
+            echo_tasks.add(task)
+            task.add_done_callback(echo_tasks.discard)
+        return JSONResponse(
+            {
+                "key": key,
+                "message": {"extendedTextMessage": {"text": text}},
+                "messageTimestamp": str(timestamp),
+                "status": "PENDING",
+            },
+            status_code=201,
+        )
+
+    return app
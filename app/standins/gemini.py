@@ -0,0 +1,109 @@
+"""
+Stand-in for the Gemini REST API used by google-genai.
+
+Serves `POST /{version}/models/{model}:generateContent` and
+`:streamGenerateContent` (SSE with `alt=sse`, a JSON array otherwise) with
+the response shapes of the real API. Point the app at it with
+GEMINI_BASE_URL=http://127.0.0.1:8101 and any GEMINI_API_KEY.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.standins.profile import Profile, Upstream, add_control_routes
+
+REPLY = (
+    "Olá! Esse empreendimento tem plantas de 2 e 3 quartos, lazer completo e condições especiais de lançamento. "
+    "Queres que te envie a tabela de preços ou preferes marcar uma visita ao decorado?"
+)
+
+ERRORS = {
+    "throttled": (429, "RESOURCE_EXHAUSTED", "Resource has been exhausted (e.g. check quota)."),
+    "error": (503, "UNAVAILABLE", "The model is overloaded. Please try again later."),
+}
+
+
+def _prompt_text(body: Dict[str, Any]) -> str:
+    texts: List[str] = []
+    for content in body.get("contents") or []:
+        for part in content.get("parts") or []:
+            texts.append(part.get("text") or "")
+    return "\n".join(texts)
+
+
+def _reply(reply_chars: int) -> str:
+    text = REPLY
+    while len(text) < reply_chars:
+        text += " " + REPLY
+    return text[:reply_chars].rstrip()
+
+
+def _response(text: str, model: str, prompt: str, finished: bool = True) -> Dict[str, Any]:
+    candidate: Dict[str, Any] = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    prompt_tokens = max(1, len(prompt) // 4)
+    reply_tokens = max(1, len(text) // 4)
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": reply_tokens,
+            "totalTokenCount": prompt_tokens + reply_tokens,
+        },
+        "modelVersion": model,
+        "responseId": f"standin-{time.monotonic_ns()}",
+    }
+
+
+def _error(outcome: str) -> JSONResponse:
+    status, code, message = ERRORS[outcome]
+    return JSONResponse({"error": {"code": status, "message": message, "status": code}}, status_code=status)
+
+
+def create_app(profile: Profile, reply_chars: int = 240, stream_chunks: int = 4, stream_interval_ms: float = 30.0) -> FastAPI:
+    app = FastAPI(title="Gemini stand-in")
+    upstream = Upstream(profile)
+    app.state.upstream = upstream
+    add_control_routes(app, upstream)
+
+    @app.post("/{version}/models/{target}")
+    async def models(version: str, target: str, request: Request) -> Any:
+        model, _, method = target.partition(":")
+        if method not in ("generateContent", "streamGenerateContent"):
+            return JSONResponse(
+                {"error": {"code": 404, "message": f"Method {method!r} not found", "status": "NOT_FOUND"}},
+                status_code=404,
+            )
+        body = await request.json()
+        prompt = _prompt_text(body)
+        outcome = upstream.decide()
+        await upstream.wait()
+        upstream.record(outcome)
+        if outcome != "ok":
+            return _error(outcome)
+
+        text = _reply(reply_chars)
+        if method == "generateContent":
+            return _response(text, model, prompt)
+
+        size = -(-len(text) // max(1, stream_chunks))
+        pieces = [text[i : i + size] for i in range(0, len(text), size)]
+
+        async def events() -> AsyncIterator[str]:
+            for i, piece in enumerate(pieces):
+                if i:
+                    await asyncio.sleep(stream_interval_ms / 1000)
+                chunk = _response(piece, model, prompt, finished=i == len(pieces) - 1)
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\r\n\r\n"
+
+        if request.query_params.get("alt") == "sse":
+            return StreamingResponse(events(), media_type="text/event-stream")
+        return [_response(piece, model, prompt, finished=i == len(pieces) - 1) for i, piece in enumerate(pieces)]
+
+    return app
@@ -0,0 +1,119 @@
+import asyncio
+import math
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+
+
+@dataclass
+class Profile:
+    """
+    Upstream behaviour of a stand-in server.
+
+    Latency is sampled per request from `latency` ("fixed", "uniform" or
+    "lognormal"): fixed waits `latency_ms`; uniform draws from
+    [`latency_min_ms`, `latency_ms`]; lognormal has median `latency_ms` and
+    shape `latency_sigma` (0.5 gives a p99 of about 3x the median). A
+    request then fails with a 5xx at `error_rate`, or is rejected with 429
+    at `throttle_rate` or whenever `max_rps` (token bucket, 0 = unlimited)
+    is exceeded.
+    """
+
+    latency: str = "lognormal"
+    latency_ms: float = 50.0
+    latency_min_ms: float = 0.0
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    max_rps: float = 0.0
+    seed: Optional[int] = None
+
+    def update(self, values: Dict[str, Any]) -> None:
+        names = {f.name for f in fields(self)}
+        for key, value in values.items():
+            if key not in names:
+                raise ValueError(f"unknown profile field {key!r}")
+            setattr(self, key, value)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class Upstream:
+    """Applies a `Profile` to requests and counts outcomes."""
+
+    def __init__(self, profile: Profile) -> None:
+        self.profile = profile
+        self._random = random.Random(profile.seed)
+        self._lock = threading.Lock()
+        self._tokens = profile.max_rps
+        self._refilled = time.monotonic()
+        self.outcomes: Dict[str, int] = {}
+
+    def configure(self, values: Dict[str, Any]) -> None:
+        self.profile.update(values)
+        if "seed" in values:
+            self._random = random.Random(self.profile.seed)
+        self._tokens = self.profile.max_rps
+
+    def sample_latency(self) -> float:
+        """Seconds to wait before answering."""
+        profile = self.profile
+        if profile.latency == "fixed":
+            millis = profile.latency_ms
+        elif profile.latency == "uniform":
+            millis = self._random.uniform(profile.latency_min_ms, profile.latency_ms)
+        else:
+            millis = self._random.lognormvariate(math.log(max(profile.latency_ms, 1e-3)), profile.latency_sigma)
+        return max(0.0, millis) / 1000
+
+    def _over_rate(self) -> bool:
+        rate = self.profile.max_rps
+        if rate <= 0:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(rate, self._tokens + (now - self._refilled) * rate)
+            self._refilled = now
+            if self._tokens < 1:
+                return True
+            self._tokens -= 1
+            return False
+
+    def decide(self) -> str:
+        """Outcome for the next request: "ok", "throttled" or "error"."""
+        if self._over_rate() or self._random.random() < self.profile.throttle_rate:
+            return "throttled"
+        if self._random.random() < self.profile.error_rate:
+            return "error"
+        return "ok"
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    async def wait(self) -> None:
+        await asyncio.sleep(self.sample_latency())
+
+    def stats(self) -> Dict[str, Any]:
+        return {"profile": self.profile.as_dict(), "outcomes": dict(self.outcomes)}
+
+
+def add_control_routes(app: Any, upstream: Upstream) -> None:
+    """GET /_standin/stats and POST /_standin/profile (partial update) on a stand-in app."""
+
+    @app.get("/_standin/stats")
+    async def standin_stats() -> Dict[str, Any]:
+        return upstream.stats()
+
+    @app.post("/_standin/profile")
+    async def standin_profile(values: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            upstream.configure(values)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        return upstream.stats()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+⏱️ Carga no EmbeddingBatcher: latência p50/p99 e throughput, com e sem micro-batching.
+
+Por omissão usa um encoder sintético cujo custo é fixo por chamada mais um
+custo por texto (como um transformer na CPU); --model usa o all-MiniLM-L6-v2
+real (chromadb ou sentence-transformers).
+
+Uso:
+    python scripts/bench_embedding_batch.py [--requests 2000] [--concurrency 64]
+    python scripts/bench_embedding_batch.py --model --max-batch 32 --max-wait-ms 5
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.embedding_batcher import EmbeddingBatcher  # noqa: E402
+from app.services.retrieval import load_embedder  # noqa: E402
+
+PERGUNTAS = [
+    "quanto custa o apartamento de 2 quartos",
+    "tem piscina e academia",
+    "qual a data de entrega",
+    "aceita financiamento",
+    "tem vaga de garagem",
+    "onde fica o stand de vendas",
+]
+
+
+def synthetic_encoder(call_ms: float, item_ms: float):
+    def encode(texts):
+        time.sleep((call_ms + item_ms * len(texts)) / 1000)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    return encode
+
+
+async def run_load(batcher: EmbeddingBatcher, requests: int, concurrency: int):
+    latencies = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            # Texto único por pedido: mede o batching, não a deduplicação.
+            text = f"{PERGUNTAS[i % len(PERGUNTAS)]} {i}"
+            start = time.perf_counter()
+            await batcher.embed(text)
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+def report(name: str, latencies, elapsed: float, batcher: EmbeddingBatcher) -> None:
+    cuts = statistics.quantiles(latencies, n=100)
+    stats = batcher.stats()
+    print(
+        f"{name:<12} {len(latencies) / elapsed:>10.0f} {statistics.median(latencies) * 1e3:>9.2f} "
+        f"{cuts[98] * 1e3:>9.2f} {stats['mean_batch']:>10.1f} {stats['batches']:>8}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark do micro-batching de embeddings")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--model", action="store_true", help="usa o modelo de embeddings real")
+    parser.add_argument("--call-ms", type=float, default=4.0, help="custo fixo por chamada (sintético)")
+    parser.add_argument("--item-ms", type=float, default=0.3, help="custo por texto (sintético)")
+    args = parser.parse_args()
+
+    if args.model:
+        encoder = load_embedder()
+        if encoder is None:
+            raise SystemExit("❌ Nenhum modelo de embeddings disponível")
+        encoder(["aquecimento"])
+    else:
+        encoder = synthetic_encoder(args.call_ms, args.item_ms)
+
+    print(f"pedidos={args.requests} concorrência={args.concurrency}")
+    print(f"{'modo':<12} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'lote médio':>10} {'lotes':>8}")
+    print("-" * 63)
+    for name, max_batch, max_wait in (
+        ("sem batch", 1, 0.0),
+        ("batch", args.max_batch, args.max_wait_ms / 1000),
+    ):
+        batcher = EmbeddingBatcher(encoder, max_batch=max_batch, max_wait=max_wait)
+        latencies, elapsed = asyncio.run(run_load(batcher, args.requests, args.concurrency))
+        report(name, latencies, elapsed, batcher)
+
+
+if __name__ == "__main__":
+    main()
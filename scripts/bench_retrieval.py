@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+⏱️ Compara a latência de recuperação dos backends Chroma e NumPy.
+
+Modos:
+- padrão: para cada backend disponível, mede backend.query() (embedding da
+  pergunta + busca) em perguntas de exemplo e mostra p50/p95/p99
+- --synthetic N: só o kernel de busca do NumpyBackend sobre N vetores
+  aleatórios (sem modelo de embeddings), contra um argsort completo
+
+Uso:
+    python scripts/bench_retrieval.py [--rounds 50] [--k 5]
+    python scripts/bench_retrieval.py --synthetic 100000 [--dim 384]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services.retrieval import CHROMA_COLLECTION, CHROMA_PATH, ChromaBackend, NumpyBackend  # noqa: E402
+
+
+QUERIES = [
+    "Quanto custa o apartamento de 2 quartos?",
+    "O empreendimento tem piscina e academia?",
+    "Qual a data de entrega das chaves?",
+    "Aceita financiamento pela Caixa?",
+    "Tem vaga de garagem coberta?",
+    "Onde fica o stand de vendas?",
+    "Qual a metragem da planta de 3 dormitórios?",
+    "Tem unidades com varanda gourmet?",
+]
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    cuts = statistics.quantiles(samples, n=100) if len(samples) > 1 else samples * 99
+    return statistics.median(samples), cuts[94], cuts[98]
+
+
+def _report(name, samples) -> None:
+    p50, p95, p99 = _percentiles(samples)
+    print(f"{name:<22} {len(samples):>7} {p50 * 1e3:>9.3f} {p95 * 1e3:>9.3f} {p99 * 1e3:>9.3f}")
+
+
+def _header() -> None:
+    print(f"{'backend':<22} {'queries':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    print("-" * 60)
+
+
+def bench_backends(rounds: int, k: int) -> None:
+    backends = []
+    chroma = ChromaBackend.open(CHROMA_PATH, CHROMA_COLLECTION)
+    if chroma is None:
+        print("Aviso: ChromaDB indisponível, backend chroma ignorado")
+    else:
+        backends.append(chroma)
+    try:
+        backends.append(NumpyBackend(settings.VECTOR_INDEX_DIR))
+    except Exception as exc:
+        print(f"Aviso: índice NumPy indisponível em {settings.VECTOR_INDEX_DIR} ({exc}); rode build_vector_index.py")
+    if not backends:
+        raise SystemExit("❌ Nenhum backend disponível")
+
+    _header()
+    for backend in backends:
+        backend.warm_up()
+        samples = []
+        for _ in range(rounds):
+            for query in QUERIES:
+                start = time.perf_counter()
+                backend.query(query, k)
+                samples.append(time.perf_counter() - start)
+        _report(backend.name, samples)
+
+
+def bench_synthetic(count: int, dim: int, rounds: int, k: int) -> None:
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(count, dim)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    backend = NumpyBackend.__new__(NumpyBackend)
+    backend.matrix = matrix
+    queries = rng.normal(size=(rounds, dim)).astype(np.float32)
+
+    _header()
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        backend.search(query, k)
+        samples.append(time.perf_counter() - start)
+    _report(f"argpartition n={count}", samples)
+
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        np.argsort(-(matrix @ (query / np.linalg.norm(query))))[:k]
+        samples.append(time.perf_counter() - start)
+    _report(f"argsort n={count}", samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de recuperação")
+    parser.add_argument("--rounds", type=int, default=50, help="repetições do conjunto de perguntas")
+    parser.add_argument("--k", type=int, default=settings.CHROMA_K, help="resultados por pergunta")
+    parser.add_argument("--synthetic", type=int, default=0, help="N vetores aleatórios (só o kernel NumPy)")
+    parser.add_argument("--dim", type=int, default=384, help="dimensão dos vetores sintéticos")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        bench_synthetic(args.synthetic, args.dim, max(args.rounds, 100), args.k)
+    else:
+        bench_backends(args.rounds, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+⏱️ Microbenchmark do parsing de payloads do webhook.
+
+Compara, para cada payload gravado em tests/fixtures/webhook_payloads.json:
+- dict: json.loads + extract_message_context + extract_text (caminho antigo)
+- typed: decode_webhook (msgspec direto dos bytes para structs tipadas)
+
+Uso:
+    python scripts/bench_webhook_decode.py [--number 20000]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.api.payloads import decode_webhook, extract_message_context, extract_text, msgspec  # noqa: E402
+
+FIXTURES = Path("tests/fixtures/webhook_payloads.json")
+
+
+def _dict_path(raw: bytes) -> str:
+    body = json.loads(raw)
+    ctx = extract_message_context(body)
+    return extract_text(body, ctx.get("message", {}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark do decode de payloads do webhook")
+    parser.add_argument("--number", type=int, default=20000, help="iterações por payload")
+    args = parser.parse_args()
+
+    if msgspec is None:
+        print("Aviso: msgspec não instalado, decode_webhook usa o caminho dict (pip install msgspec)")
+
+    payloads = json.loads(FIXTURES.read_text(encoding="utf-8"))
+    print(f"{'payload':<26} {'bytes':>7} {'dict µs':>9} {'typed µs':>9} {'speedup':>8}")
+    print("-" * 63)
+    for name, payload in payloads.items():
+        raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        t_dict = min(timeit.repeat(lambda: _dict_path(raw), number=args.number, repeat=3)) / args.number
+        t_typed = min(timeit.repeat(lambda: decode_webhook(raw), number=args.number, repeat=3)) / args.number
+        print(f"{name:<26} {len(raw):>7} {t_dict * 1e6:>9.2f} {t_typed * 1e6:>9.2f} {t_dict / t_typed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
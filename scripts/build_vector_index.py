@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+🧮 Constrói o índice vetorial local usado por RETRIEVAL_BACKEND=numpy.
+
+Fontes:
+- chroma: exporta os embeddings já calculados da coleção riva_imoveis (data/chroma_db)
+- knowledge: exporta o KnowledgeStore de scripts/knowledge_manager.py (knowledge_store.pkl)
+- jsonl: lê data/base_conhecimento.jsonl (chunks do ingest.py) e calcula os embeddings
+
+O índice (embeddings.npy, documents.jsonl, meta.json) é gravado em
+VECTOR_INDEX_DIR e substituído de forma atômica; o servidor recarrega-o
+sozinho na próxima verificação de versão.
+
+Uso:
+    python scripts/build_vector_index.py --source chroma
+    python scripts/build_vector_index.py --source jsonl --input data/base_conhecimento.jsonl
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings  # noqa: E402
+from app.services.retrieval import (  # noqa: E402
+    CHROMA_COLLECTION,
+    CHROMA_PATH,
+    EMBEDDING_MODEL_NAME,
+    load_embedder,
+    write_index,
+)
+
+KNOWLEDGE_STORE = "conhecimento_ia/vetorial/knowledge_store.pkl"
+JSONL_PATH = "data/base_conhecimento.jsonl"
+
+
+def from_chroma(path: str, name: str):
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=path).get_or_create_collection(name)
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+    return data["embeddings"], data["documents"], data.get("metadatas") or None
+
+
+def from_knowledge(path: str):
+    with open(path, "rb") as fh:
+        obj = pickle.load(fh)
+    return obj.get("embeddings", []), obj.get("documents", []), obj.get("metadatas") or None
+
+
+def from_jsonl(path: str, batch_size: int):
+    documents, metadatas = [], []
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            texto = (record.pop("texto", "") or "").strip()
+            if texto:
+                documents.append(texto)
+                metadatas.append({k: v for k, v in record.items() if isinstance(v, (str, int, float, bool))})
+
+    embedder = load_embedder(EMBEDDING_MODEL_NAME)
+    if embedder is None:
+        raise SystemExit("❌ Nenhum modelo de embeddings disponível (instale chromadb ou sentence-transformers)")
+    embeddings = []
+    for start in range(0, len(documents), batch_size):
+        embeddings.extend(embedder(documents[start : start + batch_size]))
+        print(f"   ⏳ {min(start + batch_size, len(documents))}/{len(documents)} chunks")
+    return embeddings, documents, metadatas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Constrói o índice vetorial NumPy")
+    parser.add_argument("--source", choices=["chroma", "knowledge", "jsonl"], default="chroma")
+    parser.add_argument("--input", help="caminho da fonte (coleção Chroma, .pkl ou .jsonl)")
+    parser.add_argument("--output", default=settings.VECTOR_INDEX_DIR, help="diretório do índice")
+    parser.add_argument("--batch-size", type=int, default=64, help="chunks por lote de embeddings (jsonl)")
+    args = parser.parse_args()
+
+    print(f"🔎 Lendo fonte '{args.source}'...")
+    if args.source == "chroma":
+        embeddings, documents, metadatas = from_chroma(args.input or CHROMA_PATH, CHROMA_COLLECTION)
+    elif args.source == "knowledge":
+        embeddings, documents, metadatas = from_knowledge(args.input or KNOWLEDGE_STORE)
+    else:
+        embeddings, documents, metadatas = from_jsonl(args.input or JSONL_PATH, args.batch_size)
+
+    if not documents:
+        raise SystemExit("❌ A fonte não tem documentos; nada a indexar")
+
+    meta = write_index(
+        args.output,
+        embeddings,
+        documents,
+        metadatas=metadatas,
+        source=f"{args.source}:{args.input or ''}".rstrip(":"),
+    )
+    size = os.path.getsize(os.path.join(args.output, "embeddings.npy")) / 1024 / 1024
+    print(f"✅ Índice gravado em {args.output}: {meta['count']} chunks, dim {meta['dim']}, {size:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
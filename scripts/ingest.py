@@ -6,10 +6,17 @@ import fitz
 import hashlib
 import json
 import os
+import sys
 from datetime import datetime
+from pathlib import Path
 from bs4 import BeautifulSoup
 from playwright.async_api import async_playwright
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings  # noqa: E402
+from app.services.lexical_index import BM25Index  # noqa: E402
+
 
 # ============================================================================
 # SEÇÃO 1: FUNÇÕES DE LIMPEZA E PROCESSAMENTO DE TEXTO
@@ -146,6 +153,44 @@ def salvar_para_base_conhecimento(dados_imovel, arquivo="data/base_conhecimento.
             f.write(linha + '\n')
     except Exception as e:
         print(f"⚠ Erro ao salvar documento JSONL: {str(e)}")
+    indexar_lexical(dados_imovel)
+
+
+_indice_lexical = None
+
+
+def indexar_lexical(dados_imovel):
+    """Adiciona o documento ao índice BM25 (busca por nome de empreendimento e código de unidade).
+
+    O índice é incremental: um documento com o mesmo id substitui o anterior.
+    É gravado em disco por salvar_indice_lexical() no fim da ingestão.
+    """
+    texto = dados_imovel.get("texto") or ""
+    if not texto.strip():
+        return
+    doc_id = dados_imovel.get("id") or hashlib.sha256(texto.encode("utf-8")).hexdigest()
+    metadados = {k: v for k, v in dados_imovel.items() if k != "texto" and isinstance(v, (str, int, float, bool))}
+    _abrir_indice_lexical().add(doc_id, texto, metadados)
+
+
+def _abrir_indice_lexical():
+    global _indice_lexical
+    if _indice_lexical is None:
+        _indice_lexical = BM25Index.open(settings.LEXICAL_INDEX_PATH)
+    return _indice_lexical
+
+
+def remover_lexical(doc_id):
+    """Remove um documento do índice BM25 (ids que deixaram de existir)."""
+    _abrir_indice_lexical().remove(doc_id)
+
+
+def salvar_indice_lexical():
+    """Grava o índice BM25 (substituição atômica; o servidor recarrega-o sozinho)."""
+    if _indice_lexical is None:
+        return None
+    _indice_lexical.save(settings.LEXICAL_INDEX_PATH)
+    return settings.LEXICAL_INDEX_PATH
 
 
 # ============================================================================
@@ -517,18 +562,25 @@ async def main():
         for site, dados in mapa.items():
             site_slug = slugify(site)
             
-            # Salva o conteúdo HTML limpo também na base de conhecimento
+            # Salva o conteúdo HTML limpo também na base de conhecimento, em chunks
+            # como os PDFs: o índice vetorial e o BM25 recebem os mesmos pedaços.
             if dados.get('html_limpo'):
-                doc_html = {
-                    "id": f"{site_slug}_pagina_principal",
-                    "source_url": dados['url_principal'],
-                    "site_origem": site,
-                    "site_slug": site_slug,
-                    "type": "página_principal",
-                    "texto": dados['html_limpo'],
-                    "crawl_date": datetime.utcnow().isoformat()
-                }
-                salvar_para_base_conhecimento(doc_html)
+                # Ingestões antigas indexavam a página inteira com este id.
+                remover_lexical(f"{site_slug}_pagina_principal")
+                chunks_html = chunk_text(dados['html_limpo'], chunk_size=1000, overlap=200)
+                for idx, c in enumerate(chunks_html):
+                    doc_html = {
+                        "id": f"{site_slug}_pagina_principal#chunk{idx}",
+                        "source_url": dados['url_principal'],
+                        "site_origem": site,
+                        "site_slug": site_slug,
+                        "type": "página_principal",
+                        "chunk_index": idx,
+                        "total_chunks": len(chunks_html),
+                        "texto": c,
+                        "crawl_date": datetime.utcnow().isoformat()
+                    }
+                    salvar_para_base_conhecimento(doc_html)
             
             for sub in dados.get("links_internos", []):
                 tipo = sub.get("tipo", "")
@@ -567,11 +619,15 @@ async def main():
     with open(summary_path, "w", encoding="utf-8") as fh:
         json.dump(results, fh, ensure_ascii=False, indent=2)
     
+    indice_lexical_path = salvar_indice_lexical()
+
     # Informa consumidor sobre a base de conhecimento
     base_conhecimento_path = os.path.join(DATA_DIR, "base_conhecimento.jsonl")
     print(f"✅ Ingest finished!")
     print(f"   📋 Summary: {summary_path}")
     print(f"   🧠 Base de Conhecimento (JSONL): {base_conhecimento_path}")
+    if indice_lexical_path:
+        print(f"   🔤 Índice lexical (BM25): {indice_lexical_path} ({len(_indice_lexical)} documentos)")
     print(f"   💾 Total de linhas processadas: {len(results)}")
     print("\n" + "="*80 + "\n")
 
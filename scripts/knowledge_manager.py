@@ -9,8 +9,12 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 import pickle
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings  # noqa: E402
 
 # force stdout to utf-8 with replacement errors so emojis don't crash on Windows
 try:
@@ -18,9 +22,53 @@ try:
 except Exception:
     pass
 
-# Inicializa modelo de embeddings
 EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
-model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+
+class EmbeddingModel:
+    """Modelo de embeddings do conhecimento.
+
+    Com RETRIEVAL_SIDECAR_SOCKET definido usa o modelo já carregado pelo
+    sidecar partilhado (python -m app.services.retrieval_sidecar); senão
+    carrega um SentenceTransformer local, só no primeiro uso.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        self.model_name = model_name
+        self._local = None
+        self._sidecar = None
+        if settings.RETRIEVAL_SIDECAR_SOCKET:
+            from app.services.retrieval_sidecar import SidecarClient
+
+            self._sidecar = SidecarClient(settings.RETRIEVAL_SIDECAR_SOCKET, timeout=60)
+
+    def _model(self):
+        if self._local is None:
+            from sentence_transformers import SentenceTransformer
+
+            self._local = SentenceTransformer(self.model_name)
+        return self._local
+
+    def encode(self, texts, show_progress_bar=False, convert_to_numpy=True):
+        if self._sidecar is not None:
+            try:
+                vectors = self._sidecar.embed(list(texts))
+            except Exception as e:
+                print(f"⚠️ Sidecar de embeddings indisponível ({e}); a usar o modelo local")
+                self._sidecar = None
+            else:
+                if vectors is not None:
+                    return np.asarray(vectors, dtype=np.float32)
+        return self._model().encode(texts, show_progress_bar=show_progress_bar, convert_to_numpy=convert_to_numpy)
+
+    def get_sentence_embedding_dimension(self):
+        if self._sidecar is not None:
+            return len(self.encode(["dimensão"])[0])
+        return self._model().get_sentence_embedding_dimension()
+
+
+# Inicializa modelo de embeddings
+model = EmbeddingModel()
 
 # Diretórios de armazenamento
 KNOWLEDGE_DIR = "./conhecimento_ia"
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+🚦 Gerador de carga para o webhook (tráfego no formato da Evolution API).
+
+Envia mensagens `messages.upsert` a uma taxa alvo (malha aberta: os envios
+seguem o calendário de chegadas mesmo que o servidor atrase, para não
+esconder filas), espalhadas por N contactos, com uma fração de ecos
+fromMe. Mostra throughput, erros e latência p50/p95/p99 por resultado
+(código HTTP + campo "status" da resposta) e grava tudo em JSON para
+comparar execuções.
+
+Chegadas: intervalos com distribuição gama e coeficiente de variação
+--burstiness (0 = ritmo constante, 1 = Poisson, >1 = rajadas).
+
+Uso:
+    python scripts/load_test_webhook.py --rate 50 --duration 60 --contacts 500 --json antes.json
+    python scripts/load_test_webhook.py --compare antes.json depois.json
+
+Para testar sem Gemini/Evolution reais, suba os stand-ins: python -m app.standins
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+PERGUNTAS = [
+    "Oi, qual o valor do Duet?",
+    "Tem apartamento de 3 quartos no Apogeu Barra?",
+    "Qual a data de entrega do Ilhamar?",
+    "Aceita financiamento pela Caixa?",
+    "Tem vaga de garagem coberta?",
+    "Onde fica o stand de vendas?",
+    "Quanto é a entrada?",
+    "Tem unidade com varanda gourmet?",
+    "Posso agendar uma visita no sábado?",
+    "Qual a metragem da planta de 2 quartos?",
+]
+
+RESPOSTA_BOT = "Olá! Posso ajudar com mais alguma informação sobre o empreendimento?"
+
+
+def payload(instance: str, contact: str, from_me: bool, rng: random.Random) -> Dict[str, Any]:
+    text = RESPOSTA_BOT if from_me else rng.choice(PERGUNTAS)
+    return {
+        "event": "messages.upsert",
+        "instance": instance,
+        "data": {
+            "key": {
+                "remoteJid": f"{contact}@s.whatsapp.net",
+                "fromMe": from_me,
+                "id": uuid.uuid4().hex[:20].upper(),
+            },
+            "pushName": "" if from_me else f"Cliente {contact[-4:]}",
+            "message": {"conversation": text},
+            "messageType": "conversation",
+            "messageTimestamp": int(time.time()),
+            "source": "loadtest",
+        },
+    }
+
+
+def arrivals(rate: float, burstiness: float, duration: float, limit: int, rng: random.Random) -> List[float]:
+    """Instantes de envio (segundos desde o início)."""
+    mean = 1.0 / rate
+    times: List[float] = []
+    t = 0.0
+    while len(times) < limit:
+        if burstiness <= 0:
+            gap = mean
+        else:
+            shape = 1.0 / (burstiness ** 2)
+            gap = rng.gammavariate(shape, mean / shape)
+        t += gap
+        if duration and t > duration:
+            break
+        times.append(t)
+    return times
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pick(0.50) * 1000,
+        "p95_ms": pick(0.95) * 1000,
+        "p99_ms": pick(0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    contacts = [f"5521{9 * 10 ** 8 + i:09d}" for i in range(args.contacts)]
+    schedule = arrivals(args.rate, args.burstiness, args.duration, args.requests or sys.maxsize, rng)
+    if not schedule:
+        raise SystemExit("❌ Nenhum envio agendado; aumente --duration ou --requests")
+
+    headers = dict(h.split(":", 1) for h in args.header)
+    latencies: Dict[str, List[float]] = {}
+    lags: List[float] = []
+    errors: Dict[str, int] = {}
+    slots = asyncio.Semaphore(args.max_inflight)
+
+    async with httpx.AsyncClient(
+        timeout=args.timeout, headers={k.strip(): v.strip() for k, v in headers.items()},
+        limits=httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight),
+    ) as client:
+
+        async def send(at: float, body: Dict[str, Any]) -> None:
+            async with slots:
+                started = time.perf_counter()
+                lags.append(started - (t0 + at))
+                try:
+                    response = await client.post(args.url, json=body)
+                except httpx.HTTPError as exc:
+                    name = type(exc).__name__
+                    errors[name] = errors.get(name, 0) + 1
+                    return
+                elapsed = time.perf_counter() - started
+                try:
+                    status = response.json().get("status", "")
+                except (ValueError, AttributeError):
+                    status = ""
+                outcome = f"{response.status_code} {status}".strip()
+                latencies.setdefault(outcome, []).append(elapsed)
+
+        tasks = []
+        t0 = time.perf_counter()
+        for at in schedule:
+            delay = t0 + at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            from_me = rng.random() < args.from_me_ratio
+            body = payload(args.instance, rng.choice(contacts), from_me, rng)
+            tasks.append(asyncio.ensure_future(send(at, body)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - t0
+
+    answered = [x for samples in latencies.values() for x in samples]
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "json", "header")},
+        "summary": {
+            "sent": len(schedule),
+            "answered": len(answered),
+            "errors": sum(errors.values()),
+            "elapsed_s": elapsed,
+            "offered_rps": len(schedule) / schedule[-1] if schedule[-1] else 0.0,
+            "throughput_rps": len(answered) / elapsed if elapsed else 0.0,
+            "send_lag_p99_ms": percentiles(lags).get("p99_ms", 0.0),
+        },
+        "latency": {"all": percentiles(answered), **{k: percentiles(v) for k, v in sorted(latencies.items())}},
+        "errors": errors,
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    s = result["summary"]
+    print(
+        f"\n📊 enviados={s['sent']} respondidos={s['answered']} erros={s['errors']} "
+        f"oferta={s['offered_rps']:.1f} req/s throughput={s['throughput_rps']:.1f} req/s "
+        f"(atraso de envio p99 {s['send_lag_p99_ms']:.1f} ms)"
+    )
+    print(f"{'resultado':<28} {'n':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    print("-" * 75)
+    for outcome, p in result["latency"].items():
+        if p:
+            print(f"{outcome:<28} {p['count']:>7} {p['p50_ms']:>9.1f} {p['p95_ms']:>9.1f} {p['p99_ms']:>9.1f} {p['max_ms']:>9.1f}")
+    for name, count in result["errors"].items():
+        print(f"❌ {name}: {count}")
+
+
+def compare(before_path: str, after_path: str) -> None:
+    with open(before_path, encoding="utf-8") as fh:
+        before = json.load(fh)
+    with open(after_path, encoding="utf-8") as fh:
+        after = json.load(fh)
+
+    def delta(a: Optional[float], b: Optional[float]) -> str:
+        if a is None or b is None:
+            return f"{'-':>22}"
+        change = (b - a) / a * 100 if a else 0.0
+        return f"{a:>8.1f} → {b:>8.1f} {change:+5.0f}%"
+
+    print(f"📈 {before_path} → {after_path}")
+    for key in ("throughput_rps", "errors"):
+        print(f"{key:<28} {delta(before['summary'].get(key), after['summary'].get(key))}")
+    print(f"\n{'resultado':<28} {'p50 ms':>24} {'p99 ms':>24}")
+    for outcome in sorted(set(before["latency"]) | set(after["latency"])):
+        a = before["latency"].get(outcome) or {}
+        b = after["latency"].get(outcome) or {}
+        print(f"{outcome:<28} {delta(a.get('p50_ms'), b.get('p50_ms'))} {delta(a.get('p99_ms'), b.get('p99_ms'))}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Teste de carga do webhook")
+    parser.add_argument("--url", default="http://localhost:8000/webhook")
+    parser.add_argument("--rate", type=float, default=20.0, help="envios por segundo (média)")
+    parser.add_argument("--duration", type=float, default=30.0, help="segundos (0 = só --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="máximo de envios (0 = só --duration)")
+    parser.add_argument("--contacts", type=int, default=200, help="contactos distintos")
+    parser.add_argument("--burstiness", type=float, default=1.0, help="CV dos intervalos: 0 constante, 1 Poisson")
+    parser.add_argument("--from-me-ratio", type=float, default=0.1, help="fração de ecos fromMe")
+    parser.add_argument("--instance", default="BotRiva1")
+    parser.add_argument("--max-inflight", type=int, default=500, help="pedidos simultâneos no máximo")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--header", action="append", default=[], help="cabeçalho extra 'Nome: valor'")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", help="grava o resultado neste ficheiro")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "DEPOIS"), help="compara dois resultados JSON")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if not args.duration and not args.requests:
+        parser.error("indique --duration ou --requests")
+
+    print(f"🚀 {args.url}: {args.rate} req/s, {args.contacts} contactos, burstiness {args.burstiness}, fromMe {args.from_me_ratio:.0%}")
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, ensure_ascii=False, indent=2)
+        print(f"💾 Resultado gravado em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -114,7 +114,8 @@ def popular_banco(arquivo_jsonl: str = "data/base_conhecimento.jsonl"):
 
                 documentos.append(chunk.get("texto", ""))
                 metadados.append(chunk.get("metadados", {}))
-                ids.append(str(chunk.get("id_chunk", len(ids))))
+                # Mesmo id que o índice BM25 (scripts/ingest.py), para a fusão híbrida.
+                ids.append(str(chunk.get("id") or chunk.get("id_chunk", len(ids))))
 
         if documentos:
             # Gera embeddings em batch
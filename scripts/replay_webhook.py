@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+🔁 Reenvia ao webhook o tráfego gravado em produção (WEBHOOK_RECORD_ENABLED).
+
+Lê `webhook.jsonl` e as rotações `webhook.jsonl.N.gz` de uma pasta de
+gravação, ordena por hora de chegada e reenvia cada payload para --url
+respeitando os intervalos originais divididos por --speed (2 = duas vezes
+mais rápido, 0 = sem pausas). Os envios seguem o calendário mesmo que o
+servidor atrase (malha aberta), como em load_test_webhook.py.
+
+Por omissão os ids das mensagens recebem um sufixo por execução, para a
+deduplicação não descartar o segundo replay; use --keep-ids para os
+manter. Cada envio fica registado (índice, código HTTP, "status" e
+latência) no JSON de saída, e --compare mostra, mensagem a mensagem, que
+resultados mudaram entre duas builds e a diferença de latência.
+
+Uso:
+    python scripts/replay_webhook.py data/recordings --speed 4 --json build_a.json
+    python scripts/replay_webhook.py data/recordings --speed 4 --json build_b.json
+    python scripts/replay_webhook.py --compare build_a.json build_b.json
+
+Para não chamar Gemini/Evolution reais, suba os stand-ins: python -m app.standins
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+from load_test_webhook import percentiles
+
+
+def ficheiros(origem: str) -> List[Path]:
+    """Ficheiros de gravação, do mais antigo (rotação mais alta) ao ativo."""
+    path = Path(origem)
+    if path.is_file():
+        return [path]
+
+    def ordem(p: Path) -> int:
+        match = re.search(r"\.(\d+)\.gz$", p.name)
+        return -int(match.group(1)) if match else 0
+
+    return sorted(path.glob("*.jsonl*"), key=ordem)
+
+
+def ler_gravacao(origem: str) -> Iterator[Dict[str, Any]]:
+    for path in ficheiros(origem):
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def sufixar_ids(node: Any, sufixo: str) -> Any:
+    """Acrescenta `sufixo` aos ids das mensagens (data.key.id)."""
+    if isinstance(node, dict):
+        result = {k: sufixar_ids(v, sufixo) for k, v in node.items()}
+        key = result.get("key")
+        if isinstance(key, dict) and isinstance(key.get("id"), str):
+            result["key"] = {**key, "id": key["id"] + sufixo}
+        return result
+    if isinstance(node, list):
+        return [sufixar_ids(item, sufixo) for item in node]
+    return node
+
+
+async def replay(args: argparse.Namespace) -> Dict[str, Any]:
+    entradas = [e for e in ler_gravacao(args.origem) if "body" in e]
+    entradas.sort(key=lambda e: e["ts"])
+    if args.limit:
+        entradas = entradas[: args.limit]
+    if not entradas:
+        raise SystemExit(f"❌ Nenhuma entrega reenviável em {args.origem}")
+
+    first = entradas[0]["ts"]
+    schedule = [(e["ts"] - first) / args.speed if args.speed > 0 else 0.0 for e in entradas]
+    sufixo = "" if args.keep_ids else "-R" + uuid.uuid4().hex[:6].upper()
+    headers = {k.strip(): v.strip() for k, v in (h.split(":", 1) for h in args.header)}
+    results: List[Optional[Dict[str, Any]]] = [None] * len(entradas)
+    slots = asyncio.Semaphore(args.max_inflight)
+
+    async with httpx.AsyncClient(
+        timeout=args.timeout, headers=headers,
+        limits=httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight),
+    ) as client:
+
+        async def send(index: int, body: Dict[str, Any]) -> None:
+            recorded = entradas[index]
+            result: Dict[str, Any] = {
+                "index": index,
+                "recorded": f"{recorded.get('http_status')} {recorded.get('status', '')}".strip(),
+                "recorded_ms": recorded.get("duration_ms"),
+            }
+            async with slots:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(args.url, json=body)
+                except httpx.HTTPError as exc:
+                    result["outcome"] = type(exc).__name__
+                    results[index] = result
+                    return
+                result["latency_ms"] = (time.perf_counter() - started) * 1000
+            try:
+                status = response.json().get("status", "")
+            except (ValueError, AttributeError):
+                status = ""
+            result["outcome"] = f"{response.status_code} {status}".strip()
+            results[index] = result
+
+        tasks = []
+        t0 = time.perf_counter()
+        for index, (at, entrada) in enumerate(zip(schedule, entradas)):
+            delay = t0 + at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            body = sufixar_ids(entrada["body"], sufixo) if sufixo else entrada["body"]
+            tasks.append(asyncio.ensure_future(send(index, body)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - t0
+
+    feitos = [r for r in results if r is not None]
+    latencias = [r["latency_ms"] / 1000 for r in feitos if "latency_ms" in r]
+    outcomes: Dict[str, int] = {}
+    for r in feitos:
+        outcomes[r["outcome"]] = outcomes.get(r["outcome"], 0) + 1
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "json", "header")},
+        "summary": {
+            "sent": len(entradas),
+            "answered": len(latencias),
+            "elapsed_s": elapsed,
+            "recorded_span_s": entradas[-1]["ts"] - first,
+            "outcomes": dict(sorted(outcomes.items())),
+        },
+        "latency": percentiles(latencias),
+        "results": feitos,
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    s = result["summary"]
+    print(
+        f"\n📊 reenviados={s['sent']} respondidos={s['answered']} em {s['elapsed_s']:.1f}s "
+        f"(gravação cobria {s['recorded_span_s']:.1f}s)"
+    )
+    for outcome, count in s["outcomes"].items():
+        print(f"   {outcome:<34} {count:>7}")
+    p = result["latency"]
+    if p:
+        print(f"⏱️  p50 {p['p50_ms']:.1f} ms  p95 {p['p95_ms']:.1f} ms  p99 {p['p99_ms']:.1f} ms  max {p['max_ms']:.1f} ms")
+
+
+def compare(before_path: str, after_path: str, show: int = 20) -> None:
+    with open(before_path, encoding="utf-8") as fh:
+        before = json.load(fh)
+    with open(after_path, encoding="utf-8") as fh:
+        after = json.load(fh)
+
+    a_by_index = {r["index"]: r for r in before["results"]}
+    b_by_index = {r["index"]: r for r in after["results"]}
+    transitions: Dict[str, List[int]] = {}
+    for index in sorted(set(a_by_index) & set(b_by_index)):
+        a, b = a_by_index[index]["outcome"], b_by_index[index]["outcome"]
+        if a != b:
+            transitions.setdefault(f"{a} → {b}", []).append(index)
+
+    print(f"📈 {before_path} → {after_path}")
+    common = len(set(a_by_index) & set(b_by_index))
+    changed = sum(len(v) for v in transitions.values())
+    print(f"mensagens comparadas={common} com resultado diferente={changed}")
+    for name, indexes in sorted(transitions.items(), key=lambda item: -len(item[1])):
+        amostra = ", ".join(str(i) for i in indexes[:show])
+        print(f"   {name:<44} {len(indexes):>6}  (índices: {amostra}{' ...' if len(indexes) > show else ''})")
+
+    print(f"\n{'latência':<10} {'A ms':>9} {'B ms':>9} {'Δ':>7}")
+    for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms"):
+        x, y = before["latency"].get(key), after["latency"].get(key)
+        if x is None or y is None:
+            continue
+        change = (y - x) / x * 100 if x else 0.0
+        print(f"{key[:-3]:<10} {x:>9.1f} {y:>9.1f} {change:>+6.0f}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay do tráfego gravado do webhook")
+    parser.add_argument("origem", nargs="?", default="data/recordings", help="pasta ou ficheiro de gravação")
+    parser.add_argument("--url", default="http://localhost:8000/webhook")
+    parser.add_argument("--speed", type=float, default=1.0, help="fator de velocidade (0 = sem pausas)")
+    parser.add_argument("--limit", type=int, default=0, help="máximo de entregas (0 = todas)")
+    parser.add_argument("--keep-ids", action="store_true", help="não acrescenta sufixo aos ids das mensagens")
+    parser.add_argument("--max-inflight", type=int, default=500, help="pedidos simultâneos no máximo")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--header", action="append", default=[], help="cabeçalho extra 'Nome: valor'")
+    parser.add_argument("--json", help="grava o resultado neste ficheiro")
+    parser.add_argument("--compare", nargs=2, metavar=("A", "B"), help="compara dois replays gravados em JSON")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    print(f"🔁 {args.origem} → {args.url} (velocidade {args.speed or 'máxima'}x)")
+    result = asyncio.run(replay(args))
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, ensure_ascii=False, indent=2)
+        print(f"💾 Resultado gravado em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
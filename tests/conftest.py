@@ -0,0 +1,37 @@
+import pytest
+
+from app.core.config import settings
+from app.services.ai_service import AIService
+from app.services.circuit_breaker import CircuitBreaker
+
+
+@pytest.fixture(autouse=True)
+def _no_conversation_memory(monkeypatch):
+    """Keep webhook tests off the real data/app.db; memory tests use their own temp DB."""
+    monkeypatch.setattr(settings, "CONVERSATION_MEMORY_ENABLED", False)
+
+
+@pytest.fixture
+def make_ai_service():
+    """
+    Build a real AIService with Gemini and retrieval stubbed out.
+
+    Caches and single-flight start disabled and the breaker uses test
+    thresholds; keyword arguments override attributes after construction.
+    """
+
+    def _make(**attrs):
+        service = AIService()
+        service.model = None
+        service.backend = None
+        service.answer_cache = None
+        service.retrieval_cache = None
+        service.query_vectors = None
+        service.retrieval_flight = None
+        service.llm_flight = None
+        service.breaker = CircuitBreaker("test", failure_threshold=3, slow_call_sec=0, cooldown=60)
+        for name, value in attrs.items():
+            setattr(service, name, value)
+        return service
+
+    return _make
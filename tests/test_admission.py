@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+def test_admission_sheds_globally_and_per_contact():
+    controller = AdmissionController(max_inflight=1, max_waiting=2, max_per_contact=2, retry_after=7)
+    controller.admit("a")
+    controller.admit("a")
+    with pytest.raises(AdmissionRejected) as per_contact:
+        controller.admit("a")
+    assert per_contact.value.status_code == 429
+
+    controller.admit("b")
+    with pytest.raises(AdmissionRejected) as global_limit:
+        controller.admit("c")
+    assert global_limit.value.status_code == 503
+    assert global_limit.value.retry_after == 7
+
+    controller.release("a")
+    controller.admit("c")
+    assert controller.stats()["shed"] == {"global": 1, "contact": 1}
+
+
+def test_admission_slot_limits_concurrency():
+    controller = AdmissionController(max_inflight=2, max_waiting=10, max_per_contact=10, retry_after=1)
+    active = 0
+    peak = 0
+
+    async def work() -> None:
+        nonlocal active, peak
+        async with controller.slot():
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    async def _run() -> None:
+        await asyncio.gather(*(work() for _ in range(6)))
+
+    asyncio.run(_run())
+    assert peak == 2
+    assert controller.inflight == 0
+
+
+def test_admission_degrades_when_queue_is_deep():
+    controller = AdmissionController(max_inflight=1, max_waiting=10, max_per_contact=10, retry_after=1, degrade_waiting=2)
+    controller.admit("a")
+    controller.admit("b")
+    assert controller.degraded is True
+    controller.release("b")
+    assert controller.degraded is False
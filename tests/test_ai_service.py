@@ -0,0 +1,428 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, List
+
+import pytest
+
+from app.core.config import settings
+from app.services.ai_service import FALLBACK_MSG, AIService
+from app.services.retrieval import ChromaBackend
+from app.services.singleflight import SingleFlight
+
+
+class FakeStream:
+    def __init__(self, chunks: List[str]) -> None:
+        self._chunks = list(chunks)
+        self.closed = False
+
+    def __aiter__(self) -> "FakeStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if not self._chunks:
+            raise StopAsyncIteration
+        return SimpleNamespace(text=self._chunks.pop(0))
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+def _service_with_stream(make_ai_service: Callable[..., AIService], stream: FakeStream) -> AIService:
+    async def generate_content_stream(**kwargs: Any) -> FakeStream:
+        return stream
+
+    return make_ai_service(
+        model=SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content_stream=generate_content_stream)))
+    )
+
+
+def test_stream_response_yields_chunks_and_closes_upstream(make_ai_service):
+    stream = FakeStream(["Temos ", "sim, ", "2 vagas."])
+    service = _service_with_stream(make_ai_service, stream)
+
+    async def _run() -> List[str]:
+        return [chunk async for chunk in service.stream_response("tem garagem?", "ctx")]
+
+    assert asyncio.run(_run()) == ["Temos ", "sim, ", "2 vagas."]
+    assert stream.closed is True
+
+
+def test_stream_response_cancelled_by_consumer_closes_upstream(make_ai_service):
+    stream = FakeStream(["a", "b", "c"])
+    service = _service_with_stream(make_ai_service, stream)
+
+    async def _run() -> None:
+        generator = service.stream_response("oi")
+        assert await generator.__anext__() == "a"
+        await generator.aclose()
+
+    asyncio.run(_run())
+    assert stream.closed is True
+
+
+class FailingStream(FakeStream):
+    async def __anext__(self) -> Any:
+        if not self._chunks:
+            raise RuntimeError("connection reset")
+        return await super().__anext__()
+
+
+def test_stream_response_failure_midway_raises_and_counts_one_failure(make_ai_service):
+    stream = FailingStream(["Temos "])
+    service = _service_with_stream(make_ai_service, stream)
+    received: List[str] = []
+
+    async def _run() -> None:
+        async for chunk in service.stream_response("tem garagem?", "ctx"):
+            received.append(chunk)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(_run())
+    assert received == ["Temos "]
+    assert service.breaker.consecutive_failures == 1
+    assert stream.closed is True
+
+
+def test_stream_response_sheds_when_no_slot_frees_up(make_ai_service, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "LLM_TIMEOUT_SEC", 0.05)
+    service = _service_with_stream(make_ai_service, FakeStream(["nunca"]))
+
+    async def _run() -> List[str]:
+        await service._llm_slots().acquire()
+        return [chunk async for chunk in service.stream_response("oi")]
+
+    assert asyncio.run(_run()) == [FALLBACK_MSG]
+    assert service.breaker.consecutive_failures == 0
+
+
+def test_stream_response_reports_duration_to_breaker(make_ai_service, monkeypatch):
+    class SlowStream(FakeStream):
+        async def __anext__(self) -> Any:
+            await asyncio.sleep(0.02)
+            return await super().__anext__()
+
+    service = _service_with_stream(make_ai_service, SlowStream(["Temos ", "sim."]))
+    durations: List[float] = []
+    monkeypatch.setattr(service.breaker, "record_success", durations.append)
+
+    async def _run() -> List[str]:
+        return [chunk async for chunk in service.stream_response("tem garagem?")]
+
+    assert asyncio.run(_run()) == ["Temos ", "sim."]
+    assert len(durations) == 1 and durations[0] >= 0.05
+
+
+def test_stream_response_without_model_yields_fallback(make_ai_service):
+    service = make_ai_service()
+
+    async def _run() -> List[str]:
+        return [chunk async for chunk in service.stream_response("oi")]
+
+    assert asyncio.run(_run()) == [FALLBACK_MSG]
+
+
+class FakeCollection:
+    def __init__(self) -> None:
+        self.queries: List[str] = []
+
+    def query(self, query_texts: List[str], n_results: int) -> dict:
+        self.queries.append(query_texts[0])
+        return {"documents": [[f"doc {len(self.queries)}"]]}
+
+
+def _service_with_collection(make_ai_service: Callable[..., AIService], collection: FakeCollection) -> AIService:
+    from app.core.cache import TTLCache
+
+    return make_ai_service(
+        backend=ChromaBackend(collection),
+        _embeddings_available=False,
+        retrieval_cache=TTLCache(ttl=60, maxsize=10, lru=True),
+    )
+
+
+def test_retrieval_cache_keys_on_normalized_query(make_ai_service, monkeypatch):
+    collection = FakeCollection()
+    service = _service_with_collection(make_ai_service, collection)
+    monkeypatch.setattr(service, "knowledge_version", lambda: None)
+
+    async def _run() -> List[str]:
+        return [
+            await service.get_context_from_db("Bom dia"),
+            await service.get_context_from_db("  BOM   día "),
+            await service.get_context_from_db("qual o preço?"),
+        ]
+
+    assert asyncio.run(_run()) == ["doc 1", "doc 1", "doc 2"]
+    assert collection.queries == ["Bom dia", "qual o preço?"]
+    assert service.retrieval_cache.stats()["hits"] == 1
+
+
+def test_retrieval_cache_invalidated_when_knowledge_base_changes(make_ai_service, monkeypatch):
+    from app.core.config import settings
+
+    collection = FakeCollection()
+    service = _service_with_collection(make_ai_service, collection)
+    versions = iter([((1, 10),), ((2, 20),)])
+    monkeypatch.setattr(service, "knowledge_version", lambda: next(versions))
+    monkeypatch.setattr(settings, "KNOWLEDGE_VERSION_CHECK_SEC", 0)
+
+    async def _run() -> List[str]:
+        return [await service.get_context_from_db("oi") for _ in range(2)]
+
+    assert asyncio.run(_run()) == ["doc 1", "doc 2"]
+
+
+def test_knowledge_reload_runs_off_the_event_loop(make_ai_service, monkeypatch):
+    class SlowReload(ChromaBackend):
+        def reload(self) -> None:
+            time.sleep(0.2)
+            reloaded.append(True)
+
+    reloaded: List[bool] = []
+    collection = FakeCollection()
+    service = _service_with_collection(make_ai_service, collection)
+    service.backend = SlowReload(collection)
+    versions = iter([((1, 10),), ((2, 20),)])
+    monkeypatch.setattr(service, "knowledge_version", lambda: next(versions))
+    monkeypatch.setattr(settings, "KNOWLEDGE_VERSION_CHECK_SEC", 0)
+
+    async def _run() -> tuple:
+        await service.get_context_from_db("oi")
+        reloading = asyncio.ensure_future(service.get_context_from_db("oi"))
+        await asyncio.sleep(0.02)
+        started = time.perf_counter()
+        during = await service.get_context_from_db("oi")
+        waited = time.perf_counter() - started
+        return during, waited, reloaded[:], await reloading
+
+    during, waited, reloaded_then, after = asyncio.run(_run())
+    # The concurrent request is served by the old backend while the reload runs in a thread.
+    assert during == "doc 1" and reloaded_then == [] and waited < 0.1
+    assert after == "doc 2" and reloaded == [True]
+
+
+def _service_with_async_model(make_ai_service: Callable[..., AIService], generate_content: Any) -> AIService:
+    return make_ai_service(
+        model=SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+    )
+
+
+def test_call_llm_respects_concurrency_limit(make_ai_service, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "LLM_MAX_CONCURRENCY", 2)
+    running = 0
+    peak = 0
+
+    async def generate_content(**kwargs: Any) -> Any:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return SimpleNamespace(text="ok")
+
+    service = _service_with_async_model(make_ai_service, generate_content)
+
+    async def _run() -> List[str]:
+        return await asyncio.gather(*(service.generate_response(f"q{i}") for i in range(6)))
+
+    assert asyncio.run(_run()) == ["ok"] * 6
+    assert peak == 2
+
+
+def test_identical_concurrent_prompts_share_one_llm_call(make_ai_service):
+    calls = []
+
+    async def generate_content(**kwargs: Any) -> Any:
+        calls.append(kwargs["contents"])
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(text="resposta")
+
+    service = _service_with_async_model(make_ai_service, generate_content)
+    service.llm_flight = SingleFlight("llm")
+
+    async def _run() -> List[str]:
+        questions = ["Qual o preço?", "qual o  PREÇO?", "Tem garagem?"] * 3
+        return await asyncio.gather(*(service.generate_response(q, "ctx") for q in questions))
+
+    assert asyncio.run(_run()) == ["resposta"] * 9
+    assert len(calls) == 2
+    assert service.llm_flight.stats()["saved"] == 7
+
+
+def test_identical_concurrent_retrievals_share_one_query(make_ai_service, monkeypatch):
+    class SlowCollection(FakeCollection):
+        def query(self, query_texts: List[str], n_results: int) -> dict:
+            time.sleep(0.02)
+            return super().query(query_texts, n_results)
+
+    collection = SlowCollection()
+    service = _service_with_collection(make_ai_service, collection)
+    service.retrieval_flight = SingleFlight("retrieval")
+    monkeypatch.setattr(service, "knowledge_version", lambda: None)
+
+    async def _run() -> List[str]:
+        return await asyncio.gather(*(service.get_context_from_db(q) for q in ["Bom dia", "bom dia", "BOM DIA"]))
+
+    assert asyncio.run(_run()) == ["doc 1"] * 3
+    assert len(collection.queries) == 1
+
+
+def test_call_llm_timeout_returns_fallback_and_frees_slot(make_ai_service, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "LLM_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "LLM_TIMEOUT_SEC", 0.01)
+    cancelled = []
+
+    async def generate_content(**kwargs: Any) -> Any:
+        if kwargs["contents"] == "slow":
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        return SimpleNamespace(text="ok")
+
+    service = _service_with_async_model(make_ai_service, generate_content)
+
+    async def _run() -> List[str]:
+        return [await service.generate_response("slow"), await service.generate_response("fast")]
+
+    assert asyncio.run(_run()) == [FALLBACK_MSG, "ok"]
+    assert cancelled == [True]
+
+
+def test_llm_queue_wait_timeout_is_shed_without_breaker_failure(make_ai_service, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "LLM_TIMEOUT_SEC", 0.1)
+
+    async def generate_content(**kwargs: Any) -> Any:
+        await asyncio.sleep(0.06)
+        return SimpleNamespace(text="ok")
+
+    service = _service_with_async_model(make_ai_service, generate_content)
+    failures = []
+    monkeypatch.setattr(service.breaker, "record_failure", lambda: failures.append(True))
+
+    async def _run() -> List[str]:
+        return await asyncio.gather(*(service.generate_response(f"q{i}") for i in range(3)))
+
+    # The third call waits ~0.12s for the single slot: shed locally, Gemini never blamed.
+    assert asyncio.run(_run()) == ["ok", "ok", FALLBACK_MSG]
+    assert failures == []
+
+
+def test_open_breaker_replies_from_top_retrieved_chunk(make_ai_service):
+    calls: List[Any] = []
+
+    async def generate_content(**kwargs: Any) -> Any:
+        calls.append(kwargs)
+        raise RuntimeError("503 from provider")
+
+    service = _service_with_async_model(make_ai_service, generate_content)
+    context = "O Duet tem entrega prevista para dezembro de 2026. Fica no Recreio.\nOutro chunk."
+
+    async def _run() -> List[str]:
+        return [await service.generate_response("quando fica pronto?", context) for _ in range(5)]
+
+    replies = asyncio.run(_run())
+    assert len(calls) == 3  # the breaker opened after three failures
+    assert service.breaker.state == "open"
+    assert set(replies) == {
+        "Pelo que tenho aqui: O Duet tem entrega prevista para dezembro de 2026. Fica no Recreio. "
+        "Queres que te confirme mais algum detalhe?"
+    }
+
+
+def test_expired_deadline_skips_llm(make_ai_service):
+    from app.core.deadline import Deadline, deadline_scope
+
+    calls: List[Any] = []
+
+    async def generate_content(**kwargs: Any) -> Any:
+        calls.append(kwargs)
+        return SimpleNamespace(text="ok")
+
+    service = _service_with_async_model(make_ai_service, generate_content)
+
+    async def _run() -> str:
+        with deadline_scope(Deadline(0)):
+            return await service.generate_response("oi")
+
+    assert asyncio.run(_run()) == FALLBACK_MSG
+    assert calls == []
+
+
+def test_retrieval_fallback_truncates_at_sentence_end():
+    from app.services.ai_service import retrieval_fallback
+
+    long_chunk = "Primeira frase curta. " + "x" * 400
+    assert retrieval_fallback(long_chunk) == (
+        "Pelo que tenho aqui: Primeira frase curta. Queres que te confirme mais algum detalhe?"
+    )
+    assert retrieval_fallback("") == FALLBACK_MSG
+
+
+def test_clients_are_initialised_lazily():
+    service = AIService()
+    assert service.readiness() == {"llm": "cold", "retrieval": "cold"}
+
+    async def _run() -> None:
+        await service.start_warmup()
+
+    asyncio.run(_run())
+    assert service.warm is True
+    assert service.readiness()["llm"] in {"warm", "unavailable"}
+    assert service.readiness()["retrieval"] in {"warm", "unavailable"}
+
+
+def test_concurrent_retrievals_embed_queries_in_one_batch(make_ai_service, tmp_path, monkeypatch):
+    from app.services.retrieval import NumpyBackend, write_index
+
+    write_index(str(tmp_path), [[1.0, 0.0], [0.0, 1.0]], ["Tem piscina.", "Tem garagem."])
+    batches: List[List[str]] = []
+
+    def embed(texts: List[str]) -> List[List[float]]:
+        batches.append(list(texts))
+        return [[1.0, 0.0] if "piscina" in t.lower() else [0.0, 1.0] for t in texts]
+
+    service = make_ai_service(backend=NumpyBackend(str(tmp_path), embedder=embed))
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_MAX_WAIT_MS", 5)
+
+    async def _run() -> List[str]:
+        return await asyncio.gather(*(service.get_context_from_db(q) for q in ["Piscina?", "garagem?", "PISCINA?"]))
+
+    assert asyncio.run(_run()) == ["Tem piscina.\nTem garagem.", "Tem garagem.\nTem piscina.", "Tem piscina.\nTem garagem."]
+    # The original text is embedded; its normalized form only dedupes the batch.
+    assert batches == [["Piscina?", "garagem?"]]
+
+
+def test_message_is_embedded_once_for_retrieval_and_answer_cache(make_ai_service, tmp_path):
+    from app.core.cache import TTLCache
+    from app.services.retrieval import NumpyBackend, write_index
+    from app.services.semantic_cache import SemanticCache
+
+    write_index(str(tmp_path), [[1.0, 0.0], [0.0, 1.0]], ["Tem piscina.", "Tem garagem."])
+    embedded: List[str] = []
+
+    def embed(texts: List[str]) -> List[List[float]]:
+        embedded.extend(texts)
+        return [[1.0, 0.0] if "piscina" in t.lower() else [0.0, 1.0] for t in texts]
+
+    service = make_ai_service(
+        backend=NumpyBackend(str(tmp_path), embedder=embed),
+        model=SimpleNamespace(models=SimpleNamespace(generate_content=lambda **kwargs: SimpleNamespace(text="Tem sim!"))),
+        answer_cache=SemanticCache(threshold=0.92, ttl=60, maxsize=10),
+        query_vectors=TTLCache(ttl=60, maxsize=10),
+    )
+
+    async def _run() -> str:
+        context = await service.get_context_from_db("Tem piscina?")
+        return await service.generate_response("Tem piscina?", context)
+
+    assert asyncio.run(_run()) == "Tem sim!"
+    assert embedded == ["Tem piscina?"]
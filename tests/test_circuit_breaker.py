@@ -0,0 +1,57 @@
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _breaker(clock: FakeClock) -> CircuitBreaker:
+    return CircuitBreaker("test", failure_threshold=3, slow_call_sec=5, cooldown=30, clock=clock)
+
+
+def test_opens_after_consecutive_failures_and_rejects_during_cooldown():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success(0.1)  # resets the streak
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+
+    assert breaker.state == OPEN
+    clock.now = 29
+    assert breaker.allow() is False
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_slow_calls_count_as_failures():
+    breaker = _breaker(FakeClock())
+    for _ in range(3):
+        breaker.record_success(6.0)
+    assert breaker.state == OPEN
+
+
+def test_half_open_lets_one_probe_through():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(3):
+        breaker.record_failure()
+
+    clock.now = 30
+    assert breaker.allow() is True
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is False  # probe still in flight
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now = 60
+    assert breaker.allow() is True
+    breaker.record_success(0.2)
+    assert breaker.state == CLOSED
+    assert breaker.allow() is True
@@ -0,0 +1,51 @@
+from app.services.context_builder import build_context, estimate_tokens, remove_overlaps
+
+
+def test_remove_overlaps_strips_shared_chunk_boundaries():
+    text = "O Duet fica no Recreio dos Bandeirantes. Tem dois quartos e varanda gourmet. Entrega em 2026."
+    first, second = text[:60], text[40:]
+    assert remove_overlaps([first, second]) == [first.strip(), text[60:].strip()]
+    # Also when the later part of the document was retrieved first.
+    assert remove_overlaps([second, first]) == [second.strip(), text[:40].strip()]
+
+
+def test_near_duplicate_sentences_are_dropped():
+    chunks = [
+        "O condominio tem piscina aquecida e academia completa.",
+        "O condomínio tem piscina aquecida e academia completa! Aceita financiamento pela Caixa.",
+    ]
+    context = build_context("tem piscina?", chunks, token_budget=0)
+    assert context.count("piscina") == 1
+    assert "Aceita financiamento pela Caixa." in context
+
+
+def test_short_sentences_inside_longer_words_are_kept():
+    chunks = [
+        "Portaria com sistema de câmeras.",
+        "Academia? Tem. Portaria com câmeras.",
+    ]
+    context = build_context("tem academia?", chunks, token_budget=0)
+    # "tem" is inside "sistema" but is not one of its words.
+    assert "Academia? Tem." in context
+    # Every word of this one is already in the first sentence.
+    assert context.count("Portaria") == 1
+
+
+def test_budget_keeps_most_relevant_passages_in_retrieval_order():
+    chunks = [
+        "O Duet tem duas vagas de garagem cobertas. " + "Texto institucional sobre a construtora. " * 20,
+        "A area de lazer tem piscina, sauna e churrasqueira.",
+        "O preço começa em R$ 450 mil com entrada facilitada.",
+    ]
+    context = build_context("Qual o preço e tem garagem?", chunks, token_budget=40)
+
+    assert estimate_tokens(context) <= 40
+    assert "garagem" in context and "R$ 450 mil" in context
+    assert "piscina" not in context
+    assert context.index("garagem") < context.index("R$ 450 mil")
+
+
+def test_long_unpunctuated_page_still_fits_the_budget():
+    page = " ".join(["apartamento com vista para o mar"] * 2000)
+    context = build_context("vista mar", [page], token_budget=200)
+    assert 0 < estimate_tokens(context) <= 200
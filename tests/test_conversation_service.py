@@ -0,0 +1,95 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.models import Base
+from app.services.conversation_service import (
+    ConversationHistory,
+    ConversationMemory,
+    SqlConversationStore,
+    extractive_summary,
+)
+
+
+class MemoryStore:
+    def __init__(self) -> None:
+        self.rows: Dict[str, Tuple[List[Any], str, int]] = {}
+
+    async def load(self, contact_id: str) -> Optional[Tuple[List[Any], str, int]]:
+        return self.rows.get(contact_id)
+
+    async def save(self, contact_id: str, turns: Sequence[Any], summary: str, turn_count: int) -> None:
+        self.rows[contact_id] = (list(turns), summary, turn_count)
+
+
+def _memory(store: Any, summarizer: Any = None) -> ConversationMemory:
+    return ConversationMemory(
+        store, max_turns=4, max_turn_chars=50, summary_max_chars=120, max_contacts=10, summarizer=summarizer
+    )
+
+
+def test_ring_buffer_keeps_recent_turns_and_summarises_overflow():
+    summarised: List[List[Any]] = []
+
+    async def summarizer(summary: str, turns: Sequence[Any], max_chars: int) -> str:
+        summarised.append(list(turns))
+        return (summary + " | " if summary else "") + ", ".join(text for _, text in turns)
+
+    memory = _memory(MemoryStore(), summarizer)
+
+    async def _run() -> ConversationHistory:
+        for i in range(4):
+            await memory.record("c1", f"pergunta {i}", f"resposta {i}")
+        await memory.wait_idle()
+        return await memory.history("c1")
+
+    history = asyncio.run(_run())
+    assert history.turns == [("cliente", "pergunta 2"), ("corretor", "resposta 2"), ("cliente", "pergunta 3"), ("corretor", "resposta 3")]
+    assert "pergunta 0" in history.summary and "resposta 1" in history.summary
+    assert sum(len(batch) for batch in summarised) == 4
+
+
+def test_history_stays_bounded_for_long_conversations():
+    memory = _memory(MemoryStore())  # no summarizer: extractive fallback
+
+    async def _run() -> ConversationHistory:
+        for i in range(200):
+            await memory.record("c1", f"mensagem longa numero {i} " * 10, "ok " * 40)
+        await memory.wait_idle()
+        return await memory.history("c1")
+
+    history = asyncio.run(_run())
+    assert len(history.turns) == 4
+    assert all(len(text) <= 50 for _, text in history.turns)
+    assert len(history.summary) <= 120
+    assert len(history.render()) < 4 * 60 + 120 + 80
+
+
+def test_extractive_summary_keeps_newest_client_lines():
+    turns = [("cliente", "quero 2 quartos"), ("corretor", "temos sim"), ("cliente", "no Recreio")]
+    assert extractive_summary("", turns, 200) == "Cliente: quero 2 quartos\nCliente: no Recreio"
+    assert extractive_summary("", turns, 20) == "Cliente: no Recreio"
+
+
+def test_sql_store_persists_next_to_leads(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+    store = SqlConversationStore(async_sessionmaker(engine, expire_on_commit=False))
+
+    async def _run() -> Optional[ConversationHistory]:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await _memory(store).record("c1", "tem garagem?", "Tem sim, 2 vagas.")
+        await _memory(store).record("c1", "e piscina?", "Também!")
+        # A fresh memory (e.g. after a restart) reloads the persisted turns.
+        history = await _memory(store).history("c1")
+        await engine.dispose()
+        return history
+
+    history = asyncio.run(_run())
+    assert history.turns == [
+        ("cliente", "tem garagem?"),
+        ("corretor", "Tem sim, 2 vagas."),
+        ("cliente", "e piscina?"),
+        ("corretor", "Também!"),
+    ]
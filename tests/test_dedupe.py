@@ -0,0 +1,72 @@
+import asyncio
+
+from app.core.cache import TTLCache
+from app.services.dedupe import MemoryDedupeStore, SqliteDedupeStore
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_cache_expires_and_caps_size():
+    clock = FakeClock()
+    cache: TTLCache[str, int] = TTLCache(ttl=10, maxsize=2, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert "a" not in cache
+    assert cache.get("b") == 2
+    assert cache.evictions == 1
+
+    clock.now += 11
+    assert cache.get("c") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_lru_keeps_recently_read_entries():
+    cache: TTLCache[str, int] = TTLCache(ttl=60, maxsize=2, lru=True)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "a" in cache
+    assert "b" not in cache
+
+
+def test_memory_dedupe_store_counts_hits_and_misses():
+    store = MemoryDedupeStore(ttl=60, max_entries=100)
+    assert asyncio.run(store.check_and_mark("jid:ABC")) is False
+    assert asyncio.run(store.check_and_mark("jid:ABC")) is True
+    asyncio.run(store.discard("jid:ABC"))
+    assert asyncio.run(store.check_and_mark("jid:ABC")) is False
+    assert asyncio.run(store.stats())["hits"] == 1
+    assert asyncio.run(store.stats())["misses"] == 2
+
+
+def test_sqlite_dedupe_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "dedupe.sqlite3")
+    first = SqliteDedupeStore(path, ttl=60, max_entries=100)
+    second = SqliteDedupeStore(path, ttl=60, max_entries=100)
+    assert asyncio.run(first.check_and_mark("jid:XYZ")) is False
+    assert asyncio.run(second.check_and_mark("jid:XYZ")) is True
+    assert asyncio.run(second.stats()) == {"backend": "sqlite", "size": 1, "hits": 1, "misses": 0}
+
+
+def test_sqlite_dedupe_store_revives_expired_ids(tmp_path):
+    store = SqliteDedupeStore(str(tmp_path / "dedupe.sqlite3"), ttl=-1, max_entries=100)
+    assert asyncio.run(store.check_and_mark("jid:OLD")) is False
+    assert asyncio.run(store.check_and_mark("jid:OLD")) is False
+
+
+def test_sqlite_dedupe_store_concurrent_same_id_marks_once(tmp_path):
+    store = SqliteDedupeStore(str(tmp_path / "dedupe.sqlite3"), ttl=60, max_entries=100)
+
+    async def _run() -> list:
+        return await asyncio.gather(*(store.check_and_mark("jid:SAME") for _ in range(2)))
+
+    assert sorted(asyncio.run(_run())) == [False, True]
+    assert asyncio.run(store.stats())["hits"] == 1
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from app.services.dispatcher import InboundMessage, MessageDispatcher, QueueFullError
+
+
+def test_dispatcher_keeps_order_per_contact():
+    handled: list[tuple[str, str]] = []
+
+    async def handler(remote_jid: str, messages: list[InboundMessage]) -> None:
+        await asyncio.sleep(0.001 if remote_jid == "a" else 0)
+        handled.extend((remote_jid, m.text) for m in messages)
+
+    async def _run() -> None:
+        dispatcher = MessageDispatcher(handler, workers=3, max_queue=100)
+        await dispatcher.start()
+        for i in range(5):
+            dispatcher.submit(InboundMessage("a", f"a{i}"))
+            dispatcher.submit(InboundMessage("b", f"b{i}"))
+        await dispatcher.join()
+        await dispatcher.stop()
+
+    asyncio.run(_run())
+
+    assert [t for jid, t in handled if jid == "a"] == [f"a{i}" for i in range(5)]
+    assert [t for jid, t in handled if jid == "b"] == [f"b{i}" for i in range(5)]
+
+
+def test_dispatcher_runs_contacts_in_parallel():
+    active = 0
+    peak = 0
+
+    async def handler(remote_jid: str, messages: list[InboundMessage]) -> None:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    async def _run() -> None:
+        dispatcher = MessageDispatcher(handler, workers=4, max_queue=100)
+        await dispatcher.start()
+        for jid in ["a", "b", "c", "d"]:
+            dispatcher.submit(InboundMessage(jid, "oi"))
+        await dispatcher.join()
+        await dispatcher.stop()
+
+    asyncio.run(_run())
+    assert peak == 4
+
+
+def test_dispatcher_rejects_when_full():
+    async def handler(remote_jid: str, messages: list[InboundMessage]) -> None:
+        await asyncio.sleep(0.01)
+
+    async def _run() -> None:
+        dispatcher = MessageDispatcher(handler, workers=1, max_queue=2)
+        await dispatcher.start()
+        dispatcher.submit(InboundMessage("a", "1"))
+        dispatcher.submit(InboundMessage("a", "2"))
+        with pytest.raises(QueueFullError):
+            dispatcher.submit(InboundMessage("a", "3"))
+        await dispatcher.stop()
+
+    asyncio.run(_run())
+
+
+def test_dispatcher_coalesces_bursts():
+    batches: list[list[str]] = []
+
+    async def handler(remote_jid: str, messages: list[InboundMessage]) -> None:
+        batches.append([m.text for m in messages])
+
+    async def _run() -> None:
+        dispatcher = MessageDispatcher(handler, workers=2, max_queue=100, coalesce_window=0.05, coalesce_max_wait=1.0)
+        await dispatcher.start()
+        for text in ["oi", "tudo bem?", "quero saber do Duet"]:
+            dispatcher.submit(InboundMessage("a", text))
+            await asyncio.sleep(0.01)
+        await dispatcher.join()
+        await dispatcher.stop()
+        assert dispatcher.coalesced == 2
+
+    asyncio.run(_run())
+    assert batches == [["oi", "tudo bem?", "quero saber do Duet"]]
+
+
+def test_dispatcher_coalescing_window_does_not_hold_workers():
+    async def handler(remote_jid: str, messages: list[InboundMessage]) -> None:
+        pass
+
+    async def _run() -> float:
+        dispatcher = MessageDispatcher(handler, workers=1, max_queue=100, coalesce_window=0.1, coalesce_max_wait=1.0)
+        await dispatcher.start()
+        started = asyncio.get_running_loop().time()
+        for jid in ["a", "b", "c", "d", "e"]:
+            dispatcher.submit(InboundMessage(jid, "oi"))
+        await dispatcher.join()
+        elapsed = asyncio.get_running_loop().time() - started
+        await dispatcher.stop()
+        assert dispatcher.processed == 5
+        return elapsed
+
+    # Five contacts on one worker share the window instead of waiting 5 x 0.1s in turn.
+    assert asyncio.run(_run()) < 0.3
@@ -0,0 +1,67 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+def _encoder(calls: List[List[str]]):
+    def encode(texts: List[str]) -> List[List[float]]:
+        calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+    return encode
+
+
+def test_concurrent_requests_share_one_encode():
+    calls: List[List[str]] = []
+    batcher = EmbeddingBatcher(_encoder(calls), max_batch=32, max_wait=0.01)
+
+    async def _run():
+        return await asyncio.gather(*(batcher.embed(t) for t in ["a", "bb", "a", "ccc"]))
+
+    assert asyncio.run(_run()) == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0], [3.0, 1.0]]
+    # Duplicates are encoded once.
+    assert calls == [["a", "bb", "ccc"]]
+    assert batcher.stats()["mean_batch"] == 4
+
+
+def test_full_batch_flushes_without_waiting():
+    calls: List[List[str]] = []
+    batcher = EmbeddingBatcher(_encoder(calls), max_batch=2, max_wait=10)
+
+    async def _run():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.embed(str(i)) for i in range(4))), timeout=1)
+
+    assert len(asyncio.run(_run())) == 4
+    assert calls == [["0", "1"], ["2", "3"]]
+
+
+def test_encoder_errors_and_missing_model():
+    def broken(texts: List[str]) -> List[List[float]]:
+        raise RuntimeError("model crashed")
+
+    async def _run(batcher: EmbeddingBatcher):
+        return await asyncio.gather(batcher.embed("x"), batcher.embed("y"), return_exceptions=True)
+
+    errors = asyncio.run(_run(EmbeddingBatcher(broken, max_batch=8, max_wait=0)))
+    assert [str(e) for e in errors] == ["model crashed"] * 2
+    assert asyncio.run(_run(EmbeddingBatcher(lambda texts: None, max_batch=8, max_wait=0))) == [None, None]
+
+
+def test_cancelled_request_does_not_break_the_batch():
+    calls: List[List[str]] = []
+    batcher = EmbeddingBatcher(_encoder(calls), max_batch=8, max_wait=0.01)
+
+    async def _run():
+        cancelled = asyncio.ensure_future(batcher.embed("gone"))
+        kept = asyncio.ensure_future(batcher.embed("kept"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await kept
+
+    assert asyncio.run(_run()) == [4.0, 1.0]
+    assert calls == [["kept"]]
@@ -0,0 +1,80 @@
+from typing import List
+
+from app.services.lexical_index import BM25Index, tokenize
+from app.services.retrieval import HybridBackend, LexicalBackend, RetrievalBackend
+
+CHUNKS = {
+    "apogeu#0": "O Apogeu Barra tem apartamentos de 3 quartos com vista para o mar.",
+    "duet#0": "O Duet fica em Botafogo e tem unidades de 2 quartos.",
+    "ilhamar#0": "Ilhamar: unidade A-1204 com varanda gourmet e duas vagas.",
+    "geral#0": "Todos os empreendimentos aceitam financiamento bancário.",
+}
+
+
+def _index() -> BM25Index:
+    index = BM25Index()
+    for doc_id, text in CHUNKS.items():
+        index.add(doc_id, text)
+    return index
+
+
+def test_tokenize_normalises_and_joins_unit_codes():
+    terms = tokenize("Apto A-1204 no Apogeu Barra, preço?")
+    assert "a1204" in terms and "1204" in terms
+    assert "apogeu" in terms and "preco" in terms
+    assert "no" not in terms
+
+
+def test_search_finds_developments_and_unit_codes():
+    index = _index()
+    assert index.search("Quanto custa no Apogeu Barra?", 1)[0][0] == "apogeu#0"
+    assert index.search("tem a unidade a1204?", 1)[0][0] == "ilhamar#0"
+    assert index.search("duet", 4)[0][0] == "duet#0"
+    assert index.search("piscina", 4) == []
+
+
+def test_readding_an_id_replaces_the_chunk():
+    index = _index()
+    index.add("duet#0", "O Duet agora tem piscina.")
+    assert len(index) == 4
+    assert index.search("botafogo", 4) == []
+    assert index.search("piscina", 1)[0][0] == "duet#0"
+
+    index.remove("duet#0")
+    assert index.search("duet", 4) == []
+    assert "duet" not in index.postings
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "lexical.json")
+    _index().save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.search("Ilhamar", 1) == _index().search("Ilhamar", 1)
+    assert len(BM25Index.open(str(tmp_path / "missing.json"))) == 0
+
+
+class _VectorBackend(RetrievalBackend):
+    name = "fake"
+
+    def __init__(self, docs: List[str], fail: bool = False) -> None:
+        self.docs = docs
+        self.fail = fail
+
+    def query(self, text: str, k: int) -> List[str]:
+        if self.fail:
+            raise RuntimeError("vector store down")
+        return self.docs[:k]
+
+
+def test_hybrid_fuses_rankings(tmp_path):
+    path = str(tmp_path / "lexical.json")
+    _index().save(path)
+    lexical = LexicalBackend(path)
+    vector = _VectorBackend([CHUNKS["geral#0"], CHUNKS["duet#0"], CHUNKS["apogeu#0"]])
+
+    results = HybridBackend(vector, lexical).query("Apogeu Barra", 2)
+    # Ranked by both retrievers, the Apogeu chunk overtakes the vector-only top hit.
+    assert results == [CHUNKS["apogeu#0"], CHUNKS["geral#0"]]
+
+    failing = HybridBackend(_VectorBackend([], fail=True), lexical)
+    assert failing.query("Ilhamar", 1) == [CHUNKS["ilhamar#0"]]
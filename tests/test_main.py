@@ -1,8 +1,13 @@
 import asyncio
-from unittest.mock import AsyncMock, patch
+import json
+from typing import List
+from unittest.mock import AsyncMock, PropertyMock, patch
 
 import httpx
 
+from app.core.config import settings
+from app.services.retrieval import RetrievalBackend
+
 
 with patch("app.db.init_db.init_db", new_callable=AsyncMock):
     from app.main import app
@@ -33,3 +38,167 @@ def test_chat_invalid_contact_id():
 def test_chat_invalid_text():
     response = _post("/chat", {"contact_id": "user123", "text": "a" * 1001})
     assert response.status_code == 422
+
+
+def test_chat_stream_sends_sse_events():
+    async def fake_stream(text: str, context: str = ""):
+        for chunk in ["Temos ", "sim!"]:
+            yield chunk
+
+    with patch("app.api.webhook.ai_service.get_context_from_db", new=AsyncMock(return_value="ctx")):
+        with patch("app.api.webhook.ai_service.stream_response", new=fake_stream):
+            response = _post("/chat/stream", {"contact_id": "user123", "text": "tem garagem?"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.split("\n\n")[:3] == [
+        'data: {"delta": "Temos "}',
+        'data: {"delta": "sim!"}',
+        'event: done\ndata: {"reply": "Temos sim!"}',
+    ]
+
+
+def test_chat_stream_reports_error_when_upstream_fails_midway():
+    async def fake_stream(text: str, context: str = ""):
+        yield "Temos "
+        raise RuntimeError("connection reset")
+
+    with patch("app.api.webhook.ai_service.get_context_from_db", new=AsyncMock(return_value="ctx")):
+        with patch("app.api.webhook.ai_service.stream_response", new=fake_stream):
+            response = _post("/chat/stream", {"contact_id": "user124", "text": "tem garagem?"})
+
+    events = response.text.split("\n\n")
+    assert events[:2] == [
+        'data: {"delta": "Temos "}',
+        'event: error\ndata: {"error": "stream interrupted", "partial": "Temos "}',
+    ]
+    assert "event: done" not in response.text
+
+
+def test_chat_stream_releases_admission_when_client_disconnects_early():
+    from app.services.admission import admission
+
+    body = json.dumps({"contact_id": "user125", "text": "tem garagem?"}).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/chat/stream",
+        "raw_path": b"/chat/stream",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"host", b"testserver")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("testserver", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    consumed = []
+
+    async def receive() -> dict:
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        # The connection is gone before the first byte of the stream is written.
+        raise OSError("connection reset")
+
+    async def fake_stream(text: str, context: str = ""):
+        consumed.append(text)
+        yield "nunca enviado"
+
+    async def _run() -> None:
+        try:
+            await app(scope, receive, send)
+        except Exception:
+            pass
+
+    with patch("app.api.webhook.ai_service.stream_response", new=fake_stream):
+        asyncio.run(_run())
+
+    assert consumed == []
+    assert admission.stats()["contacts"] == 0
+    assert admission.admitted == 0
+
+
+def test_metrics_exposes_stage_histograms():
+    payload = {
+        "event": "messages.upsert",
+        "data": {
+            "key": {"fromMe": False, "remoteJid": "5511100000000@s.whatsapp.net"},
+            "message": {"conversation": "oi"},
+        },
+    }
+    with patch("app.api.webhook.ai_service.get_context_from_db", new=AsyncMock(return_value="ctx")):
+        with patch("app.api.webhook.ai_service.generate_response", new=AsyncMock(return_value="Ola!")):
+            with patch("app.api.webhook.whatsapp_service.send_message", new=AsyncMock(return_value={"ok": True})):
+                _post("/webhook", payload)
+
+    async def _run() -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await client.get("/metrics")
+
+    response = asyncio.run(_run())
+    assert response.status_code == 200
+    for stage in ["parse", "retrieval", "generation", "send"]:
+        assert f'corretor_stage_duration_seconds_count{{stage="{stage}"}}' in response.text
+    assert 'corretor_messages_total{outcome="processed"}' in response.text
+    assert "corretor_threadpool_queue_depth 0" in response.text
+
+
+class FakeBackend(RetrievalBackend):
+    name = "fake"
+
+    def query(self, text: str, k: int) -> List[str]:
+        return []
+
+
+def _get(path: str) -> httpx.Response:
+    async def _run() -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await client.get(path)
+
+    return asyncio.run(_run())
+
+
+def test_ready_reports_warmup_through_lifespan(monkeypatch):
+    from app.main import lifespan
+    from app.services.ai_service import ai_service
+
+    monkeypatch.setattr(settings, "GEMINI_API_KEY", "")
+
+    async def _run() -> tuple:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            before = await client.get("/ready")
+            async with lifespan(app):
+                await ai_service.start_warmup()
+                during = await client.get("/ready")
+            return before, during
+
+    with patch.object(ai_service, "_warmup_task", None), patch.object(ai_service, "retrieval_warm", False):
+        with patch.object(ai_service, "_backend", FakeBackend()):
+            before, during = asyncio.run(_run())
+    assert before.status_code == 503
+    assert during.status_code == 200
+    body = during.json()
+    assert body["ready"] is True
+    assert body["retrieval"] == "warm"
+    assert body["llm"] == "unavailable"
+
+
+def test_ready_in_inline_mode_and_not_ready_without_retrieval():
+    from app.api.webhook import dispatcher
+    from app.services.ai_service import AIService, ai_service
+
+    with patch.object(AIService, "warm", new_callable=PropertyMock, return_value=True):
+        with patch.object(dispatcher, "workers", 0):
+            with patch.object(ai_service, "readiness", return_value={"llm": "warm", "retrieval": "warm"}):
+                inline = _get("/ready")
+            with patch.object(ai_service, "readiness", return_value={"llm": "warm", "retrieval": "unavailable"}):
+                no_retrieval = _get("/ready")
+
+    assert inline.status_code == 200 and inline.json()["dispatcher"] is False
+    assert no_retrieval.status_code == 503
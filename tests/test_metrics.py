@@ -0,0 +1,29 @@
+from app.core.metrics import Registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram("demo_seconds", "Demo.", ["stage"], buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5.0, stage="a")
+
+    text = registry.render()
+    assert 'demo_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="a",le="1"} 2' in text
+    assert 'demo_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{stage="a"} 3' in text
+
+
+def test_counter_and_gauge_render_with_labels():
+    registry = Registry()
+    counter = registry.counter("demo_total", "Demo.", ["outcome"])
+    gauge = registry.gauge("demo_depth", "Demo.")
+    counter.inc(outcome='say "hi"')
+    counter.inc(2, outcome='say "hi"')
+    gauge.set(4)
+
+    text = registry.render()
+    assert '# TYPE demo_total counter' in text
+    assert 'demo_total{outcome="say \\"hi\\""} 3' in text
+    assert "demo_depth 4" in text
@@ -0,0 +1,76 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.api import payloads
+from app.api.payloads import InvalidPayloadError, _decode_generic, decode_webhook
+
+FIXTURES = json.loads((Path(__file__).parent / "fixtures" / "webhook_payloads.json").read_text(encoding="utf-8"))
+
+_KEY = {"remoteJid": "5521987654321@s.whatsapp.net", "fromMe": False, "id": "3EB0C767D097B7C7C030"}
+NULL_FIELDS = {
+    "event": {"event": None, "data": {"key": _KEY, "message": {"conversation": "oi"}}},
+    "data": {"event": "messages.upsert", "data": None, "body": "oi", "from": "5521"},
+    "key": {"event": "messages.upsert", "data": {"key": None, "message": {"conversation": "oi"}}, "from": "5521"},
+    "message": {"event": "messages.upsert", "data": {"key": _KEY, "message": None}, "body": "oi"},
+    "conversation": {"event": "messages.upsert", "data": {"key": _KEY, "message": {"conversation": None, "extendedTextMessage": {"text": "oi"}}}},
+    "from_me": {"event": "messages.upsert", "data": {"key": {**_KEY, "fromMe": None}, "message": {"conversation": "oi"}}},
+    "message_id": {"event": "messages.upsert", "data": {"key": {**_KEY, "id": None}, "message": {"conversation": "oi"}}},
+    "remote_jid": {"event": "messages.upsert", "data": {"key": {**_KEY, "remoteJid": None}, "message": {"conversation": "oi"}}, "from": None},
+    "messages": {"event": "messages.upsert", "data": {"messages": None}, "messages": [{"from": "5521", "text": {"body": "oi"}}]},
+    "extended_text": {"event": "messages.upsert", "data": {"key": _KEY, "message": {"extendedTextMessage": {"text": None}}}},
+    "caption": {"event": "messages.upsert", "data": {"key": _KEY, "message": {"imageMessage": {"caption": None}}}},
+    "text_body": {"event": "messages.upsert", "data": {"key": _KEY, "message": {"text": {"body": None}}}},
+}
+
+
+@pytest.mark.parametrize("name", sorted(FIXTURES))
+def test_decode_webhook_matches_dict_extractors(name):
+    raw = json.dumps(FIXTURES[name]).encode("utf-8")
+    assert decode_webhook(raw) == _decode_generic(raw)
+
+
+@pytest.mark.parametrize("name", sorted(NULL_FIELDS))
+def test_typed_and_generic_paths_agree_on_null_fields(name):
+    raw = json.dumps(NULL_FIELDS[name]).encode("utf-8")
+    expected = _decode_generic(raw)
+    assert decode_webhook(raw) == expected
+    if payloads.msgspec is not None:
+        try:
+            typed = payloads._decoder.decode(raw)
+        except payloads.msgspec.ValidationError:
+            return
+        assert payloads._from_struct(typed) == expected
+
+
+def test_decode_webhook_reads_caption_and_skips_media():
+    raw = json.dumps(FIXTURES["evolution_image_caption"]).encode("utf-8")
+    message = decode_webhook(raw).messages[0]
+    assert message.text == "Essa planta é do Ilhamar?"
+    assert message.message_id == "3EB0C767D097B7C7C032"
+    assert message.remote_jid == "5521987654321@s.whatsapp.net"
+
+
+def test_decode_webhook_returns_every_message_in_a_batch():
+    raw = json.dumps(FIXTURES["evolution_batch"]).encode("utf-8")
+    delivery = decode_webhook(raw)
+    assert delivery.event == "messages.upsert"
+    assert [(m.remote_jid, m.text) for m in delivery.messages] == [
+        ("5521911111111@s.whatsapp.net", "bom dia"),
+        ("5521922222222@s.whatsapp.net", "quero saber do Duet"),
+    ]
+
+
+def test_decode_webhook_falls_back_on_unexpected_shapes():
+    raw = json.dumps({"event": "messages.upsert", "data": "oops", "body": "ola", "from": "5511"}).encode("utf-8")
+    message = decode_webhook(raw).messages[0]
+    assert message.text == "ola"
+    assert message.remote_jid == "5511"
+
+
+def test_decode_webhook_rejects_non_objects():
+    with pytest.raises(InvalidPayloadError):
+        decode_webhook(b"[1, 2]")
+    with pytest.raises(InvalidPayloadError):
+        decode_webhook(b"{invalid")
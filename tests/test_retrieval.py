@@ -0,0 +1,53 @@
+from typing import List, Sequence
+
+import numpy as np
+
+from app.services.retrieval import NumpyBackend, write_index
+
+VECTORS = {
+    "garagem": [1.0, 0.0, 0.0],
+    "piscina": [0.0, 1.0, 0.0],
+    "preco": [0.0, 0.0, 1.0],
+}
+
+
+def _embed(texts: Sequence[str]) -> List[List[float]]:
+    return [VECTORS[text] for text in texts]
+
+
+def test_numpy_backend_returns_top_k_by_cosine(tmp_path):
+    documents = ["Duas vagas de garagem.", "Piscina aquecida.", "A partir de R$ 450 mil.", "Garagem e piscina."]
+    embeddings = [[3.0, 0.0, 0.0], [0.0, 2.0, 0.1], [0.1, 0.0, 5.0], [1.0, 1.0, 0.0]]
+    meta = write_index(str(tmp_path), embeddings, documents, source="test")
+    backend = NumpyBackend(str(tmp_path), embedder=_embed)
+
+    assert meta["count"] == 4 and meta["dim"] == 3
+    assert backend.matrix.dtype == np.float32
+    assert np.allclose(np.linalg.norm(backend.matrix, axis=1), 1.0)
+    assert backend.query("garagem", 2) == ["Duas vagas de garagem.", "Garagem e piscina."]
+    assert backend.query("preco", 10)[0] == "A partir de R$ 450 mil."
+
+
+def test_search_matches_full_sort():
+    rng = np.random.default_rng(7)
+    backend = NumpyBackend.__new__(NumpyBackend)
+    matrix = rng.normal(size=(500, 16)).astype(np.float32)
+    backend.matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    query = rng.normal(size=16)
+
+    top, scores = backend.search(query, 5)
+
+    expected = np.argsort(-(backend.matrix @ (query / np.linalg.norm(query)).astype(np.float32)))[:5]
+    assert top.tolist() == expected.tolist()
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_rewritten_index_changes_version_and_reloads(tmp_path):
+    write_index(str(tmp_path), [[1.0, 0.0, 0.0]], ["antigo"])
+    backend = NumpyBackend(str(tmp_path), embedder=_embed)
+    version = backend.version()
+
+    write_index(str(tmp_path), [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], ["novo", "piscina"])
+    assert backend.version() != version
+    backend.reload()
+    assert backend.query("piscina", 1) == ["piscina"]
@@ -0,0 +1,88 @@
+import asyncio
+from typing import Any, List, Optional, Sequence
+
+import pytest
+
+from app.services.retrieval import RetrievalBackend, Version
+from app.services.retrieval_sidecar import SidecarBackend, SidecarError, SidecarServer
+
+
+class FakeBackend(RetrievalBackend):
+    name = "fake"
+
+    def __init__(self) -> None:
+        self.embedded: List[List[str]] = []
+        self.reloads = 0
+        self.current: Version = ((1, 10),)
+
+    def query(self, text: str, k: int) -> List[str]:
+        raise AssertionError("the sidecar should search with the batched embedding")
+
+    def query_embedding(self, text: str, vector: Sequence[float], k: int) -> List[str]:
+        if text == "boom":
+            raise RuntimeError("index corrupted")
+        return [f"{text}:{vector[0]:.0f}"] * k
+
+    def embed(self, texts: Sequence[str]) -> Optional[List[List[float]]]:
+        self.embedded.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    def version(self) -> Version:
+        return self.current
+
+    def reload(self) -> None:
+        self.reloads += 1
+
+
+def _with_sidecar(tmp_path, scenario) -> Any:
+    path = str(tmp_path / "retrieval.sock")
+    backend = FakeBackend()
+
+    async def _run() -> Any:
+        server = SidecarServer(backend, max_batch=16, max_wait=0.05)
+        task = asyncio.ensure_future(server.serve(path))
+        while not (tmp_path / "retrieval.sock").exists():
+            await asyncio.sleep(0.001)
+        client = SidecarBackend(path, timeout=2)
+        try:
+            return await scenario(client, backend)
+        finally:
+            task.cancel()
+
+    return asyncio.run(_run())
+
+
+def test_queries_and_embeddings_from_many_clients_share_batches(tmp_path):
+    async def scenario(client: SidecarBackend, backend: FakeBackend) -> Any:
+        results = await asyncio.gather(
+            *(asyncio.to_thread(client.query, text, 2) for text in ["oi", "preço", "garagem"]),
+            asyncio.to_thread(client.embed, ["ab", "abc"]),
+        )
+        return results, backend.embedded
+
+    results, embedded = _with_sidecar(tmp_path, scenario)
+    assert results == [["oi:2", "oi:2"], ["preço:5", "preço:5"], ["garagem:7", "garagem:7"], [[2.0], [3.0]]]
+    assert len(embedded) == 1 and sorted(embedded[0]) == ["ab", "abc", "garagem", "oi", "preço"]
+
+
+def test_reload_runs_once_per_version_change(tmp_path):
+    async def scenario(client: SidecarBackend, backend: FakeBackend) -> Any:
+        assert await asyncio.to_thread(client.version) == ((1, 10),)
+        await asyncio.to_thread(client.reload)
+        backend.current = ((2, 20),)
+        await asyncio.gather(*(asyncio.to_thread(client.reload) for _ in range(3)))
+        return backend.reloads
+
+    assert _with_sidecar(tmp_path, scenario) == 1
+
+
+def test_errors_are_reported_and_the_connection_survives(tmp_path):
+    async def scenario(client: SidecarBackend, backend: FakeBackend) -> Any:
+        def calls() -> List[str]:
+            with pytest.raises(SidecarError, match="index corrupted"):
+                client.query_embedding("boom", [1.0], 1)
+            return client.query_embedding("ok", [9.0], 1)
+
+        return await asyncio.to_thread(calls)
+
+    assert _with_sidecar(tmp_path, scenario) == ["ok:9"]
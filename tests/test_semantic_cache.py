@@ -0,0 +1,127 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Callable, List
+
+from app.core.config import settings
+from app.core.text import normalize_text
+from app.services.ai_service import AIService, is_self_contained, retrieval_fallback
+from app.services.semantic_cache import SemanticCache, context_fingerprint
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_normalize_text_folds_case_accents_and_whitespace():
+    assert normalize_text("  Olá,   PREÇO do Duet? ") == "ola, preco do duet?"
+    assert normalize_text("Qual o preço?", strip_punctuation=True) == "qual o preco"
+
+
+def test_exact_and_semantic_hits_require_same_context():
+    cache = SemanticCache(threshold=0.9, ttl=60, maxsize=10)
+    ctx = context_fingerprint("Duet: 2 vagas de garagem")
+    cache.store("tem garagem?", [1.0, 0.0], ctx, "Sim, 2 vagas.")
+
+    assert cache.lookup("tem garagem?", None, ctx) == "Sim, 2 vagas."
+    assert cache.lookup("o apartamento tem garagem?", [0.99, 0.05], ctx) == "Sim, 2 vagas."
+    assert cache.lookup("qual o preco?", [0.0, 1.0], ctx) is None
+    assert cache.lookup("tem garagem?", [1.0, 0.0], context_fingerprint("outro contexto")) is None
+
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 2)
+
+
+def test_entries_expire_and_evict_lru():
+    clock = FakeClock()
+    cache = SemanticCache(threshold=0.9, ttl=10, maxsize=2, clock=clock)
+    cache.store("a", None, "ctx", "A")
+    cache.store("b", None, "ctx", "B")
+    assert cache.lookup("a", None, "ctx") == "A"
+    cache.store("c", None, "ctx", "C")  # evicts "b", the least recently used
+
+    assert cache.lookup("b", None, "ctx") is None
+    assert cache.stats()["evictions"] == 1
+
+    clock.now = 11
+    assert cache.lookup("a", None, "ctx") is None
+
+
+def _service(make_ai_service: Callable[..., AIService], answers: List[str]) -> AIService:
+    calls: List[Any] = []
+
+    def generate_content(**kwargs: Any) -> Any:
+        calls.append(kwargs)
+        return SimpleNamespace(text=answers[len(calls) - 1])
+
+    service = make_ai_service(
+        model=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)),
+        answer_cache=SemanticCache(threshold=0.92, ttl=60, maxsize=10),
+        _embeddings_available=False,
+    )
+    service.calls = calls  # type: ignore[attr-defined]
+    return service
+
+
+def test_generate_response_serves_repeated_question_from_cache(make_ai_service):
+    service = _service(make_ai_service, ["Sim, 2 vagas.", "Fica pronto em 2026."])
+
+    async def _run() -> List[str]:
+        return [
+            await service.generate_response("Tem garagem?", "ctx"),
+            await service.generate_response("  tem GARAGEM? ", "ctx"),
+            await service.generate_response("Tem garagem?", "outro ctx"),
+        ]
+
+    assert asyncio.run(_run()) == ["Sim, 2 vagas.", "Sim, 2 vagas.", "Fica pronto em 2026."]
+    assert len(service.calls) == 2  # type: ignore[attr-defined]
+
+
+def test_generate_response_does_not_cache_fallback_and_invalidates_on_knowledge_change(make_ai_service, monkeypatch):
+    service = _service(make_ai_service, ["", "Sim.", "Sim, atualizado."])
+    versions = iter([((1, 10),), ((1, 10),), ((2, 20),)])
+    monkeypatch.setattr(service, "knowledge_version", lambda: next(versions))
+    monkeypatch.setattr(settings, "KNOWLEDGE_VERSION_CHECK_SEC", 0)
+
+    async def _run() -> List[str]:
+        return [await service.generate_response("tem piscina?", "ctx") for _ in range(3)]
+
+    assert asyncio.run(_run()) == [retrieval_fallback("ctx"), "Sim.", "Sim, atualizado."]
+    assert service.answer_cache.stats()["invalidations"] == 1
+
+
+def test_generate_response_self_contained_question_with_history_hits_cache(make_ai_service):
+    service = _service(make_ai_service, ["O Duet começa em R$ 450 mil."])
+
+    async def _run() -> List[str]:
+        return [
+            await service.generate_response("Qual o preço do Duet?", "ctx"),
+            await service.generate_response("qual o preco do duet?", "ctx", history="Cliente: oi, sou a Ana"),
+        ]
+
+    assert asyncio.run(_run()) == ["O Duet começa em R$ 450 mil."] * 2
+    assert len(service.calls) == 1  # type: ignore[attr-defined]
+    assert "Ana" not in service.calls[0]["contents"]  # type: ignore[attr-defined]
+
+
+def test_is_self_contained():
+    assert is_self_contained("Qual o preço do Duet?")
+    assert not is_self_contained("tem garagem?")
+    assert not is_self_contained("E o preço da cobertura?")
+    assert not is_self_contained("Quanto custa esse apartamento?")
+
+
+def test_generate_response_with_history_bypasses_cache(make_ai_service):
+    service = _service(make_ai_service, ["Sim, 2 vagas.", "Sim, no Duet também."])
+
+    async def _run() -> List[str]:
+        return [
+            await service.generate_response("tem garagem?", "ctx"),
+            await service.generate_response("tem garagem?", "ctx", history="Cliente: e o Duet?"),
+        ]
+
+    assert asyncio.run(_run()) == ["Sim, 2 vagas.", "Sim, no Duet também."]
+    assert service.answer_cache.stats()["size"] == 1
@@ -0,0 +1,61 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls: List[str] = []
+
+    async def work(key: str) -> str:
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    async def _run() -> List[str]:
+        first = await asyncio.gather(*(flight.do(k, lambda k=k: work(k)) for k in ["a", "a", "b", "a"]))
+        # Once finished nothing is kept: the next call runs again.
+        return first + [await flight.do("a", lambda: work("a"))]
+
+    assert asyncio.run(_run()) == ["A", "A", "B", "A", "A"]
+    assert calls == ["a", "b", "a"]
+    assert flight.stats() == {"inflight": 0, "leaders": 3, "saved": 2}
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight("test")
+
+    async def boom() -> None:
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def _run() -> List[BaseException]:
+        return await asyncio.gather(*(flight.do("k", boom) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(_run())
+    assert [str(r) for r in results] == ["upstream down"] * 3
+    assert flight.stats()["leaders"] == 1
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight("test")
+
+    async def work() -> str:
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def _run() -> str:
+        leader = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(_run()) == "done"
+    assert flight.stats()["saved"] == 1
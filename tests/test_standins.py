@@ -0,0 +1,79 @@
+import asyncio
+import json
+from typing import Any, List
+
+import httpx
+
+from app.standins import evolution, gemini
+from app.standins.profile import Profile, Upstream
+
+FAST = dict(latency="fixed", latency_ms=0.0)
+
+
+def _post(app: Any, path: str, body: Any, headers: Any = None) -> httpx.Response:
+    async def _run() -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://standin") as client:
+            return await client.post(path, json=body, headers=headers)
+
+    return asyncio.run(_run())
+
+
+REQUEST = {"contents": [{"role": "user", "parts": [{"text": "Qual o preço?"}]}]}
+
+
+def test_gemini_generate_content_matches_api_shape():
+    app = gemini.create_app(Profile(**FAST), reply_chars=50)
+    response = _post(app, "/v1beta/models/gemini-1.5-pro:generateContent", REQUEST)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["candidates"][0]["content"]["parts"][0]["text"]) <= 50
+    assert body["candidates"][0]["finishReason"] == "STOP"
+    assert body["usageMetadata"]["promptTokenCount"] >= 1
+
+
+def test_gemini_stream_sends_sse_chunks():
+    app = gemini.create_app(Profile(**FAST), reply_chars=120, stream_chunks=3, stream_interval_ms=0)
+    response = _post(app, "/v1beta/models/gemini-1.5-pro:streamGenerateContent?alt=sse", REQUEST)
+
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    texts: List[str] = [e["candidates"][0]["content"]["parts"][0]["text"] for e in events]
+    assert len(events) == 3
+    assert "".join(texts) == gemini._reply(120)
+    assert "finishReason" in events[-1]["candidates"][0] and "finishReason" not in events[0]["candidates"][0]
+
+
+def test_gemini_errors_and_rate_limits():
+    overloaded = gemini.create_app(Profile(error_rate=1.0, **FAST))
+    response = _post(overloaded, "/v1beta/models/m:generateContent", REQUEST)
+    assert response.status_code == 503 and response.json()["error"]["status"] == "UNAVAILABLE"
+
+    limited = gemini.create_app(Profile(max_rps=2, **FAST))
+    statuses = [_post(limited, "/v1beta/models/m:generateContent", REQUEST).status_code for _ in range(4)]
+    assert statuses.count(429) >= 1 and statuses[:2] == [200, 200]
+    assert limited.state.upstream.outcomes["throttled"] == statuses.count(429)
+
+
+def test_latency_distributions():
+    assert Upstream(Profile(latency="fixed", latency_ms=20)).sample_latency() == 0.02
+    uniform = Upstream(Profile(latency="uniform", latency_min_ms=10, latency_ms=30, seed=1))
+    assert all(0.01 <= uniform.sample_latency() <= 0.03 for _ in range(100))
+    lognormal = Upstream(Profile(latency="lognormal", latency_ms=100, latency_sigma=0.5, seed=1))
+    samples = sorted(lognormal.sample_latency() for _ in range(2001))
+    assert 0.09 < samples[1000] < 0.11
+
+
+def test_evolution_send_text_and_profile_update():
+    app = evolution.create_app(Profile(**FAST), api_key="secret")
+    body = {"number": "5521987654321", "textMessage": {"text": "Olá!"}}
+
+    assert _post(app, "/message/sendText/BotRiva1", body, {"apikey": "wrong"}).status_code == 401
+    response = _post(app, "/message/sendText/BotRiva1", body, {"apikey": "secret"})
+    assert response.status_code == 201
+    assert response.json()["key"]["remoteJid"] == "5521987654321@s.whatsapp.net"
+    assert response.json()["key"]["fromMe"] is True
+
+    assert _post(app, "/_standin/profile", {"throttle_rate": 1.0}).status_code == 200
+    assert _post(app, "/message/sendText/BotRiva1", body, {"apikey": "secret"}).status_code == 429
+    assert _post(app, "/_standin/profile", {"nope": 1}).status_code == 400
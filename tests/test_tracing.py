@@ -0,0 +1,102 @@
+import asyncio
+import json
+import threading
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.tracing import SlowTraceSink, Trace, _TraceFormatter, activate, span, traced
+
+
+def _post_json(path: str, payload: dict) -> httpx.Response:
+    from app.main import app
+
+    async def _run() -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await client.post(path, json=payload)
+
+    return asyncio.run(_run())
+
+
+def test_spans_are_recorded_on_the_active_trace_only():
+    @traced("double")
+    def double(x: int) -> int:
+        return 2 * x
+
+    assert double(1) == 2
+
+    trace = Trace("unit")
+    with activate(trace):
+        with span("outer", step=1):
+            double(2)
+    assert [s["name"] for s in trace.spans] == ["double", "outer"]
+    assert trace.spans[1]["step"] == 1
+
+
+def test_trace_propagates_into_threads_and_tasks():
+    @traced("in_thread")
+    def blocking() -> None:
+        return None
+
+    trace = Trace("unit")
+
+    async def _run() -> None:
+        with activate(trace):
+            await asyncio.to_thread(blocking)
+            await asyncio.gather(asyncio.create_task(asyncio.to_thread(blocking)))
+
+    asyncio.run(_run())
+    assert [s["name"] for s in trace.spans] == ["in_thread", "in_thread"]
+
+
+def test_slow_trace_sink_writes_only_slow_traces(tmp_path):
+    path = tmp_path / "slow.jsonl"
+    sink = SlowTraceSink(str(path), threshold_ms=50, max_bytes=10_000, backup_count=1)
+
+    fast = Trace("fast")
+    fast.duration = 0.01
+    sink.offer(fast)
+    slow = Trace("slow", remote_jid="5511")
+    slow.duration = 0.2
+    writers = []
+    format_trace = _TraceFormatter.format
+
+    def _format(self, record):
+        writers.append(threading.current_thread())
+        return format_trace(self, record)
+
+    with patch.object(_TraceFormatter, "format", _format):
+        sink.offer(slow)
+        sink.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["trace_id"] == slow.trace_id
+    assert json.loads(lines[0])["attrs"] == {"remote_jid": "5511"}
+    assert writers and threading.main_thread() not in writers
+
+
+def test_webhook_message_trace_covers_every_stage():
+    payload = {
+        "event": "messages.upsert",
+        "data": {
+            "key": {"fromMe": False, "remoteJid": "5511400000000@s.whatsapp.net", "id": "TRACE1"},
+            "message": {"conversation": "qual a metragem?"},
+        },
+    }
+    finished: list[Trace] = []
+
+    with patch("app.core.tracing.slow_traces.offer", new=finished.append):
+        with patch("app.api.webhook.ai_service.get_context_from_db", new=AsyncMock(return_value="ctx")):
+            with patch("app.api.webhook.ai_service.generate_response", new=AsyncMock(return_value="78 m2")):
+                with patch("app.api.webhook.whatsapp_service.send_message", new=AsyncMock(return_value={"ok": True})):
+                    _post_json("/webhook", payload)
+
+    assert len(finished) == 1
+    trace = finished[0]
+    assert trace.attrs["message_id"] == "TRACE1"
+    assert trace.attrs["status"] == "processed"
+    names = [s["name"] for s in trace.spans]
+    for expected in ["parse", "dedupe", "queue_wait", "retrieval", "generation", "send"]:
+        assert expected in names
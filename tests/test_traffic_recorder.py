@@ -0,0 +1,125 @@
+import asyncio
+import gzip
+import json
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.services.traffic_recorder import TrafficRecorder, load_redactors, pii_redactor
+
+with patch("app.db.init_db.init_db", new_callable=AsyncMock):
+    from app.main import app
+
+
+def _delivery(number: str = "5521999990000", text: str = "Oi") -> dict:
+    return {
+        "event": "messages.upsert",
+        "apikey": "segredo",
+        "data": {
+            "key": {"remoteJid": f"{number}@s.whatsapp.net", "fromMe": True, "id": "ABC123"},
+            "pushName": "Maria Silva",
+            "message": {"conversation": text},
+        },
+    }
+
+
+def _read_lines(path: str) -> list:
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def test_pii_redactor_pseudonyms_are_stable_and_same_length():
+    redact = pii_redactor("sal")
+    first = redact(_delivery(text="meu cpf 123.456.789-00, email a.b@x.com, tel 21988887777"))
+    second = redact(_delivery())
+    other = redact(_delivery(number="5521911112222"))
+
+    jid = first["data"]["key"]["remoteJid"]
+    assert jid == second["data"]["key"]["remoteJid"]
+    assert jid != other["data"]["key"]["remoteJid"]
+    assert jid != "5521999990000@s.whatsapp.net"
+    assert len(jid) == len("5521999990000@s.whatsapp.net")
+    assert first["data"]["pushName"].startswith("Contato ")
+    text = first["data"]["message"]["conversation"]
+    assert "<cpf>" in text and "<email>" in text and "21988887777" not in text
+    assert first["data"]["key"]["id"] == "ABC123"
+
+
+def test_pii_redactor_without_salt_uses_random_key(caplog):
+    with caplog.at_level("WARNING", logger="app.services.traffic_recorder"):
+        first = pii_redactor()(_delivery())
+        second = pii_redactor()(_delivery())
+    assert first["data"]["key"]["remoteJid"] != second["data"]["key"]["remoteJid"]
+    assert "WEBHOOK_RECORD_SALT" in caplog.text
+
+
+def test_load_redactors_spec():
+    assert load_redactors("none") == []
+    assert len(load_redactors("default")) == 1
+    custom = load_redactors("json:loads")
+    assert custom == [json.loads]
+
+
+def test_recorder_writes_redacted_line_without_apikey(tmp_path):
+    recorder = TrafficRecorder(str(tmp_path), max_bytes=1_000_000, backup_count=2, redactors=load_redactors("default"))
+    recorder.record(json.dumps(_delivery()).encode(), 1700000000.5, 200, "queued", 0.0123)
+    recorder.record(b"{not json", 1700000001.0, 400, "Invalid JSON payload", 0.001)
+    recorder.close()
+
+    lines = _read_lines(recorder.path)
+    assert recorder.stats()["recorded"] == 2
+    assert lines[0]["ts"] == 1700000000.5
+    assert lines[0]["status"] == "queued"
+    assert lines[0]["duration_ms"] == 12.3
+    assert "apikey" not in lines[0]["body"]
+    assert "5521999990000" not in json.dumps(lines[0])
+    assert lines[1] == {
+        "ts": 1700000001.0, "http_status": 400, "status": "Invalid JSON payload", "duration_ms": 1.0, "raw_bytes": 9
+    }
+
+
+def test_recorder_redacts_list_bodies(tmp_path):
+    recorder = TrafficRecorder(str(tmp_path), max_bytes=1_000_000, backup_count=1, redactors=load_redactors("default", "sal"))
+    batch = [_delivery(), [_delivery(number="5521911112222", text="tel 21988887777")]]
+    recorder.record(json.dumps(batch).encode(), 1700000000.0, 200, "queued", 0.01)
+    recorder.close()
+
+    (line,) = _read_lines(recorder.path)
+    assert "5521999990000" not in json.dumps(line)
+    assert "5521911112222" not in json.dumps(line)
+    assert "21988887777" not in json.dumps(line)
+    assert "apikey" not in json.dumps(line)
+    assert line["body"][1][0]["data"]["pushName"].startswith("Contato ")
+
+
+def test_recorder_rotates_to_gzip(tmp_path):
+    recorder = TrafficRecorder(str(tmp_path), max_bytes=600, backup_count=3, redactors=[])
+    for i in range(10):
+        recorder.record(json.dumps(_delivery(text=f"mensagem {i}")).encode(), 1700000000.0 + i, 200, "queued", 0.01)
+    recorder.close()
+
+    rotated = sorted(tmp_path.glob("webhook.jsonl.*.gz"))
+    assert rotated
+    with gzip.open(rotated[0], "rt", encoding="utf-8") as fh:
+        entry = json.loads(fh.readline())
+    assert entry["body"]["data"]["message"]["conversation"].startswith("mensagem ")
+
+
+def test_webhook_records_delivery_when_enabled(tmp_path):
+    recorder = TrafficRecorder(str(tmp_path), max_bytes=1_000_000, backup_count=1, redactors=[])
+
+    async def _run() -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await client.post("/webhook", json=_delivery())
+
+    with patch("app.api.webhook.traffic_recorder", recorder):
+        response = asyncio.run(_run())
+    recorder.close()
+
+    lines = _read_lines(recorder.path)
+    assert response.status_code == 200
+    assert len(lines) == 1
+    assert lines[0]["http_status"] == 200
+    assert lines[0]["status"] == response.json()["status"]
+    assert lines[0]["body"]["data"]["key"]["id"] == "ABC123"
@@ -1,5 +1,5 @@
 import asyncio
-from unittest.mock import AsyncMock, patch
+from unittest.mock import ANY, AsyncMock, patch
 
 import httpx
 
@@ -116,7 +116,7 @@ def test_webhook_processed_conversation():
     assert body["status"] == "processed"
     assert body["reply"] == "Temos sim, vou te mostrar as opcoes."
     mock_ctx.assert_awaited_once_with("tem 2 quartos?")
-    mock_gen.assert_awaited_once_with("tem 2 quartos?", "contexto mock")
+    mock_gen.assert_awaited_once_with("tem 2 quartos?", "contexto mock", history=ANY)
     mock_send.assert_awaited_once_with("5511999999999@s.whatsapp.net", "Temos sim, vou te mostrar as opcoes.")
 
 
@@ -154,3 +154,314 @@ def test_webhook_error_when_ai_fails():
 
     assert response.status_code == 200
     assert response.json()["status"] == "error"
+
+
+def test_webhook_feeds_conversation_memory_from_temp_db(tmp_path, monkeypatch):
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.db.models import Base
+    from app.services.conversation_service import ConversationMemory, SqlConversationStore
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+    memory = ConversationMemory(
+        SqlConversationStore(async_sessionmaker(engine, expire_on_commit=False)),
+        max_turns=4, max_turn_chars=200, summary_max_chars=200, max_contacts=10,
+    )
+    monkeypatch.setattr(settings, "CONVERSATION_MEMORY_ENABLED", True)
+    jid = "5511700000000@s.whatsapp.net"
+
+    def _payload(text: str) -> dict:
+        return {"event": "messages.upsert", "data": {"key": {"fromMe": False, "remoteJid": jid}, "message": {"conversation": text}}}
+
+    async def _run() -> None:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            await client.post("/webhook", json=_payload("tem garagem?"))
+            await client.post("/webhook", json=_payload("e piscina?"))
+        await memory.wait_idle()
+        await engine.dispose()
+
+    with patch("app.api.webhook.conversation_memory", memory):
+        with patch("app.api.webhook.ai_service.get_context_from_db", new=AsyncMock(return_value="ctx")):
+            with patch("app.api.webhook.ai_service.generate_response", new=AsyncMock(return_value="Tem sim.")) as mock_gen:
+                with patch("app.api.webhook.whatsapp_service.send_message", new=AsyncMock(return_value={"ok": True})):
+                    asyncio.run(_run())
+
+    assert mock_gen.await_args_list[0].kwargs["history"] == ""
+    assert "Cliente: tem garagem?" in mock_gen.await_args_list[1].kwargs["history"]
+
+
+def test_webhook_queued_when_dispatcher_running():
+    from app.api.webhook import dispatcher
+
+    payload = {
+        "event": "messages.upsert",
+        "data": {
+            "key": {"fromMe": False, "remoteJid": "5511666666666@s.whatsapp.net"},
+            "message": {"conversation": "tem garagem?"},
+        },
+    }
+
+    async def _run() -> httpx.Response:
+        await dispatcher.start()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                response = await client.post("/webhook", json=payload)
+            await dispatcher.join()
+            return response
+        finally:
+            await dispatcher.stop()
+
+    with patch.object(dispatcher, "coalesce_window", 0.0):
+        with patch("app.api.webhook.ai_service.get_context_from_db", new=AsyncMock(return_value="ctx")):
+            with patch("app.api.webhook.ai_service.generate_response", new=AsyncMock(return_value="Tem sim!")):
+                with patch("app.api.webhook.whatsapp_service.send_message", new=AsyncMock(return_value={"ok": True})) as mock_send:
+                    response = asyncio.run(_run())
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+    mock_send.assert_awaited_once_with("5511666666666@s.whatsapp.net", "Tem sim!")
+
+
+def test_webhook_queues_contact_burst_while_workers_are_busy():
+    from app.api.webhook import dispatcher
+    from app.services.admission import admission
+
+    def _message(jid: str, msg_id: str, text: str) -> dict:
+        return {
+            "event": "messages.upsert",
+            "data": {"key": {"fromMe": False, "remoteJid": jid, "id": msg_id}, "message": {"conversation": text}},
+        }
+
+    busy = "5511600000001@s.whatsapp.net"
+    chatty = "5511600000002@s.whatsapp.net"
+    release = asyncio.Event()
+
+    async def fake_generate(text: str, context: str = "", history: str = "") -> str:
+        if text == "primeira":
+            await release.wait()
+        return f"re: {text}"
+
+    async def _run() -> tuple[list, dict]:
+        await dispatcher.start()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                await client.post("/webhook", json=_message(busy, "BUSY1", "primeira"))
+                await asyncio.sleep(0.01)
+                responses = [
+                    await client.post("/webhook", json=_message(chatty, f"BURST{i}", f"parte {i}")) for i in range(6)
+                ]
+                during = admission.stats()
+            release.set()
+            await dispatcher.join()
+            return responses, during
+        finally:
+            await dispatcher.stop()
+
+    with patch.object(dispatcher, "workers", 1), patch.object(dispatcher, "coalesce_window", 0.0):
+        with patch("app.api.webhook.ai_service.get_context_from_db", new=AsyncMock(return_value="ctx")):
+            with patch("app.api.webhook.ai_service.generate_response", new=fake_generate):
+                with patch("app.api.webhook.whatsapp_service.send_message", new=AsyncMock(return_value={"ok": True})) as mock_send:
+                    responses, during = asyncio.run(_run())
+
+    assert [r.status_code for r in responses] == [200] * 6
+    assert {r.json()["status"] for r in responses} == {"queued"}
+    assert during["waiting"] == 0 and not during["degraded"]
+    sent_to_chatty = [c.args[1] for c in mock_send.await_args_list if c.args[0] == chatty]
+    assert sent_to_chatty == ["re: " + "\n".join(f"parte {i}" for i in range(6))]
+    assert admission.admitted == 0
+
+
+def test_webhook_dispatcher_backlog_triggers_degraded_replies():
+    from app.api.webhook import dispatcher
+    from app.services.admission import DEGRADED_REPLY, admission
+
+    busy = "5511610000000@s.whatsapp.net"
+    queued = [f"551161000000{i}@s.whatsapp.net" for i in range(1, 5)]
+    release = asyncio.Event()
+
+    def _message(jid: str) -> dict:
+        return {
+            "event": "messages.upsert",
+            "data": {"key": {"fromMe": False, "remoteJid": jid, "id": "ID" + jid[:13]}, "message": {"conversation": "oi"}},
+        }
+
+    async def fake_generate(text: str, context: str = "", history: str = "") -> str:
+        if not release.is_set():
+            await release.wait()
+        return "Resposta completa"
+
+    async def _run() -> None:
+        await dispatcher.start()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                await client.post("/webhook", json=_message(busy))
+                await asyncio.sleep(0.01)
+                for jid in queued:
+                    assert (await client.post("/webhook", json=_message(jid))).json()["status"] == "queued"
+            release.set()
+            await dispatcher.join()
+        finally:
+            await dispatcher.stop()
+
+    with patch.object(dispatcher, "workers", 1), patch.object(dispatcher, "coalesce_window", 0.0):
+        with patch.object(admission, "degrade_waiting", 3):
+            with patch("app.api.webhook.ai_service.get_context_from_db", new=AsyncMock(return_value="ctx")):
+                with patch("app.api.webhook.ai_service.generate_response", new=fake_generate):
+                    with patch("app.api.webhook.whatsapp_service.send_message", new=AsyncMock(return_value={"ok": True})) as mock_send:
+                        asyncio.run(_run())
+
+    replies = {c.args[0]: c.args[1] for c in mock_send.await_args_list}
+    assert replies[busy] == "Resposta completa"
+    # Picked up with 4 and 3 messages still pending, then 2 and 1.
+    assert [replies[jid] for jid in queued] == [DEGRADED_REPLY, DEGRADED_REPLY, "Resposta completa", "Resposta completa"]
+
+
+def test_webhook_ignores_redelivered_message_id():
+    payload = {
+        "event": "messages.upsert",
+        "data": {
+            "key": {"fromMe": False, "remoteJid": "5511555555555@s.whatsapp.net", "id": "3EB0C767D097B7C7C030"},
+            "message": {"conversation": "qual a previsao de entrega?"},
+        },
+    }
+
+    with patch("app.api.webhook.ai_service.get_context_from_db", new=AsyncMock(return_value="ctx")):
+        with patch("app.api.webhook.ai_service.generate_response", new=AsyncMock(return_value="Resposta")) as mock_gen:
+            with patch("app.api.webhook.whatsapp_service.send_message", new=AsyncMock(return_value={"ok": True})):
+                first = _post_json("/webhook", payload)
+                second = _post_json("/webhook", payload)
+
+    assert first.json()["status"] == "processed"
+    assert second.json()["status"] == "ignored duplicate"
+    mock_gen.assert_awaited_once()
+
+
+def test_webhook_dedupes_concurrent_deliveries_with_same_id(tmp_path):
+    from app.services.dedupe import SqliteDedupeStore
+
+    payload = {
+        "event": "messages.upsert",
+        "data": {
+            "key": {"fromMe": False, "remoteJid": "5511550000000@s.whatsapp.net", "id": "CONCURRENT1"},
+            "message": {"conversation": "tem planta de 3 quartos?"},
+        },
+    }
+
+    async def _run() -> list:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await asyncio.gather(*(client.post("/webhook", json=payload) for _ in range(2)))
+
+    store = SqliteDedupeStore(str(tmp_path / "dedupe.sqlite3"), ttl=60, max_entries=100)
+    with patch("app.api.webhook.dedupe_store", store):
+        with patch("app.api.webhook.ai_service.get_context_from_db", new=AsyncMock(return_value="ctx")):
+            with patch("app.api.webhook.ai_service.generate_response", new=AsyncMock(return_value="Tem sim")) as mock_gen:
+                with patch("app.api.webhook.whatsapp_service.send_message", new=AsyncMock(return_value={"ok": True})):
+                    responses = asyncio.run(_run())
+
+    assert sorted(r.json()["status"] for r in responses) == ["ignored duplicate", "processed"]
+    mock_gen.assert_awaited_once()
+
+
+def test_webhook_ignores_bot_echo():
+    remote_jid = "5511444444444@s.whatsapp.net"
+    reply = "Temos unidades com 2 quartos."
+    question = {
+        "event": "messages.upsert",
+        "data": {
+            "key": {"fromMe": False, "remoteJid": remote_jid},
+            "message": {"conversation": "tem 2 quartos?"},
+        },
+    }
+    echo = {
+        "event": "messages.upsert",
+        "data": {
+            "key": {"fromMe": True, "remoteJid": remote_jid},
+            "message": {"conversation": reply},
+        },
+    }
+
+    with patch("app.api.webhook.ai_service.get_context_from_db", new=AsyncMock(return_value="")):
+        with patch("app.api.webhook.ai_service.generate_response", new=AsyncMock(return_value=reply)) as mock_gen:
+            with patch("app.api.webhook.whatsapp_service.send_message", new=AsyncMock(return_value={"ok": True})) as mock_send:
+                # With fromMe testing on, only the echo guard keeps the bot from answering itself.
+                with patch.object(settings, "ALLOW_FROM_ME_TEST", True):
+                    first = _post_json("/webhook", question)
+                    second = _post_json("/webhook", echo)
+
+    assert first.json()["status"] == "processed"
+    assert second.json()["status"] == "ignored bot echo"
+    mock_gen.assert_awaited_once()
+    mock_send.assert_awaited_once_with(remote_jid, reply)
+
+
+def test_webhook_fans_out_batched_delivery():
+    payload = {
+        "event": "messages.upsert",
+        "data": {
+            "messages": [
+                {"key": {"fromMe": False, "remoteJid": "5511300000001@s.whatsapp.net"}, "message": {"conversation": "oi"}},
+                {"key": {"fromMe": False, "remoteJid": "5511300000002@s.whatsapp.net"}, "message": {"conversation": "bom dia"}},
+                {"key": {"fromMe": False, "remoteJid": "5511300000001@s.whatsapp.net"}, "message": {"conversation": "tem garagem?"}},
+                {"key": {"fromMe": False, "remoteJid": "5511300000003@s.whatsapp.net"}, "message": {}},
+            ]
+        },
+    }
+
+    async def fake_generate(text: str, context: str = "", history: str = "") -> str:
+        await asyncio.sleep(0.01)
+        return f"re: {text}"
+
+    with patch("app.api.webhook.ai_service.get_context_from_db", new=AsyncMock(return_value="ctx")):
+        with patch("app.api.webhook.ai_service.generate_response", new=fake_generate):
+            with patch("app.api.webhook.whatsapp_service.send_message", new=AsyncMock(return_value={"ok": True})) as mock_send:
+                response = _post_json("/webhook", payload)
+
+    body = response.json()
+    assert body["status"] == "processed"
+    assert [r["status"] for r in body["results"]] == ["processed", "processed", "processed", "ignored no text"]
+    sent_to_first = [c.args[1] for c in mock_send.await_args_list if c.args[0] == "5511300000001@s.whatsapp.net"]
+    assert sent_to_first == ["re: oi", "re: tem garagem?"]
+
+
+def test_webhook_sheds_with_retry_after_when_contact_is_saturated():
+    from app.services.admission import admission
+
+    payload = {
+        "event": "messages.upsert",
+        "data": {
+            "key": {"fromMe": False, "remoteJid": "5511200000000@s.whatsapp.net", "id": "SHED1"},
+            "message": {"conversation": "oi"},
+        },
+    }
+    with patch.object(admission, "max_per_contact", 0):
+        response = _post_json("/webhook", payload)
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(admission.retry_after)
+    assert admission.admitted == 0
+
+
+def test_webhook_degraded_mode_skips_llm():
+    from app.services.admission import DEGRADED_REPLY, admission
+
+    payload = {
+        "event": "messages.upsert",
+        "data": {
+            "key": {"fromMe": False, "remoteJid": "5511210000000@s.whatsapp.net"},
+            "message": {"conversation": "qual o valor?"},
+        },
+    }
+    with patch.object(admission, "force_degraded", True):
+        with patch("app.api.webhook.ai_service.generate_response", new=AsyncMock()) as mock_gen:
+            with patch("app.api.webhook.whatsapp_service.send_message", new=AsyncMock(return_value={"ok": True})):
+                response = _post_json("/webhook", payload)
+
+    assert response.json() == {"status": "processed", "reply": DEGRADED_REPLY}
+    mock_gen.assert_not_awaited()